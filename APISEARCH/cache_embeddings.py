@@ -0,0 +1,151 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+# Máximo de embeddings guardados; al superarlo se eliminan los usados hace más tiempo
+# (con 384 dimensiones en float32 son unos 1,6 KB por entrada)
+MAX_ENTRADAS = 500_000
+# Claves por consulta IN (...) (SQLite limita el número de parámetros)
+TAM_CONSULTA = 500
+# Los usos de las lecturas (para expulsar las menos usadas) se acumulan en memoria y
+# se escriben junto con el siguiente guardado o al llegar a este número de claves:
+# una lectura no escribe ni necesita el bloqueo de escritura del fichero
+TAM_USOS = 1000
+# La expulsión se comprueba cada este número de inserciones, no en cada guardado
+EXPULSAR_CADA = 1000
+
+
+def normalizar_texto(texto: str) -> str:
+    # Forma NFC y espacios colapsados; se conservan mayúsculas y tildes porque el
+    # modelo las distingue
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+def clave_cache(modelo: str, texto: str) -> str:
+    return hashlib.sha256(f"{modelo}\0{normalizar_texto(texto)}".encode("utf-8")).hexdigest()
+
+
+class CacheEmbeddings:
+    """
+    Caché persistente de embeddings en un fichero SQLite, direccionada por contenido:
+    la clave es el hash de (modelo, texto normalizado), así un mismo texto se codifica
+    una sola vez aunque aparezca en varias colecciones, en varias cargas o en
+    consultas. La usan scripts/embedding_create.py y la búsqueda de APISEARCH.
+
+    El fichero está en modo WAL para que varios procesos puedan leerlo a la vez. El
+    tamaño se limita a `max_entradas`, expulsando las menos usadas recientemente; el
+    número de filas se lleva de forma aproximada y solo se recuenta al expulsar.
+
+    Las operaciones se serializan con un candado, así se puede usar desde varios
+    hilos (la API la llama con asyncio.to_thread para no bloquear el bucle de eventos).
+    `espera` es el máximo de segundos esperando el bloqueo de escritura de otro proceso.
+    """
+
+    def __init__(self, ruta: str, modelo: str, max_entradas: int = MAX_ENTRADAS, espera: float = 30):
+        self.modelo = modelo
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._candado = threading.Lock()
+        # Último uso de las claves leídas que aún no se ha escrito en el fichero
+        self._usos = {}
+        self._insertados = 0
+        self.conexion = sqlite3.connect(ruta, timeout=espera, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "clave TEXT PRIMARY KEY, vector BLOB NOT NULL, ultimo_uso REAL NOT NULL)"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS embeddings_ultimo_uso ON embeddings (ultimo_uso)")
+        self.conexion.commit()
+        (self._filas,) = self.conexion.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def obtener_muchos(self, textos: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embedding de cada texto o None si no está en la caché.
+        """
+        claves = [clave_cache(self.modelo, texto) for texto in textos]
+        encontrados = {}
+        with self._candado:
+            for i in range(0, len(claves), TAM_CONSULTA):
+                trozo = claves[i:i + TAM_CONSULTA]
+                marcas = ",".join("?" * len(trozo))
+                filas = self.conexion.execute(
+                    f"SELECT clave, vector FROM embeddings WHERE clave IN ({marcas})", trozo
+                ).fetchall()
+                encontrados.update((clave, np.frombuffer(vector, dtype=np.float32)) for clave, vector in filas)
+
+            ahora = time.time()
+            self._usos.update((clave, ahora) for clave in encontrados)
+            if len(self._usos) >= TAM_USOS:
+                self._escribir_usos()
+                self.conexion.commit()
+            resultado = [encontrados.get(clave) for clave in claves]
+            fallos = sum(vector is None for vector in resultado)
+            self.aciertos += len(resultado) - fallos
+            self.fallos += fallos
+        return resultado
+
+    def obtener(self, texto: str) -> Optional[np.ndarray]:
+        return self.obtener_muchos([texto])[0]
+
+    def guardar_muchos(self, textos: List[str], vectores):
+        ahora = time.time()
+        filas = [
+            (clave_cache(self.modelo, texto), np.asarray(vector, dtype=np.float32).tobytes(), ahora)
+            for texto, vector in zip(textos, vectores)
+        ]
+        with self._candado:
+            self._escribir_usos()
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO embeddings (clave, vector, ultimo_uso) VALUES (?, ?, ?)", filas
+            )
+            self.conexion.commit()
+            # Las claves que ya estaban se cuentan también: la cuenta solo puede pasarse
+            self._filas += len(filas)
+            self._insertados += len(filas)
+            if self._insertados >= EXPULSAR_CADA and self._filas > self.max_entradas:
+                self._expulsar()
+
+    def guardar(self, texto: str, vector):
+        self.guardar_muchos([texto], [vector])
+
+    def _escribir_usos(self):
+        # Sin commit: se confirma con la escritura que lo llama
+        if self._usos:
+            self.conexion.executemany(
+                "UPDATE embeddings SET ultimo_uso = ? WHERE clave = ?",
+                [(ahora, clave) for clave, ahora in self._usos.items()]
+            )
+            self._usos = {}
+
+    def _expulsar(self):
+        self._insertados = 0
+        (self._filas,) = self.conexion.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if self._filas > self.max_entradas:
+            self.conexion.execute(
+                "DELETE FROM embeddings WHERE clave IN "
+                "(SELECT clave FROM embeddings ORDER BY ultimo_uso LIMIT ?)",
+                (self._filas - self.max_entradas,)
+            )
+            self.conexion.commit()
+            self._filas = self.max_entradas
+
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+        }
+
+    def cerrar(self):
+        with self._candado:
+            self._escribir_usos()
+            self.conexion.commit()
+            self.conexion.close()
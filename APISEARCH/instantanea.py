@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FICHERO_MANIFIESTO = "manifiesto.json"
+
+
+class InstantaneaEmbeddings:
+    """
+    Instantánea de embeddings exportada por scripts/embedding_create.py --exportar.
+    Los ficheros .npy se abren con mmap_mode='r': abrirla es casi instantáneo, solo
+    se leen del disco las páginas de los vectores consultados y esas páginas las
+    comparte el sistema operativo entre todos los workers del servidor.
+    """
+
+    def __init__(self, carpeta: str):
+        with open(os.path.join(carpeta, FICHERO_MANIFIESTO), "r", encoding="utf-8") as fichero:
+            self.manifiesto = json.load(fichero)
+        self.filas_por_fragmento = self.manifiesto["filas_por_fragmento"]
+        self.colecciones = {}
+        for nombre, info in self.manifiesto["colecciones"].items():
+            ruta = os.path.join(carpeta, nombre)
+            self.colecciones[nombre] = {
+                "ids": np.load(os.path.join(ruta, info["ids"]), mmap_mode="r"),
+                "hashes": np.load(os.path.join(ruta, info["hashes"]), mmap_mode="r"),
+                "fragmentos": [np.load(os.path.join(ruta, f), mmap_mode="r") for f in info["fragmentos"]],
+            }
+        # Colecciones por nombre sin prefijo, para las consultas que no coinciden exactamente
+        self.por_nombre_base = {}
+        for nombre in self.colecciones:
+            self.por_nombre_base.setdefault(nombre.split('.')[-1], []).append(nombre)
+
+    @property
+    def modelo(self) -> str:
+        return self.manifiesto["modelo"]
+
+    def vector(self, coleccion: str, id, embedding_hash: Optional[str]) -> Optional[np.ndarray]:
+        """
+        Embedding (float32) de un documento o None si no está en la instantánea o si
+        su `embedding_hash` en MongoDB ya no es el exportado (el embedding se regeneró
+        después de exportar y el vector guardado está obsoleto).
+        Se busca primero la colección con el mismo nombre; si no está, la única con el
+        mismo nombre sin prefijo ("Proyecto.tesis" o "tesis"). Si hay varias con ese
+        nombre base ninguna es la pedida y se devuelve None.
+        """
+        datos = self.colecciones.get(coleccion)
+        if datos is None:
+            candidatas = self.por_nombre_base.get(coleccion.split('.')[-1], [])
+            if len(candidatas) != 1:
+                return None
+            datos = self.colecciones[candidatas[0]]
+        ids = datos["ids"]
+        id = str(id)
+        fila = int(np.searchsorted(ids, id))
+        if fila >= len(ids) or ids[fila] != id or datos["hashes"][fila] != (embedding_hash or ""):
+            return None
+        fragmento, posicion = divmod(fila, self.filas_por_fragmento)
+        return np.asarray(datos["fragmentos"][fragmento][posicion], dtype=np.float32)
+
+
+def cargar_instantanea(carpeta: Optional[str], modelo: str) -> Optional[InstantaneaEmbeddings]:
+    """
+    Abre la instantánea de `carpeta` si existe y se generó con el mismo modelo que
+    codifica las consultas; si no, devuelve None y los embeddings se leen de MongoDB.
+    """
+    if not carpeta:
+        return None
+    try:
+        instantanea = InstantaneaEmbeddings(carpeta)
+    except KeyError as e:
+        # Instantáneas exportadas antes de guardar el embedding_hash de cada fila: no
+        # se puede saber qué vectores siguen vigentes
+        logger.warning(f"La instantánea de embeddings en {carpeta} no tiene {e}; se ignora (hay que volver a exportarla)")
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"No se pudo abrir la instantánea de embeddings en {carpeta}: {e}")
+        return None
+    if instantanea.modelo != modelo:
+        logger.warning(f"Instantánea generada con {instantanea.modelo} y las consultas usan {modelo}; se ignora")
+        return None
+    documentos = sum(info["documentos"] for info in instantanea.manifiesto["colecciones"].values())
+    logger.info(f"Instantánea de embeddings cargada: {documentos} documentos, "
+                f"versión del corpus {instantanea.manifiesto['version_corpus']}")
+    return instantanea
@@ -3,6 +3,8 @@ from fastapi import FastAPI, HTTPException
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional, Dict, Union
 from pydantic import BaseModel
+import asyncio
+import sqlite3
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import time
@@ -16,6 +18,8 @@ from fuzzywuzzy import process
 from spellchecker import SpellChecker
 from datetime import datetime
 from pymongo import MongoClient
+from instantanea import cargar_instantanea
+from cache_embeddings import CacheEmbeddings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -80,12 +84,17 @@ app.add_middleware(
     allow_headers=["*", "ngrok-skip-browser-warning"],
 )
 
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+NOMBRE_MODELO = 'paraphrase-multilingual-MiniLM-L12-v2'
+# Segundos máximos que una consulta espera al fichero de la caché si otro proceso
+# está escribiendo en él; después se codifica sin caché
+ESPERA_CACHE = 2
+model = SentenceTransformer(NOMBRE_MODELO)
 
 class SearchService:
-    def __init__(self, db):
+    def __init__(self, db, cache=None):
         self.db = db
         self.model = model
+        self.cache = cache
 
     def normalize_author_name(self, name: str) -> List[str]:
         variants = [name]
@@ -129,6 +138,21 @@ class SearchService:
 
     async def generate_embedding(self, text: str) -> np.ndarray:
         try:
+            if self.cache:
+                # SQLite en un hilo: mientras espera al fichero (p. ej. si embedding_create.py
+                # está escribiendo) el bucle de eventos sigue atendiendo otras peticiones
+                try:
+                    embedding = await asyncio.to_thread(self.cache.obtener, text)
+                except sqlite3.Error as e:
+                    logger.warning(f"Caché de embeddings no disponible: {e}")
+                    return self.model.encode(text)
+                if embedding is None:
+                    embedding = self.model.encode(text)
+                    try:
+                        await asyncio.to_thread(self.cache.guardar, text, embedding)
+                    except sqlite3.Error as e:
+                        logger.warning(f"No se pudo guardar el embedding en la caché: {e}")
+                return embedding
             return self.model.encode(text)
         except Exception as e:
             logger.error(f"Error generando embedding: {e}")
@@ -215,8 +239,14 @@ async def startup_clients():
     try:
         app.mongodb_client = AsyncIOMotorClient(mongodb_url)
         app.mongodb = app.mongodb_client.get_database("Proyecto")
-        app.search_service = SearchService(app.mongodb)
+        # Caché de embeddings de las consultas (fichero SQLite opcional)
+        ruta_cache = os.getenv("CACHE_EMBEDDINGS")
+        app.search_service = SearchService(
+            app.mongodb, CacheEmbeddings(ruta_cache, NOMBRE_MODELO, espera=ESPERA_CACHE) if ruta_cache else None
+        )
         app.nlp_processor = NLPProcessor()
+        # Carpeta con la instantánea .npy de embeddings (opcional)
+        app.instantanea = cargar_instantanea(os.getenv("INSTANTANEA_EMBEDDINGS"), NOMBRE_MODELO)
         await app.mongodb.command("ping")
         logger.info("Conectado a MongoDB Atlas")
     except Exception as e:
@@ -226,6 +256,8 @@ async def startup_clients():
 @app.on_event("shutdown")
 async def shutdown_clients():
     app.mongodb_client.close()
+    if app.search_service.cache:
+        app.search_service.cache.cerrar()
     logger.info("Conexión a MongoDB cerrada")
 
 @app.get("/search/", response_model=SearchResponse)
@@ -259,11 +291,33 @@ async def search(query: str, tipo: Optional[str] = None, limit: int = 10):
                 ]
             }
             
-            cursor = collection.find(search_query)
+            # Con instantánea los vectores se leen del disco y no se descargan de MongoDB;
+            # la proyección conserva embedding_hash para comprobar que siguen vigentes
+            proyeccion = {"embedding": 0, "embedding_text": 0} if app.instantanea else None
+            cursor = collection.find(search_query, proyeccion)
             logger.info(f"Buscando en colección {collection_name} con query: {search_query}")
 
+            encontrados = []  # (documento, embedding o None si hay que leerlo de MongoDB)
             async for doc in cursor:
-                doc_embedding = np.array(doc.get("embedding", []))
+                if app.instantanea:
+                    doc_embedding = app.instantanea.vector(collection_name, doc["_id"], doc.get("embedding_hash"))
+                else:
+                    doc_embedding = np.array(doc.get("embedding", []))
+                encontrados.append((doc, doc_embedding))
+
+            # Documentos posteriores a la instantánea o con el embedding regenerado después
+            # de exportarla: sus embeddings se leen de MongoDB en una sola consulta y no
+            # con una por documento
+            faltan = [doc["_id"] for doc, doc_embedding in encontrados if doc_embedding is None]
+            embeddings = {}
+            if faltan:
+                logger.warning(f"{len(faltan)} documentos de {collection_name} no están al día en la instantánea de embeddings")
+                async for con_embedding in collection.find({"_id": {"$in": faltan}}, {"embedding": 1}):
+                    embeddings[con_embedding["_id"]] = con_embedding.get("embedding", [])
+
+            for doc, doc_embedding in encontrados:
+                if doc_embedding is None:
+                    doc_embedding = np.array(embeddings.get(doc["_id"]) or [])
                 similarity_score = 0.5 if autor_ids else 0.3
 
                 if doc_embedding.size > 0:
@@ -397,11 +451,14 @@ async def get_autocomplete_suggestions(query: str, limit: int = 5, search_type:
 async def test_connection():
    try:
        await app.mongodb.command("ping")
-       return {
+       respuesta = {
            "status": "success",
            "message": "Conectado a MongoDB Atlas",
            "database": "Proyecto"
        }
+       if app.search_service.cache:
+           respuesta["cache_embeddings"] = app.search_service.cache.estadisticas()
+       return respuesta
    except Exception as e:
        return {
            "status": "error",
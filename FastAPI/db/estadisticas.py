@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timezone
+from db.pipelines import NO_ELIMINADO
+
+# Colecciones incluidas en las estadísticas
+COLECCIONES = ["autores", "publicaciones", "tesis", "patentes", "proyectos"]
+
+# Campo de fecha usado para el desglose por año de cada colección
+CAMPOS_FECHA = {
+    "publicaciones": "Fecha_de_publicación",
+    "tesis": "Fecha_de_publicación",
+    "patentes": "Fecha_de_publicación",
+    "proyectos": "Fecha de inicio",
+}
+
+# Documento materializado donde se guardan las estadísticas tras la ingesta
+COLECCION_ESTADISTICAS = "estadisticas"
+ESTADISTICAS_ID = "global"
+
+# Segundos que las estadísticas permanecen en la caché en memoria
+TTL_CACHE = 300
+
+_cache = {"datos": None, "expira": 0.0}
+
+
+def expresion_anio(campo: str) -> dict:
+    """
+    Expresión de agregación que extrae el año de un campo de fecha en texto
+    ("2020", "21-11-2014", ...). Se usa junto a {"$ifNull": ["$<alias>.match", "Sin fecha"]}.
+    """
+    return {"$regexFind": {
+        "input": {"$convert": {"input": f"${campo}", "to": "string", "onError": "", "onNull": ""}},
+        "regex": r"\d{4}"
+    }}
+
+
+def pipeline_por_anio(campo: str) -> list[dict]:
+    """
+    Construye el pipeline que cuenta documentos por año. Los documentos sin año
+    reconocible se agrupan bajo la clave "Sin fecha".
+    """
+    return [
+        {"$match": NO_ELIMINADO},
+        {"$project": {"anio": expresion_anio(campo)}},
+        {"$group": {"_id": {"$ifNull": ["$anio.match", "Sin fecha"]}, "total": {"$sum": 1}}},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+def calcular_estadisticas(db) -> dict:
+    """
+    Calcula los totales por colección con estimated_document_count (lee los metadatos
+    de la colección, sin recorrerla) y el desglose por año de cada colección de trabajos.
+    """
+    # Los documentos marcados como eliminados se descuentan usando el índice disperso de "eliminado"
+    totales = {
+        nombre: db[nombre].estimated_document_count() - db[nombre].count_documents({"eliminado": True})
+        for nombre in COLECCIONES
+    }
+
+    por_coleccion = {}
+    por_anio = {}
+    for nombre, campo in CAMPOS_FECHA.items():
+        por_coleccion[nombre] = {}
+        for fila in db[nombre].aggregate(pipeline_por_anio(campo)):
+            por_coleccion[nombre][fila["_id"]] = fila["total"]
+            por_anio.setdefault(fila["_id"], {})[nombre] = fila["total"]
+
+    return {
+        "totales": totales,
+        "por_anio": dict(sorted(por_anio.items())),
+        "por_coleccion": por_coleccion,
+        "actualizado": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def refrescar_estadisticas(db) -> dict:
+    """
+    Recalcula las estadísticas y las guarda como documento materializado.
+    Debe llamarse al terminar cada ingesta.
+    """
+    datos = calcular_estadisticas(db)
+    db[COLECCION_ESTADISTICAS].replace_one({"_id": ESTADISTICAS_ID}, {"_id": ESTADISTICAS_ID, **datos}, upsert=True)
+    invalidar_cache()
+    return datos
+
+
+def obtener_estadisticas(db, forzar: bool = False) -> dict:
+    """
+    Devuelve las estadísticas desde la caché en memoria. Si ha expirado se lee el
+    documento materializado y, si todavía no existe, se calcula y se guarda.
+    """
+    ahora = time.monotonic()
+    if not forzar and _cache["datos"] is not None and ahora < _cache["expira"]:
+        return _cache["datos"]
+
+    datos = None if forzar else db[COLECCION_ESTADISTICAS].find_one({"_id": ESTADISTICAS_ID}, {"_id": 0})
+    if not datos:
+        datos = refrescar_estadisticas(db)
+
+    _cache["datos"] = datos
+    _cache["expira"] = ahora + TTL_CACHE
+    return datos
+
+
+def invalidar_cache():
+    _cache["datos"] = None
+    _cache["expira"] = 0.0
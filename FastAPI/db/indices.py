@@ -0,0 +1,105 @@
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from db.pipelines import CAMPOS_AUTOR, NO_ELIMINADO, pipeline_por_autor, pipeline_por_id
+
+# Comunes a todas las colecciones con embeddings (ver scripts/texto_embedding.py)
+INDICES_EMBEDDING = [
+    IndexModel([("embedding_pendiente", ASCENDING)], name="embedding_pendiente", sparse=True),
+    IndexModel([("embedding_model", ASCENDING), ("embedding_version", ASCENDING)], name="embedding_modelo_version"),
+]
+
+# Índices necesarios por colección. Cubren:
+#   - las búsquedas por autor de /{tipo}/autor/{id} (multikey + orden de paginación),
+#   - el orden de paginación de /autores,
+#   - las búsquedas por Título de la ingesta,
+#   - el upsert de autores por URL_del_perfil,
+#   - el recuento de documentos marcados como eliminados en la carga incremental,
+#   - la selección de embeddings pendientes o desactualizados de embedding_create.py
+#     (embedding_pendiente; embedding_model + embedding_version).
+INDICES = {
+    "autores": [
+        IndexModel([("URL_del_perfil", ASCENDING)], name="url_del_perfil_unico", unique=True),
+        IndexModel([("Nombre", ASCENDING), ("_id", ASCENDING)], name="nombre_id"),
+        IndexModel([("eliminado", ASCENDING)], name="eliminado", sparse=True),
+        *INDICES_EMBEDDING,
+    ],
+    **{
+        coleccion: [
+            IndexModel([("Título", ASCENDING), ("_id", ASCENDING)], name="titulo_id"),
+            *[
+                IndexModel([(campo, ASCENDING), ("Título", ASCENDING), ("_id", ASCENDING)],
+                           name=f"{campo.lower().replace('/', '_')}_titulo_id")
+                for campo in campos
+            ],
+            IndexModel([("eliminado", ASCENDING)], name="eliminado", sparse=True),
+            *INDICES_EMBEDDING,
+        ]
+        for coleccion, campos in CAMPOS_AUTOR.items()
+    },
+}
+
+
+def aplicar_indices(db) -> dict:
+    """
+    Crea los índices declarados en INDICES. create_indexes no hace nada si el índice
+    ya existe con la misma especificación, por lo que puede llamarse en cada arranque.
+    Devuelve los nombres de los índices por colección.
+    """
+    return {coleccion: db[coleccion].create_indexes(modelos) for coleccion, modelos in INDICES.items()}
+
+
+def consultas_a_verificar() -> list[tuple[str, str, list[dict]]]:
+    """
+    Pipelines de los routers con un id de ejemplo, para comprobar su plan de ejecución.
+    """
+    id = str(ObjectId())
+    consultas = [("autores /", "autores", [{"$match": NO_ELIMINADO}, {"$sort": {"Nombre": 1, "_id": 1}}])]
+    for coleccion in CAMPOS_AUTOR:
+        consultas.append((f"{coleccion} /{{id}}", coleccion, pipeline_por_id(coleccion, id)))
+        consultas.append((f"{coleccion} /autor/{{id}}", coleccion, pipeline_por_autor(coleccion, id)))
+    return consultas
+
+
+def _etapas(plan) -> list[str]:
+    # Recorre el resultado de explain() y devuelve todas las etapas ("stage") encontradas
+    if isinstance(plan, dict):
+        etapas = [plan["stage"]] if isinstance(plan.get("stage"), str) else []
+        for valor in plan.values():
+            etapas.extend(_etapas(valor))
+        return etapas
+    if isinstance(plan, list):
+        return [etapa for valor in plan for etapa in _etapas(valor)]
+    return []
+
+
+def verificar_planes(db) -> dict:
+    """
+    Ejecuta explain() sobre cada pipeline de los routers y devuelve las consultas
+    cuyo plan incluye un COLLSCAN, con la lista de etapas del plan.
+    """
+    fallos = {}
+    for nombre, coleccion, pipeline in consultas_a_verificar():
+        plan = db[coleccion].database.command(
+            "explain",
+            {"aggregate": db[coleccion].name, "pipeline": pipeline, "cursor": {}},
+            verbosity="queryPlanner"
+        )
+        etapas = _etapas(plan)
+        if "COLLSCAN" in etapas:
+            fallos[nombre] = etapas
+    return fallos
+
+
+# Aplica los índices y verifica los planes: python -m db.indices (desde la carpeta FastAPI)
+if __name__ == "__main__":
+    from db.client import db_client
+
+    for coleccion, nombres in aplicar_indices(db_client.Proyecto).items():
+        print(f"{coleccion}: {', '.join(nombres)}")
+
+    fallos = verificar_planes(db_client.Proyecto)
+    for nombre, etapas in fallos.items():
+        print(f"COLLSCAN en {nombre}: {' -> '.join(etapas)}")
+    if fallos:
+        raise SystemExit(1)
+    print("Todas las consultas usan índices")
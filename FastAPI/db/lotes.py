@@ -0,0 +1,30 @@
+from bson import ObjectId
+from db.pipelines import NO_ELIMINADO
+
+# Número máximo de ids admitidos en una consulta por lotes
+MAX_IDS_LOTE = 300
+
+
+def buscar_lote(coleccion, ids: list[str], lookups: list[dict], schema) -> dict:
+    """
+    Resuelve una lista de ids con un único $match por $in seguido de los $lookup
+    indicados. Devuelve los documentos en el orden de la petición (sin repetidos)
+    y la lista de ids que no existen o no son ObjectId válidos.
+    """
+    pedidos = []
+    for id in dict.fromkeys(ids):
+        pedidos.append((id, ObjectId(id) if ObjectId.is_valid(id) else None))
+
+    object_ids = [oid for _, oid in pedidos if oid is not None]
+    pipeline = [{"$match": {"_id": {"$in": object_ids}, **NO_ELIMINADO}}, *lookups]
+    encontrados = {doc["_id"]: doc for doc in coleccion.aggregate(pipeline)} if object_ids else {}
+
+    resultados = []
+    no_encontrados = []
+    for id, oid in pedidos:
+        if oid in encontrados:
+            resultados.append(schema(encontrados[oid]))
+        else:
+            no_encontrados.append(id)
+
+    return {"resultados": resultados, "no_encontrados": no_encontrados}
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+class Estadisticas(BaseModel):
+    totales: dict[str, int]
+    por_anio: dict[str, dict[str, int]]
+    por_coleccion: dict[str, dict[str, int]]
+    actualizado: str
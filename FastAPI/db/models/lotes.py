@@ -0,0 +1,12 @@
+from typing import Generic, TypeVar
+from pydantic import BaseModel, Field
+from db.lotes import MAX_IDS_LOTE
+
+T = TypeVar("T")
+
+class LoteIds(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=MAX_IDS_LOTE)
+
+class ResultadoLote(BaseModel, Generic[T]):
+    resultados: list[T]
+    no_encontrados: list[str]
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+class ResumenTrabajo(BaseModel):
+    id: str
+    Título: str | None
+    anio: str
+
+class PerfilColeccion(BaseModel):
+    total: int
+    primeros: list[ResumenTrabajo]
+    anios: dict[str, int]
+
+class PerfilAutor(BaseModel):
+    id: str
+    Nombre: str
+    Email: str | None
+    publicaciones: PerfilColeccion
+    tesis: PerfilColeccion
+    patentes: PerfilColeccion
+    proyectos: PerfilColeccion
+    coautores: list[str]
@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+from db.estadisticas import CAMPOS_FECHA, expresion_anio
+from db.pipelines import CAMPOS_AUTOR, NO_ELIMINADO
+
+# Vista materializada con un documento por autor (_id = id del autor)
+COLECCION_PERFILES = "autor_perfiles"
+
+# Número de resúmenes guardados por colección (tamaño de página por defecto de fastapi-pagination)
+TAM_PRIMERA_PAGINA = 50
+
+
+def _solo_object_ids(expresion) -> dict:
+    # Las tesis pueden guardar nombres en texto cuando no se pudo identificar al autor
+    return {"$filter": {"input": expresion, "cond": {"$eq": [{"$type": "$$this"}, "objectId"]}}}
+
+
+def _participantes(coleccion: str) -> dict:
+    return _solo_object_ids({"$setUnion": [{"$ifNull": [f"${campo}", []]} for campo in CAMPOS_AUTOR[coleccion]]})
+
+
+def pipeline_perfiles(coleccion: str, destino: str) -> list[dict]:
+    """
+    Agrupa una colección de trabajos por autor y fusiona el resultado en la vista de
+    perfiles: total de trabajos, primera página de resúmenes (mismo orden que
+    /{tipo}/autor/{id}) e histograma por año.
+
+    Se agrupa primero por (autor, año) guardando solo los TAM_PRIMERA_PAGINA primeros
+    trabajos de cada grupo ($topN) y después por autor, así ningún grupo acumula
+    todos los trabajos de un autor ni hace falta ordenar la colección completa.
+    """
+    primeros = {"$reduce": {"input": "$trabajos", "initialValue": [], "in": {"$concatArrays": ["$$value", "$$this"]}}}
+
+    return [
+        {"$match": NO_ELIMINADO},
+        {"$project": {
+            "Título": 1,
+            "anio": expresion_anio(CAMPOS_FECHA[coleccion]),
+            "autor": _participantes(coleccion)
+        }},
+        {"$addFields": {"anio": {"$ifNull": ["$anio.match", "Sin fecha"]}}},
+        {"$unwind": "$autor"},
+        {"$group": {
+            "_id": {"autor": "$autor", "anio": "$anio"},
+            "total": {"$sum": 1},
+            "trabajos": {"$topN": {
+                "n": TAM_PRIMERA_PAGINA,
+                "sortBy": {"Título": 1, "_id": 1},
+                "output": {"_id": "$_id", "Título": "$Título", "anio": "$anio"}
+            }}
+        }},
+        {"$group": {
+            "_id": "$_id.autor",
+            "total": {"$sum": "$total"},
+            "anios": {"$push": {"k": "$_id.anio", "v": "$total"}},
+            "trabajos": {"$push": "$trabajos"}
+        }},
+        {"$project": {
+            coleccion: {
+                "total": "$total",
+                "primeros": {"$map": {
+                    "input": {"$firstN": {
+                        "n": TAM_PRIMERA_PAGINA,
+                        "input": {"$sortArray": {"input": primeros, "sortBy": {"Título": 1, "_id": 1}}}
+                    }},
+                    "in": {"id": {"$toString": "$$this._id"}, "Título": "$$this.Título", "anio": "$$this.anio"}
+                }},
+                "anios": {"$arrayToObject": "$anios"}
+            }
+        }},
+        {"$merge": {
+            "into": destino,
+            "on": "_id",
+            "whenMatched": [{"$set": {coleccion: "$$new." + coleccion}}],
+            "whenNotMatched": "discard"
+        }}
+    ]
+
+
+def pipeline_coautores(coleccion: str, destino: str) -> list[dict]:
+    """
+    Añade a la vista de perfiles los coautores de cada autor en una colección de
+    trabajos. Con $addToSet cada grupo guarda solo los coautores distintos, no la
+    lista de participantes de cada trabajo.
+    """
+    return [
+        {"$match": NO_ELIMINADO},
+        {"$project": {"autor": _participantes(coleccion)}},
+        {"$addFields": {"coautor": "$autor"}},
+        {"$unwind": "$autor"},
+        {"$unwind": "$coautor"},
+        {"$match": {"$expr": {"$ne": ["$autor", "$coautor"]}}},
+        {"$group": {"_id": "$autor", "coautores": {"$addToSet": "$coautor"}}},
+        {"$merge": {
+            "into": destino,
+            "on": "_id",
+            "whenMatched": [{"$set": {
+                "coautores": {"$setUnion": [{"$ifNull": ["$coautores", []]}, "$$new.coautores"]}
+            }}],
+            "whenNotMatched": "discard"
+        }}
+    ]
+
+
+def construir_perfiles(db) -> int:
+    """
+    Reconstruye la vista materializada de perfiles de autor. Se ejecuta al terminar la
+    ingesta: primero crea un perfil vacío por autor y después fusiona en él los datos
+    de cada colección de trabajos. Devuelve el número de perfiles.
+    """
+    destino = db[COLECCION_PERFILES].name
+    marca = datetime.now(timezone.utc)
+    vacio = {"total": 0, "primeros": {"$literal": []}, "anios": {"$literal": {}}}
+
+    db["autores"].aggregate([
+        {"$match": NO_ELIMINADO},
+        {"$project": {
+            "Nombre": 1,
+            "Email": 1,
+            "coautores": {"$literal": []},
+            **{coleccion: vacio for coleccion in CAMPOS_AUTOR},
+            "actualizado": {"$literal": marca}
+        }},
+        {"$merge": {"into": destino, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ], allowDiskUse=True)
+    # Los grupos pueden superar el límite de memoria de un stage con colecciones grandes
+    for coleccion in CAMPOS_AUTOR:
+        db[coleccion].aggregate(pipeline_perfiles(coleccion, destino), allowDiskUse=True)
+        db[coleccion].aggregate(pipeline_coautores(coleccion, destino), allowDiskUse=True)
+
+    # Eliminar perfiles de autores que ya no existen
+    db[COLECCION_PERFILES].delete_many({"actualizado": {"$lt": marca}})
+    return db[COLECCION_PERFILES].estimated_document_count()
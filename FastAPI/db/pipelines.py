@@ -0,0 +1,41 @@
+from bson import ObjectId
+
+# Campos de cada colección que referencian documentos de la colección de autores
+CAMPOS_AUTOR = {
+    "publicaciones": ["Autores"],
+    "tesis": ["Autores", "Director/a"],
+    "patentes": ["Autores"],
+    "proyectos": ["Investigadores"],
+}
+
+# Los documentos que desaparecen del corpus en una carga incremental se marcan con
+# eliminado=True en lugar de borrarse
+NO_ELIMINADO = {"eliminado": {"$ne": True}}
+
+
+def lookup_autores(campo: str) -> dict:
+    return {"$lookup": {
+        "from": "autores",
+        "localField": campo,
+        "foreignField": "_id",
+        "as": campo
+    }}
+
+
+def lookups(coleccion: str) -> list[dict]:
+    return [lookup_autores(campo) for campo in CAMPOS_AUTOR.get(coleccion, [])]
+
+
+def pipeline_por_id(coleccion: str, id: str) -> list[dict]:
+    return [{"$match": {"_id": ObjectId(id), **NO_ELIMINADO}}, *lookups(coleccion)]
+
+
+def pipeline_por_autor(coleccion: str, id: str) -> list[dict]:
+    # El $sort va antes de los $lookup para que pueda resolverse con el índice
+    # compuesto (campo de autor, Título, _id) en lugar de ordenar en memoria
+    campos = CAMPOS_AUTOR[coleccion]
+    if len(campos) == 1:
+        match = {campos[0]: ObjectId(id)}
+    else:
+        match = {"$or": [{campo: ObjectId(id)} for campo in campos]}
+    return [{"$match": {**match, **NO_ELIMINADO}}, {"$sort": {"Título": 1, "_id": 1}}, *lookups(coleccion)]
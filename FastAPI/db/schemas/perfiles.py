@@ -0,0 +1,12 @@
+from db.schemas.utilidades_schemas.utilidad_schema import autores_schema
+
+
+def perfil_schema(perfil) -> dict:
+    return {"id": perfil["_id"].__str__(), 
+            "Nombre": perfil["Nombre"], 
+            "Email": perfil.get("Email"),
+            "publicaciones": perfil["publicaciones"],
+            "tesis": perfil["tesis"],
+            "patentes": perfil["patentes"],
+            "proyectos": perfil["proyectos"],
+            "coautores": autores_schema(perfil["coautores"])}
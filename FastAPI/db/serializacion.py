@@ -0,0 +1,41 @@
+import math
+import os
+from fastapi.responses import ORJSONResponse
+from fastapi_pagination import paginate
+from fastapi_pagination.api import resolve_params
+
+# Ruta rápida opcional: SERIALIZACION_RAPIDA=1 en el entorno.
+# Los *_schema ya producen diccionarios con tipos JSON a partir de datos de la BD,
+# así que se serializan directamente con orjson y FastAPI no vuelve a validarlos
+# contra el response_model (al devolver un Response, FastAPI lo envía tal cual).
+SERIALIZACION_RAPIDA = os.getenv("SERIALIZACION_RAPIDA", "0") == "1"
+
+
+def responder(datos):
+    """
+    Devuelve un ORJSONResponse si la ruta rápida está activa, o los datos sin tocar
+    para que FastAPI los valide y serialice como siempre.
+    """
+    if SERIALIZACION_RAPIDA:
+        return ORJSONResponse(datos)
+    return datos
+
+
+def paginar(items: list):
+    """
+    Equivalente a fastapi_pagination.paginate. En la ruta rápida construye la página
+    (items, total, page, size, pages) sin crear el modelo Page de pydantic.
+    """
+    if not SERIALIZACION_RAPIDA:
+        return paginate(items)
+
+    params = resolve_params()
+    inicio = (params.page - 1) * params.size
+    total = len(items)
+    return ORJSONResponse({
+        "items": items[inicio:inicio + params.size],
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": math.ceil(total / params.size) if params.size else 0,
+    })
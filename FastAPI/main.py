@@ -1,7 +1,9 @@
 from fastapi import FastAPI
-from routers import autores_db, publicaciones_db, tesis_db, proyecto_db, patentes_db
+from routers import autores_db, publicaciones_db, tesis_db, proyecto_db, patentes_db, estadisticas_db
 from fastapi_pagination import add_pagination
 from fastapi.middleware.cors import CORSMiddleware
+from db.client import db_client
+from db.indices import aplicar_indices
 
 
 app = FastAPI() 
@@ -10,6 +12,7 @@ app.include_router(publicaciones_db.router)
 app.include_router(tesis_db.router)
 app.include_router(proyecto_db.router)
 app.include_router(patentes_db.router)
+app.include_router(estadisticas_db.router)
 add_pagination(app) 
 
 #Inicia el server: uvicorn main:app --reload
@@ -26,6 +29,11 @@ app.add_middleware(
     allow_headers=["*"],  # Headers permitidos en las solicitudes
 )
 
+# Crea los índices que necesitan los routers (no hace nada si ya existen)
+@app.on_event("startup")
+def crear_indices():
+    aplicar_indices(db_client.Proyecto)
+
 @app.get("/")
 def read_root():
     return {"message": "CORS configurado correctamente"}
@@ -2,8 +2,16 @@ from fastapi import APIRouter, HTTPException, status
 from bson import ObjectId
 from db.schemas.autores import autores_schema, autor_schema
 from db.client import db_client
+from db.lotes import buscar_lote
+from db.pipelines import NO_ELIMINADO
+from db.models.lotes import LoteIds, ResultadoLote
+from db.estadisticas import obtener_estadisticas
 from db.models.autores import Autor
-from fastapi_pagination import Page, paginate
+from db.models.perfiles import PerfilAutor
+from db.schemas.perfiles import perfil_schema
+from db.perfiles import COLECCION_PERFILES
+from fastapi_pagination import Page
+from db.serializacion import paginar, responder
 
 
 
@@ -16,16 +24,28 @@ router = APIRouter(prefix="/autores",
 # Encuentra todos los autores
 @router.get("/", response_model=Page[Autor]) 
 async def autores() -> Page[Autor]:
-    return paginate(autores_schema(db_client.Proyecto.autores.find({}).sort({"Nombre": 1, "_id": 1}).to_list()))
+    return paginar(autores_schema(db_client.Proyecto.autores.find(NO_ELIMINADO).sort({"Nombre": 1, "_id": 1}).to_list()))
 
 # Cuenta todos los autores
 @router.get("/count", response_model=int)
 async def count_autores():
-    count = db_client.Proyecto.autores.count_documents({})
+    count = obtener_estadisticas(db_client.Proyecto)["totales"]["autores"]
     return count
 
+# Devuelve el perfil materializado de un autor (contadores, primeras páginas, coautores y años)
+@router.get("/{id}/perfil", response_model=PerfilAutor)
+async def perfil_autor(id: str):
+    perfil = db_client.Proyecto[COLECCION_PERFILES].find_one({"_id": ObjectId(id)})
+    if not perfil:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil no encontrado")
+    return responder(perfil_schema(perfil))
+
 # Encuentra un autor por du id
 @router.get("/{id}", response_model=Autor)
 async def autor(id: str):
-    return autor_schema(db_client.Proyecto.autores.find_one({"_id": ObjectId(id)}))
+    return responder(autor_schema(db_client.Proyecto.autores.find_one({"_id": ObjectId(id), **NO_ELIMINADO})))
 
+# Encuentra varios autores por sus ids con una sola consulta, en el orden pedido
+@router.post("/batch", response_model=ResultadoLote[Autor])
+async def autores_lote(lote: LoteIds) -> ResultadoLote[Autor]:
+    return responder(buscar_lote(db_client.Proyecto.autores, lote.ids, [], autor_schema))
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, status
+from db.client import db_client
+from db.estadisticas import obtener_estadisticas, refrescar_estadisticas
+from db.models.estadisticas import Estadisticas
+
+
+
+router = APIRouter(prefix="/stats", 
+                   tags=["stats"],
+                   responses={status.HTTP_404_NOT_FOUND: {"message": "No encontrado"}})
+
+
+# Devuelve todos los contadores y desgloses en una sola respuesta (cacheada en memoria)
+@router.get("/", response_model=Estadisticas)
+async def estadisticas() -> Estadisticas:
+    return obtener_estadisticas(db_client.Proyecto)
+
+# Recalcula el documento materializado de estadísticas
+@router.post("/refresh", response_model=Estadisticas)
+async def refrescar() -> Estadisticas:
+    return refrescar_estadisticas(db_client.Proyecto)
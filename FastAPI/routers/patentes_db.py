@@ -1,9 +1,13 @@
 from fastapi import APIRouter, status
-from bson import ObjectId
 from db.schemas.patentes import patentes_schema, patente_schema
 from db.client import db_client
+from db.lotes import buscar_lote
+from db.pipelines import lookups, pipeline_por_id, pipeline_por_autor
+from db.models.lotes import LoteIds, ResultadoLote
+from db.estadisticas import obtener_estadisticas
 from db.models.patentes import Patente
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
+from db.serializacion import paginar, responder
 
 
 
@@ -19,37 +23,25 @@ async def patentes(id: str) -> Patente:
 # Cuenta todas las patentes
 @router.get("/count", response_model=int)
 async def count_patentes():
-    count = db_client.Proyecto.patentes.count_documents({})
+    count = obtener_estadisticas(db_client.Proyecto)["totales"]["patentes"]
     return count
 
 
 @router.get("/{id}", response_model=Patente) 
 async def patentes(id: str) -> Patente:
-    pipeline = [
-        {"$match": {"_id": ObjectId(id)}},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Autores",
-            "foreignField": "_id",
-            "as": "Autores"
-        }}
-    ]
+    pipeline = pipeline_por_id("patentes", id)
     patente = db_client.Proyecto.patentes.aggregate(pipeline).next()
-    return patente_schema(patente)
+    return responder(patente_schema(patente))
 
 
 #Encuentra Patente por id autor
 @router.get("/autor/{id}", response_model= Page[Patente])
 async def patentes(id: str) -> Page[Patente]:
-    pipeline = [
-            {"$match": {"Autores": ObjectId(id)}},
-            {"$lookup": {
-                "from": "autores",
-                "localField": "Autores",
-                "foreignField": "_id",
-                "as": "Autores"
-            }},
-            {"$sort": {"Título": 1, "_id": 1}}
-        ]
+    pipeline = pipeline_por_autor("patentes", id)
     patentes = list(db_client.Proyecto.patentes.aggregate(pipeline))
-    return paginate(patentes_schema(patentes))
+    return paginar(patentes_schema(patentes))
+
+# Encuentra varias patentes por sus ids con una sola consulta, en el orden pedido
+@router.post("/batch", response_model=ResultadoLote[Patente])
+async def patentes_lote(lote: LoteIds) -> ResultadoLote[Patente]:
+    return responder(buscar_lote(db_client.Proyecto.patentes, lote.ids, lookups("patentes"), patente_schema))
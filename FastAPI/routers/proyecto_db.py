@@ -1,9 +1,13 @@
 from fastapi import APIRouter, status
-from bson import ObjectId
 from db.schemas.proyectos import proyectos_schema, proyecto_schema
 from db.client import db_client
+from db.lotes import buscar_lote
+from db.pipelines import lookups, pipeline_por_id, pipeline_por_autor
+from db.models.lotes import LoteIds, ResultadoLote
+from db.estadisticas import obtener_estadisticas
 from db.models.proyectos import Proyecto
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
+from db.serializacion import paginar, responder
 
 
 
@@ -15,37 +19,25 @@ router = APIRouter(prefix="/proyectos",
 # Cuenta todos los proyectos
 @router.get("/count", response_model=int)
 async def count_proyectos():
-    count = db_client.Proyecto.proyectos.count_documents({})
+    count = obtener_estadisticas(db_client.Proyecto)["totales"]["proyectos"]
     return count
 
 
 #Encuentra proyecto por id proyecto
 @router.get("/{id}", response_model=Proyecto) 
 async def proyectos(id: str) -> Proyecto:
-    pipeline = [
-        {"$match": {"_id": ObjectId(id)}},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Investigadores",
-            "foreignField": "_id",
-            "as": "Investigadores"
-        }}
-    ]
+    pipeline = pipeline_por_id("proyectos", id)
     proyecto = db_client.Proyecto.proyectos.aggregate(pipeline).next()
-    return proyecto_schema(proyecto)
+    return responder(proyecto_schema(proyecto))
 
 #Encuentra proyectos por id investigador
 @router.get("/autor/{id}", response_model=Page[Proyecto]) 
 async def proyectos(id: str) -> Page[Proyecto]:
-    pipeline = [
-            {"$match": {"Investigadores": ObjectId(id)}},
-            {"$lookup": {
-                "from": "autores",
-                "localField": "Investigadores",
-                "foreignField": "_id",
-                "as": "Investigadores"
-            }},
-            {"$sort": {"Título": 1, "_id": 1}}
-        ]
+    pipeline = pipeline_por_autor("proyectos", id)
     proyectos = list(db_client.Proyecto.proyectos.aggregate(pipeline))
-    return paginate(proyectos_schema(proyectos))
+    return paginar(proyectos_schema(proyectos))
+
+# Encuentra varios proyectos por sus ids con una sola consulta, en el orden pedido
+@router.post("/batch", response_model=ResultadoLote[Proyecto])
+async def proyectos_lote(lote: LoteIds) -> ResultadoLote[Proyecto]:
+    return responder(buscar_lote(db_client.Proyecto.proyectos, lote.ids, lookups("proyectos"), proyecto_schema))
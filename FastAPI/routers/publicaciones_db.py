@@ -1,9 +1,13 @@
 from fastapi import APIRouter, status
-from bson import ObjectId
 from db.schemas.publicaciones import publicaciones_schema, publicacion_schema
 from db.client import db_client
+from db.lotes import buscar_lote
+from db.pipelines import lookups, pipeline_por_id, pipeline_por_autor
+from db.models.lotes import LoteIds, ResultadoLote
+from db.estadisticas import obtener_estadisticas
 from db.models.publicaciones import Publicacion
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
+from db.serializacion import paginar, responder
 
 
 
@@ -15,38 +19,24 @@ router = APIRouter(prefix="/publicaciones",
 # Cuenta todas las publicaciones
 @router.get("/count", response_model=int)
 async def count_publicaciones():
-    count = db_client.Proyecto.publicaciones.count_documents({})
+    count = obtener_estadisticas(db_client.Proyecto)["totales"]["publicaciones"]
     return count
 
 
 #Encuentra publicacion por id publicacion
 @router.get("/{id}", response_model=Publicacion) 
 async def publicaciones(id: str) -> Publicacion:
-    pipeline = [
-        {"$match": {"_id": ObjectId(id)}},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Autores",
-            "foreignField": "_id",
-            "as": "Autores"
-        }}
-    ]
+    pipeline = pipeline_por_id("publicaciones", id)
     publicacion = db_client.Proyecto.publicaciones.aggregate(pipeline).next()
-    return publicacion_schema(publicacion)
+    return responder(publicacion_schema(publicacion))
 
 @router.get("/autor/{id}", response_model= Page[Publicacion])
 async def publicaciones(id: str) -> Page[Publicacion]:
-    pipeline = [
-            {"$match": {"Autores": ObjectId(id)}},
-            {"$lookup": {
-                "from": "autores",
-                "localField": "Autores",
-                "foreignField": "_id",
-                "as": "Autores"
-            }},
-            {"$sort": {"Título": 1, "_id": 1}}
-        ]
+    pipeline = pipeline_por_autor("publicaciones", id)
     publicaciones = list(db_client.Proyecto.publicaciones.aggregate(pipeline))
-    return paginate(publicaciones_schema(publicaciones))
-
+    return paginar(publicaciones_schema(publicaciones))
 
+# Encuentra varias publicaciones por sus ids con una sola consulta, en el orden pedido
+@router.post("/batch", response_model=ResultadoLote[Publicacion])
+async def publicaciones_lote(lote: LoteIds) -> ResultadoLote[Publicacion]:
+    return responder(buscar_lote(db_client.Proyecto.publicaciones, lote.ids, lookups("publicaciones"), publicacion_schema))
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, status
-from bson import ObjectId
 from db.schemas.tesis import tesis_schema, tesi_schema
 from db.client import db_client
+from db.lotes import buscar_lote
+from db.pipelines import lookups, pipeline_por_id, pipeline_por_autor
+from db.models.lotes import LoteIds, ResultadoLote
+from db.estadisticas import obtener_estadisticas
 from db.models.tesis import Tesis
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
+from db.serializacion import paginar, responder
 
 
 
@@ -15,48 +19,24 @@ router = APIRouter(prefix="/tesis",
 # Cuenta todas las tesis
 @router.get("/count", response_model=int)
 async def count_tesis():
-    count = db_client.Proyecto.tesis.count_documents({})
+    count = obtener_estadisticas(db_client.Proyecto)["totales"]["tesis"]
     return count
 
 # Encuentra tesis por id tesis
 @router.get("/{id}", response_model=Tesis) 
 async def tesis(id: str) -> Tesis:
-    pipeline = [
-        {"$match": {"_id": ObjectId(id)}},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Autores",
-            "foreignField": "_id",
-            "as": "Autores"
-        }},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Director/a",
-            "foreignField": "_id",
-            "as": "Director/a"
-        }}
-    ]
+    pipeline = pipeline_por_id("tesis", id)
     tesis = db_client.Proyecto.tesis.aggregate(pipeline).next()
-    return tesi_schema(tesis)
+    return responder(tesi_schema(tesis))
 
 # Encuentra tesis por id autor
 @router.get("/autor/{id}", response_model=Page[Tesis])
 async def tesis(id: str) -> Page[Tesis]:
-    pipeline = [
-        {"$match": {"$or": [{"Autores": ObjectId(id)}, {"Director/a": ObjectId(id)}]}},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Autores",
-            "foreignField": "_id",
-            "as": "Autores"
-        }},
-        {"$lookup": {
-            "from": "autores",
-            "localField": "Director/a",
-            "foreignField": "_id",
-            "as": "Director/a"
-        }},
-        {"$sort": {"Título": 1, "_id": 1}}
-    ]
+    pipeline = pipeline_por_autor("tesis", id)
     tesis = list(db_client.Proyecto.tesis.aggregate(pipeline))
-    return paginate(tesis_schema(tesis))
\ No newline at end of file
+    return paginar(tesis_schema(tesis))
+
+# Encuentra varias tesis por sus ids con una sola consulta, en el orden pedido
+@router.post("/batch", response_model=ResultadoLote[Tesis])
+async def tesis_lote(lote: LoteIds) -> ResultadoLote[Tesis]:
+    return responder(buscar_lote(db_client.Proyecto.tesis, lote.ids, lookups("tesis"), tesi_schema))
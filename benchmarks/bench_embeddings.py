@@ -0,0 +1,90 @@
+"""
+Escalado de la codificación de embeddings con el pool de procesos de embedding_create.
+
+Genera un corpus sintético de textos con la longitud típica de título + resumen, lo
+codifica en el proceso actual y con pools de 2..N procesos (trozos de TAM_LOTE
+textos, resultados en orden) e imprime los docs/s y la aceleración de cada
+configuración. Comprueba que los vectores coinciden con los del proceso único.
+El tiempo de arranque de los procesos y de carga del modelo no se mide.
+
+Con una carpeta de instantánea del corpus (scripts/instantanea_corpus.py) como
+tercer argumento, codifica los `num_documentos` primeros textos reales de la
+instantánea (los mismos que embedding_create.py) en lugar del corpus sintético.
+
+Uso: python benchmarks/bench_embeddings.py [num_documentos] [max_procesos] [carpeta_instantanea]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from embedding_create import TAM_LOTE, codificar_textos, crear_pool
+from texto_embedding import get_campos_embedding, texto_embedding
+
+PALABRAS = (
+    "análisis modelo sistema datos red neuronal aprendizaje automático evaluación método "
+    "estudio diseño control energía agua suelo proteína célula paciente tratamiento "
+    "algoritmo optimización señal imagen lenguaje investigación universidad desarrollo"
+).split()
+
+
+def corpus_sintetico(n: int, semilla: int = 0) -> list[str]:
+    aleatorio = random.Random(semilla)
+    return [" ".join(aleatorio.choices(PALABRAS, k=aleatorio.randint(40, 160))) for _ in range(n)]
+
+
+def corpus_instantanea(carpeta: str, n: int) -> list[str]:
+    # pyarrow solo se necesita para leer la instantánea
+    from instantanea_corpus import documentos_corpus
+
+    textos = []
+    for coleccion, doc in documentos_corpus(carpeta):
+        texto = texto_embedding(doc, get_campos_embedding(coleccion))
+        if texto:
+            textos.append(texto)
+            if len(textos) == n:
+                break
+    return textos
+
+
+def codificar_con_pool(pool, trozos) -> np.ndarray:
+    if pool is None:
+        return np.vstack([codificar_textos(trozo) for trozo in trozos])
+    return np.vstack(list(pool.map(codificar_textos, trozos)))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    max_procesos = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    instantanea = sys.argv[3] if len(sys.argv) > 3 else None
+    textos = corpus_instantanea(instantanea, n) if instantanea else corpus_sintetico(n)
+    n = len(textos)
+    trozos = [textos[i:i + TAM_LOTE] for i in range(0, n, TAM_LOTE)]
+    origen = f"de {instantanea}" if instantanea else "sintéticos"
+    print(f"{n} documentos {origen} en {len(trozos)} trozos, {os.cpu_count()} núcleos disponibles")
+
+    referencia = None
+    base = None
+    procesos = 1
+    while procesos <= max_procesos:
+        pool = crear_pool(procesos)
+        try:
+            # Arranque de los procesos y carga del modelo fuera de la medida
+            codificar_con_pool(pool, [["calentamiento"]] * procesos)
+            inicio = time.perf_counter()
+            vectores = codificar_con_pool(pool, trozos)
+            segundos = time.perf_counter() - inicio
+        finally:
+            if pool:
+                pool.shutdown()
+
+        docs_s = n / segundos
+        if referencia is None:
+            referencia, base = vectores, docs_s
+        diferencia = float(np.abs(vectores - referencia).max())
+        print(f"{procesos:3d} procesos: {segundos:6.2f} s  {docs_s:8.0f} docs/s  x{docs_s / base:.2f}  "
+              f"diferencia máxima {diferencia:.1e}")
+        procesos *= 2
@@ -0,0 +1,39 @@
+"""
+Coste de la resolución de entidades con claves de bloqueo frente a comparar todos
+los pares (investigador-investigador y mención-investigador).
+
+Uso: python benchmarks/bench_entidades.py [carpeta_bloques | carpeta_instantanea]
+
+La carpeta puede ser la de los bloques JSON o una instantánea de
+scripts/instantanea_corpus.py (se reconoce por su manifiesto).
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from entidades import resolver_entidades
+from ingesta import construir_mapa
+from lector_bloques import rutas_bloques
+
+
+if __name__ == "__main__":
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "data/output_blocks_modified"
+    if os.path.isfile(os.path.join(carpeta, "manifiesto.json")):
+        # pyarrow solo se necesita para leer la instantánea
+        from instantanea_corpus import construir_mapa_instantanea
+        mapa = construir_mapa_instantanea(carpeta)
+    else:
+        mapa = construir_mapa(rutas_bloques(carpeta))
+
+    inicio = time.perf_counter()
+    mapeo = resolver_entidades(mapa)
+    segundos = time.perf_counter() - inicio
+
+    e = mapeo["estadisticas"]
+    print(f"Investigadores: {e['investigadores']}, menciones en texto: {e['menciones']}, bloques: {e['bloques']}")
+    print(f"Pares comparados con bloqueo:    {e['comparaciones']:>12,}")
+    print(f"Pares comparando todos con todos: {e['comparaciones_todos_los_pares']:>12,}")
+    print(f"Reducción: x{e['comparaciones_todos_los_pares'] / max(e['comparaciones'], 1):.0f}")
+    print(f"Perfiles unidos: {e['perfiles_unidos']}, nombres en texto resueltos: {e['textos_resueltos']}")
+    print(f"Tiempo: {segundos:.2f} s")
@@ -0,0 +1,52 @@
+"""
+Speedup de la construcción del mapa de trabajos (fase 1 de la ingesta) en paralelo.
+
+Construye el mapa en serie y con 1..N procesos, comprueba que el resultado es
+idéntico al serie (mismo contenido y mismo orden) e imprime el tiempo y la
+aceleración para cada número de procesos.
+
+Uso: python benchmarks/bench_ingesta_paralela.py [carpeta_bloques] [max_procesos]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from ingesta import CAMPOS_AUTOR, construir_mapa, construir_mapa_paralelo
+from lector_bloques import rutas_bloques
+
+
+def huella(mapa) -> tuple:
+    # Representación con listas del mapa para comparar contenido y orden
+    trabajos = {
+        coleccion: [(clave, entrada["doc"], [list(entrada[campo]) for campo in CAMPOS_AUTOR[coleccion]])
+                    for clave, entrada in entradas.items()]
+        for coleccion, entradas in mapa.trabajos.items()
+    }
+    return list(mapa.autores.items()), trabajos, mapa.errores
+
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "data/output_blocks_modified"
+    max_procesos = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    rutas = rutas_bloques(carpeta)
+
+    serie, t_serie = medir(lambda: construir_mapa(rutas))
+    referencia = huella(serie)
+    print(f"{len(rutas)} ficheros, {os.cpu_count()} núcleos disponibles")
+    print(f"Serie: {t_serie:.2f} s")
+
+    procesos = 1
+    while procesos <= max_procesos:
+        mapa, t = medir(lambda: construir_mapa_paralelo(rutas, procesos))
+        igual = huella(mapa) == referencia
+        print(f"{procesos:3d} procesos: {t:6.2f} s  x{t_serie / t:.2f}  {'idéntico' if igual else 'DIFERENTE'}")
+        if not igual:
+            raise SystemExit(1)
+        procesos *= 2
@@ -0,0 +1,99 @@
+"""
+Instantánea Parquet/Arrow del corpus (scripts/instantanea_corpus.py) frente a los
+bloques JSON.
+
+Exporta la carpeta de bloques a una instantánea temporal y compara:
+  - tamaño en disco de los bloques, los .parquet y los .arrow;
+  - lectura de los investigadores (leer_investigadores frente a
+    leer_investigadores_instantanea), comprobando que son idénticos;
+  - construcción del mapa de trabajos de la ingesta, comprobando que es idéntico;
+  - una consulta analítica (trabajos por categoría y año) recorriendo los bloques
+    JSON frente a un group_by sobre las columnas mapeadas en memoria.
+
+Uso: python benchmarks/bench_instantanea_corpus.py [carpeta_bloques]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from bench_ingesta_paralela import huella, medir
+from ingesta import construir_mapa
+from instantanea_corpus import (
+    CATEGORIAS, _anio_trabajo, cargar_tabla, construir_mapa_instantanea, exportar_corpus,
+    leer_investigadores_instantanea
+)
+from lector_bloques import leer_investigadores, rutas_bloques
+
+
+def megas(carpeta, extension) -> float:
+    return sum(
+        os.path.getsize(os.path.join(carpeta, nombre)) for nombre in os.listdir(carpeta) if nombre.endswith(extension)
+    ) / 2**20
+
+
+def silencioso(funcion):
+    # leer_investigadores imprime una línea por fichero
+    def envoltura():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return funcion()
+    return envoltura
+
+
+def por_anio_bloques(rutas) -> Counter:
+    # Trabajos distintos por (categoría, año), deduplicados como en la tabla trabajos
+    anios = {}
+    for investigador in leer_investigadores(rutas):
+        for categoria in CATEGORIAS:
+            for trabajo in investigador.get(categoria) or []:
+                anios.setdefault((categoria, json.dumps(trabajo, ensure_ascii=False)), _anio_trabajo(trabajo))
+    return Counter((categoria, anio) for (categoria, _), anio in anios.items())
+
+
+def por_anio_instantanea(carpeta) -> Counter:
+    tabla = cargar_tabla(carpeta, "trabajos", ["_categoria", "_anio"])
+    agrupado = tabla.group_by(["_categoria", "_anio"]).aggregate([([], "count_all")])
+    return Counter({
+        (categoria, anio): n for categoria, anio, n in zip(
+            agrupado.column("_categoria").to_pylist(), agrupado.column("_anio").to_pylist(),
+            agrupado.column("count_all").to_pylist(),
+        )
+    })
+
+
+def fila(nombre, segundos, referencia, igual):
+    print(f"{nombre:>34s}: {segundos:6.2f} s  x{referencia / segundos:5.1f}  {'idéntico' if igual else 'DIFERENTE'}")
+    if not igual:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "data/output_blocks_modified"
+    rutas = rutas_bloques(carpeta)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        instantanea = os.path.join(tmp, "instantanea")
+        manifiesto, segundos = medir(silencioso(lambda: exportar_corpus(rutas, instantanea)))
+        filas = ", ".join(f"{info['filas']} {nombre}" for nombre, info in manifiesto["tablas"].items())
+        print(f"Exportación: {segundos:.2f} s ({filas})")
+        print(f"Tamaño: bloques JSON {megas(carpeta, '.json'):.1f} MB, Parquet {megas(instantanea, '.parquet'):.1f} MB, "
+              f"Arrow {megas(instantanea, '.arrow'):.1f} MB")
+
+        bloques, t_bloques = medir(silencioso(lambda: list(leer_investigadores(rutas))))
+        leidos, t = medir(lambda: list(leer_investigadores_instantanea(instantanea)))
+        print(f"{'investigadores desde bloques JSON':>34s}: {t_bloques:6.2f} s")
+        fila("investigadores desde instantánea", t, t_bloques, leidos == bloques)
+
+        mapa, t_mapa = medir(silencioso(lambda: construir_mapa(rutas)))
+        mapa_instantanea, t = medir(lambda: construir_mapa_instantanea(instantanea))
+        print(f"{'mapa de trabajos desde bloques':>34s}: {t_mapa:6.2f} s")
+        fila("mapa de trabajos desde instantánea", t, t_mapa, huella(mapa_instantanea) == huella(mapa))
+
+        conteo, t_conteo = medir(silencioso(lambda: por_anio_bloques(rutas)))
+        conteo_instantanea, t = medir(lambda: por_anio_instantanea(instantanea))
+        print(f"{'trabajos por año desde bloques':>34s}: {t_conteo:6.2f} s")
+        fila("trabajos por año (group_by Arrow)", t, t_conteo, conteo_instantanea == conteo)
@@ -0,0 +1,162 @@
+"""
+Análisis del HTML del rastreador de accedacris (funciones parsear_* de
+scripts/new_script.py) con cada configuración.
+
+Analiza las páginas de una carpeta de grabaciones (new_script.py --grabar CARPETA)
+o, si no se indica, del sitio sintético de bench_rastreador.py con menús de relleno.
+Compara la configuración original (html.parser sobre la página completa) con lxml,
+con lxml + SoupStrainer y con esta última en un pool de procesos, comprueba que
+todas extraen exactamente los mismos datos e imprime páginas por segundo.
+
+Antes se analizan las páginas de benchmarks/paginas_parseo/, casos de HTML mal
+formado en los que los analizadores no coinciden (p. ej. una celda <td> sin cerrar),
+y se indica qué configuraciones dan un resultado distinto de html.parser. El
+analizador por defecto del rastreador (html.parser) solo debe cambiarse si las
+demás extraen lo mismo sobre una grabación real completa.
+
+Uso: python benchmarks/bench_parseo.py [carpeta_grabaciones] [--procesos 4] [--repeticiones 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import unquote
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import new_script
+from bench_rastreador import generar_sitio
+
+# Páginas grabadas con casos conocidos de HTML mal formado
+CASOS_CONOCIDOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "paginas_parseo")
+# Páginas distintas que se muestran de cada configuración
+MAX_DIFERENCIAS = 5
+
+CONFIGURACIONES = (
+    ("html.parser", "html.parser", False),
+    ("lxml", "lxml", False),
+    ("lxml + SoupStrainer", "lxml", True),
+)
+
+
+def tipo_pagina(nombre):
+    """
+    (función parsear_*, argumentos extra) según la ruta de la página grabada.
+    """
+    ruta = unquote(nombre).split("?")[0]
+    if ruta.startswith("/handle/"):
+        return new_script.parsear_detalle, ()
+    if ruta == "/simple-search":
+        return new_script.parsear_investigadores, ()
+    if ruta.endswith("/projects.html"):
+        return new_script.parsear_proyectos, ()
+    if ruta.endswith(("/publicaciones.html", "/tesis.html", "/patentes.html")):
+        return new_script.parsear_items_seccion, ("dc.title",)
+    return new_script.parsear_email, ()
+
+
+def cargar_paginas(carpeta):
+    paginas = []
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), "rb") as fichero:
+            funcion, extra = tipo_pagina(nombre)
+            paginas.append((funcion, fichero.read(), extra, unquote(nombre)))
+    return paginas
+
+
+def diferencias(paginas, resultado, referencia) -> list:
+    # (página, resultado de html.parser, resultado de la configuración) de las páginas distintas
+    return [
+        (nombre, esperado, obtenido)
+        for (_, _, _, nombre), esperado, obtenido in zip(paginas, referencia, resultado)
+        if esperado != obtenido
+    ]
+
+
+def mostrar_diferencias(distintas):
+    for nombre, esperado, obtenido in distintas[:MAX_DIFERENCIAS]:
+        print(f"{'':>26s}{nombre}\n{'':>28s}html.parser: {esperado}\n{'':>28s}obtenido:    {obtenido}")
+    if len(distintas) > MAX_DIFERENCIAS:
+        print(f"{'':>26s}... y {len(distintas) - MAX_DIFERENCIAS} páginas más")
+
+
+def casos_conocidos():
+    """
+    Resultado de cada configuración en las páginas de CASOS_CONOCIDOS comparado con
+    html.parser. Es informativo: muestra en qué HTML divergen los analizadores.
+    """
+    paginas = cargar_paginas(CASOS_CONOCIDOS)
+    print(f"Casos conocidos ({len(paginas)} páginas de {CASOS_CONOCIDOS}):")
+    referencia = None
+    for nombre, analizador, filtrar in CONFIGURACIONES:
+        new_script.analizador_html, new_script.filtrar_html = analizador, filtrar
+        resultado = analizar_todo(paginas)
+        referencia = referencia or resultado
+        distintas = diferencias(paginas, resultado, referencia)
+        print(f"{nombre:>24s}: {len(distintas)} páginas distintas de html.parser")
+        mostrar_diferencias(distintas)
+
+
+def analizar_todo(paginas, ejecutor=None):
+    if ejecutor is None:
+        return [funcion(contenido, *extra) for funcion, contenido, extra, _ in paginas]
+    futuros = [ejecutor.submit(funcion, contenido, *extra) for funcion, contenido, extra, _ in paginas]
+    return [futuro.result() for futuro in futuros]
+
+
+def medir(paginas, repeticiones, ejecutor=None):
+    mejor, resultado = float("inf"), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = analizar_todo(paginas, ejecutor)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def principal(carpeta, procesos, repeticiones):
+    paginas = cargar_paginas(carpeta)
+    megas = sum(len(contenido) for _, contenido, _, _ in paginas) / 2**20
+    print(f"{len(paginas)} páginas, {megas:.1f} MB")
+
+    referencia, base = None, None
+    iguales = True
+    for nombre, analizador, filtrar in CONFIGURACIONES:
+        new_script.analizador_html, new_script.filtrar_html = analizador, filtrar
+        segundos, resultado = medir(paginas, repeticiones)
+        referencia = referencia or resultado
+        base = base or segundos
+        distintas = diferencias(paginas, resultado, referencia)
+        print(f"{nombre:>24s}: {len(paginas) / segundos:8.0f} pág/s  x{base / segundos:4.1f}  "
+              f"{'idéntico' if not distintas else f'DIFERENTE en {len(distintas)} páginas'}")
+        mostrar_diferencias(distintas)
+        iguales = iguales and not distintas
+
+    # El pool usa la última configuración (lxml + SoupStrainer)
+    ejecutor = new_script.crear_pool(procesos)
+    if ejecutor:
+        with ejecutor:
+            analizar_todo(paginas[:procesos], ejecutor)  # arranque de los procesos
+            segundos, resultado = medir(paginas, repeticiones, ejecutor)
+        distintas = diferencias(paginas, resultado, referencia)
+        print(f"{'+ pool de ' + str(procesos) + ' procesos':>24s}: {len(paginas) / segundos:8.0f} pág/s  "
+              f"x{base / segundos:4.1f}  {'idéntico' if not distintas else f'DIFERENTE en {len(distintas)} páginas'}")
+        iguales = iguales and not distintas
+    new_script.analizador_html, new_script.filtrar_html = CONFIGURACIONES[0][1:]
+    if not iguales:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara los analizadores de HTML del rastreador")
+    parser.add_argument("carpeta", nargs="?", help="Páginas grabadas con new_script.py --grabar")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--investigadores", type=int, default=60, help="Tamaño del sitio sintético")
+    args = parser.parse_args()
+    casos_conocidos()
+    if args.carpeta:
+        principal(args.carpeta, args.procesos, args.repeticiones)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            generar_sitio(tmp, args.investigadores, relleno=300)
+            principal(tmp, args.procesos, args.repeticiones)
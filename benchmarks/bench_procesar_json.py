@@ -0,0 +1,90 @@
+"""
+Rendimiento de scripts/procesar_json.py (saltos de línea en los cambios de idioma de
+los resúmenes) en cada modo.
+
+Procesa la carpeta de bloques con la versión anterior (dos re.sub por resumen,
+archivo a archivo y json.dump con sangría) y con la actual en serie, en streaming,
+con un pool de procesos y en modo compacto. Comprueba que las salidas con sangría
+son idénticas byte a byte a las de la versión anterior y que la compacta contiene
+los mismos datos, e imprime MB/s de cada modo.
+
+Uso: python benchmarks/bench_procesar_json.py [carpeta_bloques] [procesos]
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from procesar_json import procesar_archivos
+
+
+def ajustar_resumen_anterior(resumen):
+    patrones = [
+        r'([a-záéíóúñü]+\.)\s*(This|Introduction|Methods|Results|Conclusion|We|These|The|A|An)',
+        r'(\w+\.)\s*(Esto|El|Esta|Los|Las|Una|Un|En|Además|Sin embargo|Por lo tanto)',
+    ]
+    for patron in patrones:
+        resumen = re.sub(patron, r'\1\n\2', resumen)
+    return resumen
+
+
+def procesar_archivos_anterior(input_folder, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    for file_name in os.listdir(input_folder):
+        if file_name.endswith('.json'):
+            with open(os.path.join(input_folder, file_name), 'r', encoding='utf-8') as infile:
+                data = json.load(infile)
+            for investigador in data:
+                for categoria in ['Publicaciones', 'Tesis']:
+                    if categoria in investigador:
+                        for item in investigador[categoria]:
+                            if 'Resumen' in item:
+                                item['Resumen'] = ajustar_resumen_anterior(item['Resumen'])
+            with open(os.path.join(output_folder, f"mod_{file_name}"), 'w', encoding='utf-8') as outfile:
+                json.dump(data, outfile, ensure_ascii=False, indent=4)
+
+
+def leer_salida(carpeta, como_json=False) -> dict:
+    resultado = {}
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), "rb") as fichero:
+            contenido = fichero.read()
+        resultado[nombre] = json.loads(contenido) if como_json else contenido
+    return resultado
+
+
+if __name__ == "__main__":
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "data/output_blocks"
+    procesos = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    megas = sum(os.path.getsize(os.path.join(carpeta, n)) for n in os.listdir(carpeta) if n.endswith(".json")) / 2**20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inicio = time.perf_counter()
+        procesar_archivos_anterior(carpeta, os.path.join(tmp, "anterior"))
+        segundos = time.perf_counter() - inicio
+        referencia = leer_salida(os.path.join(tmp, "anterior"))
+        print(f"{len(referencia)} archivos, {megas:.1f} MB")
+        print(f"{'anterior':>22s}: {segundos:6.2f} s  {megas / segundos:6.1f} MB/s")
+
+        modos = (
+            ("serie", 1, False, False),
+            ("streaming", 1, False, True),
+            (f"{procesos} procesos", procesos, False, False),
+            (f"{procesos} procesos streaming", procesos, False, True),
+            (f"{procesos} procesos compacto", procesos, True, False),
+        )
+        for nombre, n, compacto, streaming in modos:
+            salida = os.path.join(tmp, nombre.replace(" ", "_"))
+            metricas = procesar_archivos(carpeta, salida, n, compacto, streaming)
+            if compacto:
+                igual = leer_salida(salida, como_json=True) == {k: json.loads(v) for k, v in referencia.items()}
+            else:
+                igual = leer_salida(salida) == referencia
+            print(f"{nombre:>22s}: {metricas['segundos']:6.2f} s  {metricas['mb_s']:6.1f} MB/s  "
+                  f"x{segundos / metricas['segundos']:.2f}  {metricas['mb_salida']:.1f} MB escritos  "
+                  f"{'idéntico' if igual else 'DIFERENTE'}")
+            if not igual:
+                raise SystemExit(1)
@@ -0,0 +1,193 @@
+"""
+Rastreador de accedacris (scripts/new_script.py) contra un sitio local.
+
+Genera un sitio sintético con la misma estructura HTML que accedacris (listado de
+investigadores, perfiles, secciones y páginas de detalle, con trabajos compartidos
+entre coautores), lo sirve con servidor_grabaciones.py añadiendo una latencia por
+respuesta y lo rastrea con una sola conexión, con varias y con varias más el memo
+de detalles compartidos. Después repite el rastreo con la caché HTTP: la primera
+vez la llena, la segunda solo recibe respuestas 304 y la tercera, con max_edad, no
+accede a la red para perfiles y detalles (listados y secciones se piden siempre). Comprueba que los bloques JSON generados son idénticos e imprime
+tiempo, peticiones por segundo, descargas ahorradas por el memo y bytes recibidos.
+
+Uso: python benchmarks/bench_rastreador.py [num_investigadores] [latencia_s] [conexiones]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import new_script
+from cliente_http import CacheHTTP, ClienteHTTP, ruta_grabacion
+from servidor_grabaciones import crear_app
+
+POR_PAGINA = 50
+# Elementos por página de las secciones de un perfil; uno de cada PROLIFICOS
+# investigadores tiene TRABAJOS_PROLIFICOS trabajos, repartidos en varias páginas
+POR_PAGINA_SECCION = 20
+PROLIFICOS = 10
+TRABAJOS_PROLIFICOS = 90
+
+
+def _escribir(carpeta, ruta, html, relleno=""):
+    with open(os.path.join(carpeta, ruta_grabacion(ruta)), "w", encoding="utf-8") as fichero:
+        fichero.write('<html><head><meta charset="utf-8"></head><body>' + relleno + html + relleno + '</body></html>')
+
+
+def _relleno(enlaces):
+    # Cabecera y menús como los de accedacris, que los parsers no necesitan leer
+    if not enlaces:
+        return ""
+    menu = "".join(f'<li class="nav-item"><a href="/explore/{i}">Sección {i}</a></li>' for i in range(enlaces))
+    return (f'<div class="navbar"><ul class="nav">{menu}</ul></div>'
+            '<script type="text/javascript">var j = jQuery.noConflict(); j(document).ready(function() {});</script>')
+
+
+def _detalle(n):
+    return (
+        '<table class="table itemDisplayTable">'
+        f'<tr><td>Título:</td><td>Trabajo {n}</td></tr>'
+        f'<tr><td>Autores:</td><td><a href="/cris/rp/rp{n % 97:05d}">Autor {n % 97}</a></td></tr>'
+        f'<tr><td>Resumen:</td><td>Resumen del trabajo {n}<br/>segunda línea</td></tr>'
+        f'<tr><td>Fecha de publicación:</td><td>{2000 + n % 24}</td></tr>'
+        '</table>'
+        f'<a href="/bitstream/10553/{n}/1/trabajo.pdf" target="_blank">PDF</a>'
+    )
+
+
+def _seccion(items):
+    return "".join(
+        f'<div id="item_fields"><div id="dc.title"><a href="/handle/10553/{n}">Trabajo {n}</a></div></div>'
+        for n in items
+    )
+
+
+def _proyectos(items):
+    return "".join(
+        '<div class="item-container">'
+        f'<div id="crisproject.startdate"><em>01/01/{2000 + n % 24}</em></div>'
+        f'<div id="crisproject.title"><a href="/cris/project/pj{n:05d}">Proyecto {n}</a></div>'
+        f'<div id="crisproject.principalinvestigator"><em>Investigador {n}</em><a href="/cris/rp/rp{n:05d}">ver</a></div>'
+        f'<div id="crisproject.tipo"><em>Tipo {n % 3}</em></div>'
+        '</div>'
+        for n in items
+    )
+
+
+def _escribir_seccion(carpeta, ruta, items, generar_html, relleno=""):
+    # Páginas de una sección con un paginador como el de accedacris: enlaza las cinco
+    # primeras páginas y la última
+    paginas = [items[i:i + POR_PAGINA_SECCION] for i in range(0, len(items), POR_PAGINA_SECCION)] or [[]]
+    nombre = ruta.rsplit("/", 1)[-1]
+    seccion = nombre.split(".")[0]
+    for numero, trozo in enumerate(paginas, start=1):
+        paginador = ""
+        if len(paginas) > 1:
+            enlazadas = sorted(set(range(1, min(5, len(paginas)) + 1)) | {len(paginas)})
+            paginador = '<ul class="pagination">' + "".join(
+                f'<li class="active"><span>{n}</span></li>' if n == numero
+                else f'<li><a href="{nombre}?open={seccion}&amp;page={n}">{n}</a></li>'
+                for n in enlazadas
+            ) + "</ul>"
+        destino = ruta if numero == 1 else f"{ruta}?open={seccion}&page={numero}"
+        _escribir(carpeta, destino, generar_html(trozo) + paginador, relleno)
+
+
+def generar_sitio(carpeta, investigadores, trabajos_por_investigador=12, semilla=0, relleno=0):
+    """
+    Escribe el sitio sintético en `carpeta`. Los trabajos se eligen de un conjunto
+    común, así cada trabajo aparece en varios perfiles como en el sitio real, y las
+    secciones largas se paginan. Con `relleno` cada página lleva además un menú de
+    ese número de enlaces.
+    """
+    aleatorio = random.Random(semilla)
+    relleno = _relleno(relleno)
+    conjunto = max(1, investigadores * trabajos_por_investigador // 4)
+    for pagina in range(investigadores // POR_PAGINA + 2):
+        inicio = pagina * POR_PAGINA
+        filas = "".join(
+            f'<div class="item-fields"><div id="crisrp.fullname"><a href="/cris/rp/rp{i:05d}">Apellido{i}, Nombre{i}</a></div></div>'
+            for i in range(inicio, min(inicio + POR_PAGINA, investigadores))
+        )
+        _escribir(carpeta, f"/simple-search?query=&location=researcherprofiles&start={inicio}", filas, relleno)
+    for i in range(investigadores):
+        perfil = f"/cris/rp/rp{i:05d}"
+        _escribir(carpeta, perfil, f'<div id="emailDiv">investigador{i}@ulpgc.es</div>', relleno)
+        trabajos = TRABAJOS_PROLIFICOS if i % PROLIFICOS == 0 else trabajos_por_investigador
+        proyectos = POR_PAGINA_SECCION + 5 if i % PROLIFICOS == 0 else 2
+        _escribir_seccion(carpeta, f"{perfil}/publicaciones.html", aleatorio.sample(range(conjunto), min(conjunto, trabajos)), _seccion, relleno)
+        _escribir_seccion(carpeta, f"{perfil}/tesis.html", aleatorio.sample(range(conjunto), min(conjunto, 2)), _seccion, relleno)
+        _escribir_seccion(carpeta, f"{perfil}/patentes.html", [], _seccion, relleno)
+        _escribir_seccion(carpeta, f"{perfil}/projects.html", aleatorio.sample(range(conjunto), min(conjunto, proyectos)), _proyectos, relleno)
+    for n in range(conjunto):
+        _escribir(carpeta, f"/handle/10553/{n}", _detalle(n), relleno)
+
+
+def leer_bloques(carpeta) -> dict:
+    resultado = {}
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), "r", encoding="utf-8") as fichero:
+            resultado[nombre] = fichero.read()
+    return resultado
+
+
+async def medir(url, salida, conexiones, memo=None, cache=None, max_edad=None) -> tuple:
+    new_script.base_url = url
+    inicio = time.perf_counter()
+    async with ClienteHTTP(conexiones, conexiones, peticiones_por_segundo=1e6, rafaga=10**6,
+                           cache=cache, max_edad=max_edad) as cliente:
+        await new_script.rastrear(cliente, salida, memo=memo)
+    return time.perf_counter() - inicio, cliente.estadisticas
+
+
+async def principal(investigadores, latencia, conexiones):
+    with tempfile.TemporaryDirectory() as tmp:
+        sitio = os.path.join(tmp, "sitio")
+        os.makedirs(sitio)
+        generar_sitio(sitio, investigadores)
+
+        runner = web.AppRunner(crear_app(sitio, latencia))
+        await runner.setup()
+        servidor = web.TCPSite(runner, "127.0.0.1", 0)
+        await servidor.start()
+        puerto = runner.addresses[0][1]
+        url = f"http://127.0.0.1:{puerto}"
+
+        try:
+            referencia = None
+            for n, memo in ((1, None), (conexiones, None), (conexiones, new_script.MemoDetalles())):
+                salida = os.path.join(tmp, f"salida_{n}_{'memo' if memo else 'sin_memo'}")
+                segundos, e = await medir(url, salida, n, memo)
+                bloques = leer_bloques(salida)
+                referencia = referencia or bloques
+                igual = bloques == referencia
+                ahorradas = f"  {memo.ahorrados} descargas ahorradas" if memo else ""
+                print(f"{n:3d} conexiones{' + memo' if memo else '       '}: {segundos:6.2f} s  {e['peticiones']} peticiones  "
+                      f"{e['peticiones'] / segundos:7.1f} pet/s  {'idéntico' if igual else 'DIFERENTE'}{ahorradas}")
+                if not igual:
+                    raise SystemExit(1)
+
+            cache = CacheHTTP(os.path.join(tmp, "cache_http.sqlite"))
+            for nombre, max_edad in (("caché vacía", None), ("condicional", None), ("max_edad", 3600)):
+                salida = os.path.join(tmp, f"salida_cache_{nombre.replace(' ', '_')}")
+                segundos, e = await medir(url, salida, conexiones, new_script.MemoDetalles(), cache, max_edad)
+                igual = leer_bloques(salida) == referencia
+                print(f"{nombre:>20s}: {segundos:6.2f} s  {e['peticiones']} peticiones  {e['no_modificadas']} con 304  "
+                      f"{e['sin_red']} sin red  {e['bytes'] / 2**10:8.1f} KB  {'idéntico' if igual else 'DIFERENTE'}")
+                if not igual:
+                    raise SystemExit(1)
+            cache.cerrar()
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    investigadores = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    conexiones = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    asyncio.run(principal(investigadores, latencia, conexiones))
@@ -0,0 +1,115 @@
+"""
+Ruta HTTP (sin navegador) de scripts/Resumenespatentes.py contra páginas locales.
+
+Genera páginas de OEPM y de Patentscope con la misma estructura que las reales (y
+algunas de Patentscope sin resumen en el HTML, como las que lo cargan con
+JavaScript), las sirve con servidor_grabaciones.py añadiendo una latencia por
+respuesta y obtiene los resúmenes con uno y con varios hilos, sin pool de
+navegadores. Comprueba que cada resumen extraído es el esperado, que las páginas
+sin resumen se dejan para el navegador e imprime patentes por segundo.
+
+Uso: python benchmarks/bench_resumenes.py [num_patentes] [latencia_s] [hilos]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from Resumenespatentes import resumir_documentos
+from cliente_http import ruta_grabacion
+from servidor_grabaciones import crear_app
+
+# Una de cada SIN_RESUMEN páginas de Patentscope no trae el resumen en el HTML
+SIN_RESUMEN = 5
+
+
+def _oepm(n):
+    return (
+        '<table class="tablaDetalle">'
+        f'<tr><td class="titulo">Número de solicitud</td><td>ES{n:07d}</td></tr>'
+        '<tr><td class="titulo">Resumen</td>'
+        f'<td>Dispositivo número {n} para la desalinización de agua de mar.</td></tr>'
+        '</table>'
+    )
+
+
+def _patentscope(n):
+    if n % SIN_RESUMEN == 0:
+        return '<div id="detailMainForm"><script src="/patentscope/resumen.js"></script></div>'
+    return (
+        '<div class="ps-field"><span class="ps-field--label">Resumen</span>'
+        f'<span class="ps-field--value">Procedimiento {n} de obtención de biocombustible.</span></div>'
+    )
+
+
+def generar_patentes(carpeta, patentes):
+    """
+    Escribe las páginas y devuelve los documentos de la colección de patentes con el
+    resumen esperado de cada uno (None si solo se puede obtener con navegador).
+    """
+    documentos = []
+    for n in range(patentes):
+        if n % 2:
+            ruta = f"/consultas2.oepm.es/InvenesWeb/detalle?referencia=ES{n:07d}"
+            html, esperado = _oepm(n), f"Dispositivo número {n} para la desalinización de agua de mar."
+        else:
+            ruta = f"/patentscope/search/es/detail.jsf?docId=WO{n:07d}"
+            html = _patentscope(n)
+            esperado = None if n % SIN_RESUMEN == 0 else f"Procedimiento {n} de obtención de biocombustible."
+        with open(os.path.join(carpeta, ruta_grabacion(ruta)), "w", encoding="utf-8") as fichero:
+            fichero.write('<html><head><meta charset="utf-8"></head><body>' + html + '</body></html>')
+        documentos.append({"_id": n, "URL": ruta + " (enlace)", "esperado": esperado})
+    return documentos
+
+
+def servir(carpeta, latencia):
+    """
+    Arranca servidor_grabaciones.py en un hilo y devuelve su URL.
+    """
+    listo = threading.Event()
+    direccion = {}
+
+    def hilo():
+        bucle = asyncio.new_event_loop()
+        runner = web.AppRunner(crear_app(carpeta, latencia))
+        bucle.run_until_complete(runner.setup())
+        bucle.run_until_complete(web.TCPSite(runner, "127.0.0.1", 0).start())
+        direccion["url"] = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        listo.set()
+        bucle.run_forever()
+
+    threading.Thread(target=hilo, daemon=True).start()
+    listo.wait()
+    return direccion["url"]
+
+
+def principal(patentes, latencia, hilos):
+    with tempfile.TemporaryDirectory() as tmp:
+        documentos = generar_patentes(tmp, patentes)
+        url = servir(tmp, latencia)
+        for documento in documentos:
+            documento["URL"] = url + documento["URL"]
+
+        for n in (1, hilos):
+            inicio = time.perf_counter()
+            resultados = list(resumir_documentos(documentos, n))
+            segundos = time.perf_counter() - inicio
+            correctos = all(resumen == documento["esperado"] for documento, resumen, _ in resultados)
+            por_http = sum(origen == "http" for _, _, origen in resultados)
+            print(f"{n:3d} hilos: {segundos:6.2f} s  {len(resultados) / segundos:7.1f} patentes/s  "
+                  f"{por_http} por HTTP, {len(resultados) - por_http} para el navegador  "
+                  f"{'correcto' if correctos else 'DIFERENTE'}")
+            if not correctos:
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    patentes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    hilos = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    principal(patentes, latencia, hilos)
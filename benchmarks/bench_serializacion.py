@@ -0,0 +1,72 @@
+"""
+Microbenchmark de serialización de una página de /publicaciones/autor/{id}.
+
+Compara el camino por defecto de FastAPI (validar contra el response_model,
+jsonable_encoder y json.dumps) con la ruta rápida (orjson sobre los diccionarios
+que produce publicaciones_schema).
+
+Uso: python benchmarks/bench_serializacion.py [tamaño_pagina] [repeticiones]
+"""
+import json
+import os
+import sys
+import time
+from bson import ObjectId
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FastAPI"))
+from db.models.publicaciones import Publicacion
+from db.schemas.publicaciones import publicaciones_schema
+
+
+def publicacion_sintetica(i: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "Título": f"Publicación de prueba número {i} sobre oceanografía y ciencias marinas",
+        "Autores": [ObjectId() for _ in range(4)],
+        "Clasificación_UNESCO": "2510 Oceanografía",
+        "Colección": "Artículos",
+        "DOI": f"10.1016/j.prueba.{i}",
+        "Fecha_de_publicación": "2020",
+        "Fuente": "Journal of Marine Systems [ISSN 0924-7963], v. 12",
+        "ISSN": "0924-7963",
+        "Palabras_clave": "Oceanografía, Canarias, Corrientes",
+        "PDF": None,
+        "Resumen": "Resumen de prueba. " * 40,
+        "URI": f"http://hdl.handle.net/10553/{i}",
+    }
+
+
+def pagina_por_defecto(items: list[dict], validador: TypeAdapter) -> bytes:
+    # Lo que hace FastAPI con un response_model: validar, codificar y json.dumps
+    modelos = validador.validate_python(items)
+    return json.dumps(jsonable_encoder(modelos)).encode("utf-8")
+
+
+def pagina_rapida(items: list[dict]) -> bytes:
+    return orjson.dumps(items)
+
+
+def medir(funcion, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return repeticiones / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    tamano = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    items = publicaciones_schema([publicacion_sintetica(i) for i in range(tamano)])
+    validador = TypeAdapter(list[Publicacion])
+
+    antes = medir(lambda: pagina_por_defecto(items, validador), repeticiones)
+    despues = medir(lambda: pagina_rapida(items), repeticiones)
+
+    print(f"Página de {tamano} publicaciones, {repeticiones} repeticiones")
+    print(f"  Por defecto (pydantic + json):  {antes:10.1f} páginas/s")
+    print(f"  Ruta rápida (orjson):           {despues:10.1f} páginas/s")
+    print(f"  Aceleración: x{despues / antes:.1f}")
@@ -1,164 +1,329 @@
 # Importación de librerías necesarias
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, UpdateOne
+from ingesta import TAM_LOTE, escribir_lotes
+import argparse
 import os
+import queue
+import re
+import shutil
+import sys
 import tempfile
+import threading
 import time
-from pymongo import MongoClient
-import re
 
-# Conexión a la base de datos MongoDB
-# Se establece la conexión con la base de datos local llamada "Proyecto" y la colección "patentes".
-client = MongoClient("mongodb://localhost:27017/")
-db = client["Proyecto"]
-coleccion = db["patentes"]
+import requests
+
+# Filtro de documentos vigentes compartido con la API
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FastAPI"))
+from db.pipelines import NO_ELIMINADO
+
+# Rutas de Chromium y ChromeDriver
+CHROMIUM_PATH = "/usr/bin/chromium-browser"
+CHROMEDRIVER_PATH = "/usr/local/bin/chromedriver"
+# Cada navegador del pool usa su propio puerto de depuración a partir de este
+PUERTO_DEPURACION_BASE = 9222
+# Segundos máximos de espera a que aparezca el resumen en el navegador
+ESPERA_NAVEGADOR = 20
+# Descarga directa por HTTP (sin navegador) de las páginas que no necesitan JavaScript
+TIMEOUT_HTTP = 20
+CABECERAS_HTTP = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)"}
+
+
+def limpiar_url(url):
+    """
+    Elimina el texto entre paréntesis de la URL guardada y añade https:// si falta.
+    """
+    url_limpia = re.sub(r'\s*\([^)]*\)', '', url).strip()
+    if not url_limpia.startswith(('http://', 'https://')):
+        url_limpia = 'https://' + url_limpia
+    return url_limpia
+
 
-def obtener_resumen_contenido_dinamico(url_universidad):
+def extraer_resumen_oepm(html):
+    """
+    Resumen de una página de consultas2.oepm.es: la celda siguiente a la que
+    contiene "Resumen" en alguna de sus tablas.
     """
-    Extrae el resumen de contenido dinámico desde una URL específica.
-    Utiliza Selenium para manejar contenido dinámico y BeautifulSoup para procesar el HTML.
-    
-    Parámetro:
-    - url_universidad (str): URL de la página a procesar.
+    soup = BeautifulSoup(html, 'html.parser')
+    for table in soup.find_all('table'):
+        # Buscar celdas con el texto "Resumen"
+        resumen_cell = table.find(string=lambda text: text and "Resumen" in text)
+        if resumen_cell:
+            # Extraer el texto del resumen
+            texto_resumen = resumen_cell.find_next('td')
+            if texto_resumen:
+                return texto_resumen.get_text(strip=True)
+    return None
+
+
+def extraer_resumen_patentscope(html):
+    """
+    Resumen de una página de Patentscope: el primer span tras el texto "Resumen".
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    etiqueta_resumen = soup.find(string=lambda text: text and "Resumen" in text)
+    if etiqueta_resumen:
+        resumen_texto = etiqueta_resumen.find_next("span")
+        if resumen_texto:
+            return resumen_texto.get_text(strip=True)
+    return None
+
 
-    Retorna:
-    - str: Resumen extraído o None si no se encuentra.
+def extraer_resumen(url, html):
     """
-    driver = None
-    temp_dir = None
+    Resumen de la página según su dominio, o None si no se encuentra o el dominio
+    no es OEPM ni Patentscope.
+    """
+    if "consultas2.oepm.es" in url:
+        return extraer_resumen_oepm(html)
+    if "patentscope" in url:
+        return extraer_resumen_patentscope(html)
+    print(f"URL no reconocida como OEPM o Patentscope: {url}")
+    return None
+
+
+# Una sesión HTTP por hilo (requests.Session no es segura entre hilos); reutiliza
+# las conexiones con cada servidor
+_local = threading.local()
+
+
+def obtener_resumen_http(url):
+    """
+    Intenta extraer el resumen descargando la página sin navegador. Devuelve None si
+    falla la descarga o si el resumen no está en el HTML (lo genera JavaScript).
+    """
+    if not hasattr(_local, "sesion"):
+        _local.sesion = requests.Session()
+        _local.sesion.headers.update(CABECERAS_HTTP)
     try:
-        print(f"\nIntentando acceder a URL: {url_universidad}")
-        
-        # Crear un directorio temporal único para almacenar datos del navegador
-        temp_dir = tempfile.mkdtemp(prefix='chrome_', dir=os.path.expanduser('~'))
+        respuesta = _local.sesion.get(url, timeout=TIMEOUT_HTTP)
+        respuesta.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Error al descargar {url} por HTTP: {e}")
+        return None
+    return extraer_resumen(url, respuesta.content)
+
+
+class PoolNavegadores:
+    """
+    Pool de `tamano` sesiones de Chromium sin interfaz que se reutilizan entre
+    patentes. Cada sesión tiene su propio perfil temporal y su propio puerto de
+    depuración, así varias pueden funcionar a la vez. Los navegadores se abren al
+    pedirlos por primera vez y se cierran con cerrar().
+    """
+
+    def __init__(self, tamano):
+        self.tamano = tamano
+        self.libres = queue.Queue()
+        self.creados = 0
+        # Navegador -> (directorio temporal, número de su puerto de depuración)
+        self.navegadores = {}
+        # Números de navegadores descartados, que se reutilizan al crear otros
+        self.numeros_libres = []
+        self._candado = threading.Lock()
+
+    def _crear_navegador(self, numero):
+        # selenium solo se necesita si se usa el navegador
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        if not os.path.exists(CHROMEDRIVER_PATH):
+            raise FileNotFoundError(f"No se encontró ChromeDriver en la ruta: {CHROMEDRIVER_PATH}")
 
-        # Configurar las opciones del navegador Chrome
+        # Directorio temporal único para almacenar los datos de este navegador
+        temp_dir = tempfile.mkdtemp(prefix=f'chrome_{numero}_', dir=os.path.expanduser('~'))
         options = Options()
+        options.add_argument("--headless=new")  # Sin interfaz gráfica
         options.add_argument("--disable-gpu")  # Deshabilitar GPU
         options.add_argument("--no-sandbox")  # Evitar sandboxing
         options.add_argument("--disable-dev-shm-usage")  # Evitar uso compartido de memoria
-        options.add_argument("--remote-debugging-port=9222")  # Habilitar depuración remota
+        options.add_argument(f"--remote-debugging-port={PUERTO_DEPURACION_BASE + numero}")  # Un puerto por navegador
         options.add_argument("--window-size=1920,1080")  # Configurar tamaño de la ventana
         options.add_argument(f"--user-data-dir={temp_dir}")  # Establecer el directorio de usuario
         options.add_argument("--disable-extensions")  # Deshabilitar extensiones
         options.add_argument("--disable-notifications")  # Deshabilitar notificaciones
-        options.binary_location = "/usr/bin/chromium-browser"  # Ruta del navegador Chromium
+        options.binary_location = CHROMIUM_PATH
+        try:
+            driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        with self._candado:
+            self.navegadores[driver] = (temp_dir, numero)
+        return driver
 
-        # Verificar si el ejecutable de ChromeDriver existe
-        CHROMEDRIVER_PATH = "/usr/local/bin/chromedriver"
-        if not os.path.exists(CHROMEDRIVER_PATH):
-            raise FileNotFoundError(f"No se encontró ChromeDriver en la ruta: {CHROMEDRIVER_PATH}")
-        service = Service(CHROMEDRIVER_PATH)
-
-        # Inicializar el navegador Chrome
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        # Asegurarse de que la URL tenga el prefijo http/https
-        if not url_universidad.startswith(('http://', 'https://')):
-            url_universidad = 'https://' + url_universidad
-        
-        # Pausa para evitar sobrecarga antes de cargar la URL
-        time.sleep(2)
-        
-        # Acceder a la URL
-        driver.get(url_universidad)
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-
-        # Procesar contenido según el dominio detectado
-        if "consultas2.oepm.es" in url_universidad:
-            print("Detectado dominio OEPM")
-            time.sleep(5)  # Espera adicional para asegurar que el contenido cargue
-            html_content = driver.page_source  # Obtener el HTML de la página
-            soup = BeautifulSoup(html_content, 'html.parser', from_encoding='utf-8')
-
-            # Buscar tablas dentro de la página
-            tables = soup.find_all('table')
-            print(f"Encontradas {len(tables)} tablas")
-            for table in tables:
-                # Buscar celdas con el texto "Resumen"
-                resumen_cell = table.find(string=lambda text: text and "Resumen" in text)
-                if resumen_cell:
-                    # Extraer el texto del resumen
-                    texto_resumen = resumen_cell.find_next('td')
-                    if texto_resumen:
-                        return texto_resumen.get_text(strip=True)
-            print("No se encontró el resumen en las tablas de OEPM")
-
-        elif "patentscope" in url_universidad:
-            print("Detectado dominio Patentscope")
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Resumen')]"))
-            )
-            page_source = driver.page_source  # Obtener el HTML de la página
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
-            # Buscar el texto "Resumen"
-            etiqueta_resumen = soup.find(string=lambda text: text and "Resumen" in text)
-            if etiqueta_resumen:
-                resumen_texto = etiqueta_resumen.find_next("span")
-                if resumen_texto:
-                    return resumen_texto.get_text(strip=True)
-            print("No se encontró el resumen en Patentscope")
-        else:
-            print(f"URL no reconocida como OEPM o Patentscope: {url_universidad}")
+    def _tomar(self):
+        # Un navegador libre o uno nuevo si aún no se ha llegado a `tamano`; la espera
+        # se repite para que, si falla la creación de uno, otro hilo pueda intentarla
+        while True:
+            with self._candado:
+                crear = self.libres.empty() and self.creados < self.tamano
+                if crear:
+                    numero = self.numeros_libres.pop() if self.numeros_libres else self.creados
+                    self.creados += 1
+            if crear:
+                try:
+                    return self._crear_navegador(numero)
+                except Exception:
+                    with self._candado:
+                        self.creados -= 1
+                        self.numeros_libres.append(numero)
+                    raise
+            try:
+                return self.libres.get(timeout=1)
+            except queue.Empty:
+                continue
 
-    except Exception as e:
-        print(f"Error general al obtener el resumen: {e}")
-        return None
+    def _descartar(self, driver):
+        # Cierra un navegador que ha fallado y libera su hueco para crear otro nuevo
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._candado:
+            temp_dir, numero = self.navegadores.pop(driver)
+            self.creados -= 1
+            self.numeros_libres.append(numero)
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-    finally:
-        # Asegurar el cierre del navegador y eliminación del directorio temporal
-        if driver:
+    def obtener_resumen(self, url):
+        """
+        Carga la página en un navegador del pool, espera a que aparezca el texto
+        "Resumen" (en lugar de pausas fijas) y extrae el resumen. Si la sesión falla
+        (Chromium caído, sesión perdida...) el navegador se descarta en lugar de
+        devolverlo al pool, y la siguiente patente que lo necesite abre uno nuevo.
+        """
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        driver = self._tomar()
+        sano = True
+        try:
+            driver.get(url)
+            if "consultas2.oepm.es" in url:
+                condicion = (By.XPATH, "//table//*[contains(text(), 'Resumen')]")
+            elif "patentscope" in url:
+                condicion = (By.XPATH, "//*[contains(text(), 'Resumen')]")
+            else:
+                condicion = (By.TAG_NAME, "body")
             try:
-                driver.quit()
-            except:
-                pass
-        if temp_dir:
+                WebDriverWait(driver, ESPERA_NAVEGADOR).until(EC.presence_of_element_located(condicion))
+            except TimeoutException:
+                print(f"No apareció el resumen en {url} tras {ESPERA_NAVEGADOR} s")
+                return None
+            return extraer_resumen(url, driver.page_source)
+        except WebDriverException as e:
+            # Un TimeoutException de la carga de la página no invalida la sesión
+            sano = isinstance(e, TimeoutException)
+            raise
+        finally:
+            if sano:
+                self.libres.put(driver)
+            else:
+                self._descartar(driver)
+
+    def cerrar(self):
+        # Asegurar el cierre de los navegadores y la eliminación de sus directorios temporales
+        for driver, (temp_dir, _) in self.navegadores.items():
             try:
-                import shutil
-                shutil.rmtree(temp_dir)
-            except:
+                driver.quit()
+            except Exception:
                 pass
-    
-    return None
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.navegadores = {}
 
-# Contadores para estadísticas del proceso
-total_procesados = 0
-total_actualizados = 0
 
-# Iterar sobre cada documento en la colección MongoDB
-for documento in coleccion.find():
-    total_procesados += 1
-    url = documento.get("URL")
-    if not url:
-        print(f"Documento {total_procesados}: Sin URL, se omite.")
-        continue
+def obtener_resumen(url, pool=None, usar_http=True):
+    """
+    (resumen, origen) de la patente: primero por HTTP y, si no está en el HTML o la
+    descarga falla, con un navegador del pool (si hay pool). El origen es "http",
+    "navegador" o None si no se obtuvo.
+    """
+    try:
+        if usar_http:
+            resumen = obtener_resumen_http(url)
+            if resumen:
+                return resumen, "http"
+        if pool is not None:
+            resumen = pool.obtener_resumen(url)
+            if resumen:
+                return resumen, "navegador"
+    except Exception as e:
+        print(f"Error general al obtener el resumen de {url}: {e}")
+    return None, None
 
-    # Limpiar la URL eliminando texto entre paréntesis
-    url_limpia = re.sub(r'\s*\([^)]*\)', '', url).strip()
-    print(f"\nDocumento {total_procesados}")
-    print(f"URL original: {url}")
-    print(f"URL limpia: {url_limpia}")
-
-    # Obtener el resumen desde la URL
-    resumen = obtener_resumen_contenido_dinamico(url_limpia)
-
-    if resumen:
-        print("Resumen encontrado, actualizando base de datos...")
-        coleccion.update_one({"_id": documento["_id"]}, {"$set": {"resumen": resumen}})
-        total_actualizados += 1
-        print(f"Resumen actualizado. Total actualizados: {total_actualizados}")
-    else:
-        print("No se pudo obtener un resumen para esta URL.")
-
-# Resumen del proceso
-print(f"\nProceso completado:")
-print(f"Total de documentos procesados: {total_procesados}")
-print(f"Total de documentos actualizados: {total_actualizados}")
+
+def resumir_documentos(documentos, hilos=4, pool=None, usar_http=True):
+    """
+    Obtiene a la vez, con `hilos` hilos, los resúmenes de los documentos (con _id y
+    URL) y devuelve un generador de (documento, resumen, origen) en el orden de entrada.
+    """
+    def tarea(documento):
+        return (documento, *obtener_resumen(limpiar_url(documento["URL"]), pool, usar_http))
+
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        yield from ejecutor.map(tarea, documentos)
+
+
+def nuevas_estadisticas():
+    return {"procesados": 0, "sin_url": 0, "actualizados": 0, "http": 0, "navegador": 0}
+
+
+def main(args):
+    # Conexión a la base de datos MongoDB
+    # Se establece la conexión con la base de datos local llamada "Proyecto" y la colección "patentes".
+    client = MongoClient(args.mongo)
+    coleccion = client["Proyecto"]["patentes"]
+
+    estadisticas = nuevas_estadisticas()
+    documentos = []
+    # Las patentes marcadas como eliminadas por la carga incremental no se resumen
+    for documento in coleccion.find(NO_ELIMINADO, {"URL": 1}):
+        estadisticas["procesados"] += 1
+        if documento.get("URL"):
+            documentos.append(documento)
+        else:
+            estadisticas["sin_url"] += 1
+    print(f"{len(documentos)} patentes con URL de {estadisticas['procesados']} documentos")
+
+    inicio = time.perf_counter()
+    operaciones = []
+    pool = PoolNavegadores(args.navegadores) if args.navegadores > 0 else None
+    try:
+        for documento, resumen, origen in resumir_documentos(documentos, args.hilos, pool, not args.sin_http):
+            if not resumen:
+                print(f"No se pudo obtener un resumen para {documento['URL']}")
+                continue
+            estadisticas[origen] += 1
+            operaciones.append(UpdateOne({"_id": documento["_id"]}, {"$set": {"resumen": resumen}}))
+            # Los resúmenes se escriben en lotes a medida que se obtienen
+            if len(operaciones) >= TAM_LOTE:
+                estadisticas["actualizados"] += escribir_lotes(coleccion, operaciones)["documentos"]
+                operaciones = []
+        if operaciones:
+            estadisticas["actualizados"] += escribir_lotes(coleccion, operaciones)["documentos"]
+    finally:
+        if pool:
+            pool.cerrar()
+    segundos = time.perf_counter() - inicio
+
+    # Resumen del proceso
+    print(f"\nProceso completado en {segundos:.0f} s:")
+    print(f"Total de documentos procesados: {estadisticas['procesados']} ({estadisticas['sin_url']} sin URL)")
+    print(f"Total de documentos actualizados: {estadisticas['actualizados']} "
+          f"({estadisticas['http']} por HTTP, {estadisticas['navegador']} con navegador)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Añade el resumen de OEPM o Patentscope a las patentes")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI de MongoDB")
+    parser.add_argument("--hilos", type=int, default=4, help="Patentes procesadas a la vez")
+    parser.add_argument("--navegadores", type=int, default=2,
+                        help="Navegadores en el pool para las páginas que necesitan JavaScript (0 = solo HTTP)")
+    parser.add_argument("--sin-http", action="store_true", help="Usa siempre el navegador, sin intentar antes HTTP")
+    main(parser.parse_args())
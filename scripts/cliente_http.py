@@ -0,0 +1,266 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+
+# Conexiones abiertas a la vez en total y con un mismo servidor (keep-alive: las
+# conexiones se reutilizan entre peticiones)
+MAX_CONEXIONES = 16
+MAX_POR_HOST = 4
+# Peticiones por segundo a cada servidor (media) y ráfaga máxima permitida
+PETICIONES_POR_SEGUNDO = 4.0
+RAFAGA = 8
+# Reintentos ante errores de red o respuestas 429/5xx, con espera exponencial
+REINTENTOS = 4
+ESPERA_BASE = 1.0
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+TIMEOUT = 30
+# Máximo de páginas en la caché HTTP; al superarlo se eliminan las más antiguas
+MAX_PAGINAS_CACHE = 200_000
+# Escrituras de la caché HTTP por cada commit, y cada cuántas inserciones se
+# comprueba si hay que expulsar páginas
+CONFIRMAR_CADA = 200
+EXPULSAR_CADA = 1000
+
+
+def ruta_grabacion(url: str) -> str:
+    """
+    Nombre de fichero de una página grabada: su ruta y consulta escapadas. Es el
+    mismo que busca servidor_grabaciones.py para la petición equivalente.
+    """
+    partes = urlsplit(url)
+    return quote(partes.path + ("?" + partes.query if partes.query else ""), safe="")
+
+
+class CacheHTTP:
+    """
+    Caché HTTP en disco (SQLite) para los rastreos incrementales: guarda el cuerpo de
+    cada página con sus validadores ETag y Last-Modified. ClienteHTTP envía con ellos
+    una petición condicional y, si el servidor responde 304, reutiliza el cuerpo
+    guardado sin volver a descargarlo.
+
+    Las escrituras se confirman en lotes de CONFIRMAR_CADA (y al cerrar), no una por
+    página, porque se hacen desde el bucle de eventos. El tamaño se limita a
+    `max_paginas`, expulsando las guardadas o renovadas hace más tiempo; el número de
+    filas se lleva de forma aproximada y solo se recuenta al expulsar.
+    """
+
+    def __init__(self, ruta: str, max_paginas: int = MAX_PAGINAS_CACHE):
+        self.max_paginas = max_paginas
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS paginas ("
+            "url TEXT PRIMARY KEY, cuerpo BLOB NOT NULL, etag TEXT, last_modified TEXT, guardado REAL NOT NULL)"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS paginas_guardado ON paginas (guardado)")
+        self.conexion.commit()
+        self._filas = self.conexion.execute("SELECT COUNT(*) FROM paginas").fetchone()[0]
+        self._pendientes = 0
+        self._insertados = 0
+
+    def obtener(self, url: str):
+        # {"cuerpo", "etag", "last_modified", "guardado"} o None
+        fila = self.conexion.execute(
+            "SELECT cuerpo, etag, last_modified, guardado FROM paginas WHERE url = ?", (url,)
+        ).fetchone()
+        if fila is None:
+            return None
+        return dict(zip(("cuerpo", "etag", "last_modified", "guardado"), fila))
+
+    def guardar(self, url: str, cuerpo: bytes, etag: str = None, last_modified: str = None):
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO paginas (url, cuerpo, etag, last_modified, guardado) VALUES (?, ?, ?, ?, ?)",
+            (url, cuerpo, etag, last_modified, time.time())
+        )
+        # Aproximado: una página ya guardada se sustituye y no suma
+        self._filas += 1
+        self._insertados += 1
+        if self._insertados >= EXPULSAR_CADA and self._filas > self.max_paginas:
+            self._expulsar()
+        self._escrito()
+
+    def refrescar(self, url: str):
+        # La página sigue igual (304): se renueva su fecha para max_edad
+        self.conexion.execute("UPDATE paginas SET guardado = ? WHERE url = ?", (time.time(), url))
+        self._escrito()
+
+    def _escrito(self):
+        self._pendientes += 1
+        if self._pendientes >= CONFIRMAR_CADA:
+            self.conexion.commit()
+            self._pendientes = 0
+
+    def _expulsar(self):
+        self._filas = self.conexion.execute("SELECT COUNT(*) FROM paginas").fetchone()[0]
+        self._insertados = 0
+        sobran = self._filas - self.max_paginas
+        if sobran > 0:
+            self.conexion.execute(
+                "DELETE FROM paginas WHERE url IN (SELECT url FROM paginas ORDER BY guardado LIMIT ?)", (sobran,)
+            )
+            self._filas -= sobran
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+
+class LimitadorTasa:
+    """
+    Cubo de fichas: se reponen `tasa` fichas por segundo hasta `capacidad` y cada
+    petición consume una, así se permiten ráfagas cortas sin superar la tasa media.
+    """
+
+    def __init__(self, tasa: float, capacidad: int):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.fichas = float(capacidad)
+        self.ultimo = time.monotonic()
+        self._candado = asyncio.Lock()
+
+    async def esperar(self):
+        async with self._candado:
+            while True:
+                ahora = time.monotonic()
+                self.fichas = min(self.capacidad, self.fichas + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                await asyncio.sleep((1 - self.fichas) / self.tasa)
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP asíncrono para los rastreadores: una sesión aiohttp con conexiones
+    reutilizadas, límite de conexiones global y por servidor, un limitador de tasa
+    por servidor y reintentos con espera exponencial. Se usa como contexto:
+
+        async with ClienteHTTP() as cliente:
+            contenido = await cliente.obtener(url)
+
+    Con `grabar` se guarda cada página descargada en esa carpeta para poder servirla
+    después con servidor_grabaciones.py.
+
+    Con `cache` (CacheHTTP) las páginas ya vistas se piden de forma condicional y un
+    304 reutiliza el cuerpo guardado. Con `max_edad` (segundos), una página pedida
+    con `reutilizar=True` y guardada hace menos de ese tiempo se devuelve sin acceder
+    a la red. Solo deben pedirse así las páginas estables (perfiles y detalles): los
+    listados y las secciones se piden siempre, o un nuevo rastreo no vería los
+    investigadores ni los trabajos añadidos.
+    """
+
+    def __init__(self, max_conexiones: int = MAX_CONEXIONES, max_por_host: int = MAX_POR_HOST,
+                 peticiones_por_segundo: float = PETICIONES_POR_SEGUNDO, rafaga: int = RAFAGA,
+                 reintentos: int = REINTENTOS, grabar: str = None, cache: CacheHTTP = None,
+                 max_edad: float = None):
+        self.max_conexiones = max_conexiones
+        self.max_por_host = max_por_host
+        self.peticiones_por_segundo = peticiones_por_segundo
+        self.rafaga = rafaga
+        self.reintentos = reintentos
+        self.grabar = grabar
+        self.cache = cache
+        self.max_edad = max_edad
+        self.limitadores = {}
+        self.semaforos = {}
+        self.conexiones = asyncio.Semaphore(max_conexiones)
+        self.sesion = None
+        self.estadisticas = {
+            "peticiones": 0, "reintentos": 0, "errores": 0, "bytes": 0, "no_modificadas": 0, "sin_red": 0
+        }
+
+    async def __aenter__(self):
+        conector = aiohttp.TCPConnector(limit=self.max_conexiones, limit_per_host=self.max_por_host)
+        self.sesion = aiohttp.ClientSession(connector=conector, timeout=aiohttp.ClientTimeout(total=TIMEOUT))
+        if self.grabar:
+            os.makedirs(self.grabar, exist_ok=True)
+        return self
+
+    async def __aexit__(self, *excepcion):
+        await self.sesion.close()
+
+    def _limitador(self, url: str) -> LimitadorTasa:
+        host = urlsplit(url).netloc
+        if host not in self.limitadores:
+            self.limitadores[host] = LimitadorTasa(self.peticiones_por_segundo, self.rafaga)
+        return self.limitadores[host]
+
+    def _semaforo(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self.semaforos:
+            self.semaforos[host] = asyncio.Semaphore(self.max_por_host)
+        return self.semaforos[host]
+
+    async def _espera_reintento(self, intento: int, retry_after: str = None):
+        self.estadisticas["reintentos"] += 1
+        if retry_after and retry_after.isdigit():
+            espera = int(retry_after)
+        else:
+            espera = ESPERA_BASE * 2 ** intento * random.uniform(0.5, 1.5)
+        await asyncio.sleep(espera)
+
+    async def obtener(self, url: str, reutilizar: bool = False):
+        """
+        Contenido de la página o None si no se pudo descargar tras los reintentos.
+        Con `reutilizar` se aplica `max_edad` a la copia guardada.
+        """
+        guardada = self.cache.obtener(url) if self.cache else None
+        if guardada and reutilizar and self.max_edad is not None and time.time() - guardada["guardado"] < self.max_edad:
+            self.estadisticas["sin_red"] += 1
+            return guardada["cuerpo"]
+
+        cabeceras = {}
+        if guardada and guardada["etag"]:
+            cabeceras["If-None-Match"] = guardada["etag"]
+        if guardada and guardada["last_modified"]:
+            cabeceras["If-Modified-Since"] = guardada["last_modified"]
+
+        for intento in range(self.reintentos + 1):
+            reintentar, retry_after = False, None
+            # Se espera turno con los semáforos antes de la petición: el timeout de
+            # aiohttp contaría también la espera por una conexión libre del pool, y con
+            # muchas peticiones encoladas agotaría reintentos sin llegar a enviarlas
+            async with self._semaforo(url), self.conexiones:
+                await self._limitador(url).esperar()
+                try:
+                    async with self.sesion.get(url, headers=cabeceras) as respuesta:
+                        if respuesta.status in ESTADOS_REINTENTABLES and intento < self.reintentos:
+                            reintentar, retry_after = True, respuesta.headers.get("Retry-After")
+                        elif respuesta.status == 304 and guardada:
+                            self.estadisticas["peticiones"] += 1
+                            self.estadisticas["no_modificadas"] += 1
+                            self.cache.refrescar(url)
+                            return guardada["cuerpo"]
+                        else:
+                            respuesta.raise_for_status()
+                            contenido = await respuesta.read()
+                            validadores = (respuesta.headers.get("ETag"), respuesta.headers.get("Last-Modified"))
+                except aiohttp.ClientResponseError as e:
+                    print(f"Error al acceder a {url}: {e.status} {e.message}")
+                    self.estadisticas["errores"] += 1
+                    return None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if intento == self.reintentos:
+                        print(f"Error al acceder a {url}: {e!r}")
+                        self.estadisticas["errores"] += 1
+                        return None
+                    reintentar = True
+            # La espera antes de reintentar no ocupa conexión
+            if reintentar:
+                await self._espera_reintento(intento, retry_after)
+                continue
+
+            self.estadisticas["peticiones"] += 1
+            self.estadisticas["bytes"] += len(contenido)
+            if self.cache:
+                self.cache.guardar(url, contenido, *validadores)
+            if self.grabar:
+                with open(os.path.join(self.grabar, ruta_grabacion(url)), "wb") as fichero:
+                    fichero.write(contenido)
+            return contenido
@@ -1,15 +1,28 @@
 # Importación de librerías necesarias
 from sentence_transformers import SentenceTransformer
 from motor.motor_asyncio import AsyncIOMotorClient
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import argparse
 import asyncio
 import logging
 import numpy as np
 import traceback
 import sys
+import time
 import pymongo
 from dotenv import load_dotenv
+from texto_embedding import (
+    NOMBRE_MODELO, VERSION_EMBEDDING, get_campos_embedding, texto_embedding, hash_texto, filtro_desactualizados
+)
+from instantanea_embeddings import exportar_instantanea
 import os
 
+# La caché de embeddings se comparte con el servicio de búsqueda
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "APISEARCH"))
+from cache_embeddings import CacheEmbeddings
+
 
 # Configuración del logger para registrar eventos
 logging.basicConfig(
@@ -26,50 +39,281 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 MONGO_URI = os.getenv("MONGODB_URL")
 
-# Carga del modelo de embeddings de SentenceTransformer
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+# Modelo de embeddings de SentenceTransformer (NOMBRE_MODELO). Se carga la primera
+# vez que se usa, una vez por proceso: los procesos del pool de codificación tienen
+# su propia copia
+model = None
+
+def obtener_modelo():
+    global model
+    if model is None:
+        model = SentenceTransformer(NOMBRE_MODELO)
+    return model
+
+def codificar_textos(textos):
+    """
+    Codifica una lista de textos con el modelo del proceso actual.
+    """
+    return obtener_modelo().encode(textos, batch_size=TAM_LOTE_MODELO)
+
+def _iniciar_trabajador(hilos):
+    # Cada proceso del pool usa solo su parte de los núcleos para que N procesos con
+    # PyTorch no compitan por todos ellos a la vez
+    import torch
+    torch.set_num_threads(hilos)
+    obtener_modelo()
+
+def crear_pool(procesos):
+    """
+    Pool de procesos de codificación, cada uno con su copia del modelo y
+    cpu_count / procesos hilos de PyTorch. Con un solo proceso devuelve None y se
+    codifica en un hilo del propio proceso.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        return None
+    hilos = max(1, (os.cpu_count() or 1) // procesos)
+    # spawn: hacer fork de un proceso que ya tiene hilos de PyTorch puede bloquearse
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_trabajador,
+        initargs=(hilos,)
+    )
+
+# Documentos por lote en el pipeline (lectura, codificación y bulk_write)
+TAM_LOTE = 256
+# Tamaño de lote interno que usa el modelo dentro de cada encode
+TAM_LOTE_MODELO = 64
+# Lotes que pueden esperar entre dos etapas: si una etapa va más lenta, las
+# anteriores se bloquean en lugar de acumular documentos en memoria
+TAM_COLA = 4
+# Marca de fin de una cola
+FIN = None
+
+def nuevas_metricas():
+    # Documentos tratados por una etapa, segundos de trabajo y segundos esperando a las colas
+    return {'documentos': 0, 'segundos': 0.0, 'espera': 0.0}
+
+async def esperar_cola(operacion, metricas):
+    """
+    Espera un get/put de una cola contando el tiempo bloqueado, que no es trabajo de la etapa.
+    """
+    inicio = time.perf_counter()
+    resultado = await operacion
+    metricas['espera'] += time.perf_counter() - inicio
+    return resultado
+
+def cerrar_metricas(metricas, inicio):
+    metricas['segundos'] = time.perf_counter() - inicio - metricas.pop('espera')
 
-def safe_str(value):
+async def leer_lotes(collection, filtro, campos, salida, metricas, stats):
     """
-    Convierte de forma segura cualquier valor a string.
-    - Si el valor es None, retorna una cadena vacía.
-    - Si el valor es una lista, combina los elementos en una sola cadena.
-    - Si el valor no es una lista ni None, lo convierte directamente a string.
+    Etapa de lectura: recorre el cursor proyectando solo los campos del texto y los
+    metadatos del embedding y envía lotes de (_id, texto, hash) a la cola de
+    codificación. Si el documento ya tiene un embedding del modelo actual para ese
+    mismo texto (p. ej. al cambiar solo VERSION_EMBEDDING) no se vuelve a codificar:
+    solo se actualizan sus metadatos.
     """
-    if value is None:
-        return ""
-    if isinstance(value, list):
-        return " ".join(str(v) for v in value if v is not None)
-    return str(value)
+    inicio = time.perf_counter()
+    lote = []
+    reutilizados = []
+    proyeccion = {campo: 1 for campo in campos}
+    proyeccion.update({"embedding_model": 1, "embedding_hash": 1})
 
-def get_campos_embedding(collection_name):
+    async def marcar_reutilizados():
+        await collection.update_many(
+            {"_id": {"$in": reutilizados}},
+            {"$set": {"embedding_version": VERSION_EMBEDDING}, "$unset": {"embedding_pendiente": ""}}
+        )
+        stats['documentos_reutilizados'] += len(reutilizados)
+        reutilizados.clear()
+
+    try:
+        async for doc in collection.find(filtro, proyeccion).batch_size(TAM_LOTE):
+            texto = texto_embedding(doc, campos)
+            if not texto:
+                logger.warning(f"Documento {doc.get('_id')} sin texto para procesar")
+                stats['errores'] += 1
+                continue
+            hash_actual = hash_texto(texto)
+            if doc.get("embedding_model") == NOMBRE_MODELO and doc.get("embedding_hash") == hash_actual:
+                reutilizados.append(doc["_id"])
+                if len(reutilizados) == TAM_LOTE:
+                    await marcar_reutilizados()
+                continue
+            lote.append((doc["_id"], texto, hash_actual))
+            metricas['documentos'] += 1
+            if len(lote) == TAM_LOTE:
+                await esperar_cola(salida.put(lote), metricas)
+                lote = []
+        if lote:
+            await esperar_cola(salida.put(lote), metricas)
+        if reutilizados:
+            await marcar_reutilizados()
+    finally:
+        cerrar_metricas(metricas, inicio)
+    await salida.put(FIN)
+
+async def codificar_lotes(entrada, salida, metricas, stats, pool=None, en_vuelo=1, cache=None):
     """
-    Obtiene los campos que se deben usar para generar el embedding en función de la colección.
-    - Parámetro:
-      - collection_name (str): Nombre de la colección.
-    - Retorna:
-      - Lista de campos específicos para la colección dada.
+    Etapa de codificación: un encode por lote, fuera del bucle de eventos para que
+    este siga leyendo y escribiendo mientras el modelo calcula. Sin pool se codifica
+    en un hilo; con pool se mantienen `en_vuelo` lotes codificándose a la vez y
+    los resultados se entregan en el orden en que llegaron los lotes.
+
+    Cada texto distinto del lote se codifica una sola vez. Con caché solo se
+    codifican los que no están en ella, y los nuevos embeddings se guardan para las
+    siguientes colecciones y ejecuciones. Las lecturas y escrituras de la caché
+    (SQLite) se hacen en un hilo: pueden esperar el bloqueo del fichero mientras la
+    API escribe, y el bucle de eventos sigue leyendo y escribiendo en MongoDB.
     """
-    campos_mapping = {
-        'autores': ['Nombre', 'Email', 'URL_del_perfil'],
-        'publicaciones': ['Título', 'Resumen', 'Palabras_clave'],
-        'tesis': ['Título', 'Resumen', 'Palabras_clave', 'Descripción'],
-        'proyectos': ['Título', 'Tipo', 'Organismo Financiador'],
-        'patentes': ['Título', 'Resumen', 'URL']
-    }
-    # Extrae el nombre base de la colección (sin prefijo)
-    collection_key = collection_name.lower().split('.')[-1]
-    return campos_mapping.get(collection_key, [])
+    loop = asyncio.get_running_loop()
+    pendientes = deque()
 
-async def generate_embeddings():
+    async def entregar():
+        lote, vectores, faltan, futuro = pendientes.popleft()
+        if futuro is not None:
+            try:
+                nuevos = await futuro
+            except Exception as lote_error:
+                logger.error(f"Error codificando un lote de {len(lote)} documentos: {lote_error}")
+                logger.error(traceback.format_exc())
+                stats['errores'] += len(lote)
+                return
+            if cache:
+                await asyncio.to_thread(cache.guardar_muchos, faltan, nuevos)
+            por_texto = dict(zip(faltan, nuevos))
+            for i, (_, texto, _) in enumerate(lote):
+                if vectores[i] is None:
+                    vectores[i] = por_texto[texto]
+        metricas['documentos'] += len(lote)
+        await esperar_cola(salida.put((lote, np.vstack(vectores).tolist())), metricas)
+
+    inicio = time.perf_counter()
+    try:
+        while (lote := await esperar_cola(entrada.get(), metricas)) is not FIN:
+            textos = [texto for _, texto, _ in lote]
+            vectores = await asyncio.to_thread(cache.obtener_muchos, textos) if cache else [None] * len(textos)
+            # Textos distintos que hay que codificar
+            faltan = list(dict.fromkeys(texto for texto, vector in zip(textos, vectores) if vector is None))
+            futuro = loop.run_in_executor(pool, codificar_textos, faltan) if faltan else None
+            pendientes.append((lote, vectores, faltan, futuro))
+            if len(pendientes) >= en_vuelo:
+                await entregar()
+        while pendientes:
+            await entregar()
+    finally:
+        cerrar_metricas(metricas, inicio)
+    await salida.put(FIN)
+
+async def escribir_lotes(collection, collection_name, entrada, metricas, stats):
+    """
+    Etapa de escritura: un bulk_write(ordered=False) por lote codificado.
+    """
+    inicio = time.perf_counter()
+    try:
+        while (elemento := await esperar_cola(entrada.get(), metricas)) is not FIN:
+            lote, vectores = elemento
+            operaciones = [
+                pymongo.UpdateOne(
+                    {"_id": _id},
+                    {
+                        "$set": {
+                            "embedding": vector,
+                            "embedding_text": texto,
+                            "embedding_model": NOMBRE_MODELO,
+                            "embedding_version": VERSION_EMBEDDING,
+                            "embedding_hash": hash_actual
+                        },
+                        "$unset": {"embedding_pendiente": ""}
+                    }
+                )
+                for (_id, texto, hash_actual), vector in zip(lote, vectores)
+            ]
+            try:
+                await collection.bulk_write(operaciones, ordered=False)
+            except Exception as lote_error:
+                logger.error(f"Error escribiendo un lote en {collection_name}: {lote_error}")
+                stats['errores'] += len(operaciones)
+                continue
+            metricas['documentos'] += len(operaciones)
+            stats['documentos_procesados'] += len(operaciones)
+            logger.info(f"Procesados {stats['documentos_procesados']} documentos en {collection_name}")
+    finally:
+        cerrar_metricas(metricas, inicio)
+
+async def procesar_coleccion(collection, collection_name, filtro, campos, stats, pool=None, en_vuelo=1, cache=None):
+    """
+    Genera los embeddings de los documentos que cumplen el filtro con un pipeline
+    productor/consumidor de tres etapas conectadas por colas acotadas: lectura del
+    cursor, codificación por lotes y escritura con bulk_write. Devuelve las métricas
+    de cada etapa.
+    """
+    metricas = {'lectura': nuevas_metricas(), 'codificacion': nuevas_metricas(), 'escritura': nuevas_metricas()}
+    textos = asyncio.Queue(maxsize=TAM_COLA)
+    vectores = asyncio.Queue(maxsize=TAM_COLA)
+    tareas = [
+        asyncio.create_task(leer_lotes(collection, filtro, campos, textos, metricas['lectura'], stats)),
+        asyncio.create_task(codificar_lotes(textos, vectores, metricas['codificacion'], stats, pool, en_vuelo, cache)),
+        asyncio.create_task(escribir_lotes(collection, collection_name, vectores, metricas['escritura'], stats)),
+    ]
+    try:
+        await asyncio.gather(*tareas)
+    except BaseException:
+        # Si una etapa falla las demás quedarían bloqueadas en su cola
+        for tarea in tareas:
+            tarea.cancel()
+        raise
+    return metricas
+
+def precalentar_cache(carpeta, cache, pool=None):
+    """
+    Codifica y guarda en la caché los textos de los documentos de la instantánea del
+    corpus (instantanea_corpus.py) que aún no están en ella. Se leen de los ficheros
+    Arrow, sin consultar MongoDB, y cada texto distinto se codifica una sola vez; los
+    documentos de MongoDB con el mismo texto se resuelven después con la caché.
+    """
+    # pyarrow solo se necesita con --precalentar
+    from instantanea_corpus import documentos_corpus
+
+    textos = {}
+    for coleccion, doc in documentos_corpus(carpeta):
+        texto = texto_embedding(doc, get_campos_embedding(coleccion))
+        if texto:
+            textos[texto] = None
+    textos = list(textos)
+    faltan = []
+    for i in range(0, len(textos), TAM_LOTE):
+        lote = textos[i:i + TAM_LOTE]
+        faltan.extend(texto for texto, vector in zip(lote, cache.obtener_muchos(lote)) if vector is None)
+    # Las consultas del precalentado no cuentan en la tasa de aciertos de la ejecución
+    cache.aciertos = cache.fallos = 0
+
+    lotes = [faltan[i:i + TAM_LOTE] for i in range(0, len(faltan), TAM_LOTE)]
+    codificados = pool.map(codificar_textos, lotes) if pool else map(codificar_textos, lotes)
+    for lote, vectores in zip(lotes, codificados):
+        cache.guardar_muchos(lote, vectores)
+    return {'textos': len(textos), 'codificados': len(faltan)}
+
+async def generate_embeddings(procesos=1, exportar=None, dtype='float32', ruta_cache=None, precalentar=None):
     """
     Genera embeddings para los documentos almacenados en MongoDB:
-    1. Conecta a la base de datos.
-    2. Itera por cada colección, identificando documentos sin embedding.
-    3. Genera embeddings para estos documentos y actualiza la base de datos.
+    1. Conecta a la base de datos (y crea el pool de codificación si procesos != 1).
+    2. Itera por cada colección, identificando con una consulta indexada los documentos
+       sin embedding o con un embedding desactualizado (filtro_desactualizados).
+    3. Genera embeddings para estos documentos y actualiza la base de datos junto con
+       el modelo, la versión y el hash del texto codificado.
     4. Registra estadísticas y errores del proceso.
+    Con `ruta_cache` se consulta la caché de embeddings (SQLite) antes de codificar;
+    con `precalentar` (carpeta de la instantánea del corpus) antes se llenan en ella
+    los textos de la instantánea (precalentar_cache).
+    5. Si se indica `exportar`, escribe en esa carpeta la instantánea .npy de los
+       embeddings que carga APISEARCH.
     """
     client = None  # Cliente MongoDB
+    pool = None  # Pool de procesos de codificación
+    cache = None  # Caché de embeddings por contenido
     collection_stats = {}  # Diccionario para estadísticas detalladas por colección
 
     try:
@@ -88,6 +332,19 @@ async def generate_embeddings():
         client = AsyncIOMotorClient(MONGO_URI, **connection_options)
         db = client.Proyecto  # Seleccionar la base de datos
 
+        procesos = procesos or os.cpu_count() or 1
+        pool = crear_pool(procesos)
+        logger.info(f"Codificando con {procesos} procesos")
+        if ruta_cache:
+            cache = CacheEmbeddings(ruta_cache, NOMBRE_MODELO)
+        if precalentar and cache:
+            inicio = time.perf_counter()
+            p = precalentar_cache(precalentar, cache, pool)
+            logger.info(f"Caché precalentada desde {precalentar}: {p['codificados']} de {p['textos']} textos "
+                        f"codificados en {time.perf_counter() - inicio:.1f} s")
+        elif precalentar:
+            logger.warning("--precalentar necesita la caché de embeddings; se omite con --sin-cache")
+
         # Listar las colecciones disponibles en la base de datos
         collection_names = await db.list_collection_names()
         logger.info(f"Colecciones encontradas: {collection_names}")
@@ -100,12 +357,19 @@ async def generate_embeddings():
         for collection_name in collection_names:
             try:
                 collection = db[collection_name]
+
+                # Obtener los campos relevantes para esta colección
+                campos_para_embedding = get_campos_embedding(collection_name)
+                if not campos_para_embedding:
+                    logger.info(f"Colección {collection_name} sin campos para embedding, se omite")
+                    continue
                 
                 # Inicializar estadísticas para esta colección
                 collection_stats[collection_name] = {
                     'total_documentos': 0,
-                    'documentos_sin_embedding': 0,
+                    'documentos_desactualizados': 0,
                     'documentos_procesados': 0,
+                    'documentos_reutilizados': 0,
                     'documentos_con_embedding_existente': 0,
                     'errores': 0
                 }
@@ -114,61 +378,28 @@ async def generate_embeddings():
                 total_docs = await collection.count_documents({})
                 collection_stats[collection_name]['total_documentos'] = total_docs
                 
-                # Contar documentos sin embedding
-                docs_without_embedding = await collection.count_documents({"embedding": {"$exists": False}})
-                collection_stats[collection_name]['documentos_sin_embedding'] = docs_without_embedding
+                # Contar documentos sin embedding o con embedding desactualizado
+                filtro = filtro_desactualizados()
+                docs_desactualizados = await collection.count_documents(filtro)
+                collection_stats[collection_name]['documentos_desactualizados'] = docs_desactualizados
                 
                 # Contar documentos con embedding existente
                 docs_with_embedding = await collection.count_documents({"embedding": {"$exists": True}})
                 collection_stats[collection_name]['documentos_con_embedding_existente'] = docs_with_embedding
                 
-                # Procesar documentos sin embedding
-                processed_in_collection = 0
-                errors_in_collection = 0
-                
-                # Obtener los campos relevantes para esta colección
-                campos_para_embedding = get_campos_embedding(collection_name)
-                
-                # Procesar documentos faltantes de embedding
-                async for doc in collection.find({"embedding": {"$exists": False}}):
-                    try:
-                        # Construir el texto base para el embedding combinando los campos relevantes
-                        texto_para_embedding = ""
-                        for campo in campos_para_embedding:
-                            valor = doc.get(campo, '')
-                            if valor:
-                                texto_para_embedding += " " + safe_str(valor)
-                        
-                        texto_para_embedding = texto_para_embedding.strip()
-                        
-                        if texto_para_embedding:
-                            # Generar embedding usando el modelo
-                            embedding = model.encode(texto_para_embedding)
-                            
-                            # Actualizar el documento en la base de datos
-                            await collection.update_one(
-                                {"_id": doc["_id"]},
-                                {"$set": {"embedding": embedding.tolist(), "embedding_text": texto_para_embedding}}
-                            )
-                            processed_in_collection += 1
-                            
-                            # Log de progreso cada 10 documentos procesados
-                            if processed_in_collection % 10 == 0:
-                                logger.info(f"Procesados {processed_in_collection} documentos en {collection_name}")
-                        else:
-                            logger.warning(f"Documento {doc.get('_id')} sin texto para procesar")
-                            errors_in_collection += 1
-                    
-                    except Exception as doc_error:
-                        # Log de errores a nivel de documento
-                        logger.error(f"Error procesando documento en {collection_name}: {doc_error}")
-                        logger.error(traceback.format_exc())
-                        errors_in_collection += 1
-                
-                # Actualizar estadísticas para la colección actual
-                collection_stats[collection_name]['documentos_procesados'] = processed_in_collection
-                collection_stats[collection_name]['errores'] = errors_in_collection
-                
+                # Procesar documentos desactualizados con el pipeline por lotes
+                metricas = await procesar_coleccion(
+                    collection, collection_name, filtro,
+                    campos_para_embedding, collection_stats[collection_name], pool, procesos, cache
+                )
+                for etapa, m in metricas.items():
+                    docs_s = m['documentos'] / m['segundos'] if m['segundos'] > 0 else 0.0
+                    logger.info(f"  {collection_name} - {etapa}: {m['documentos']} documentos, "
+                                f"{m['segundos']:.1f} s de trabajo ({docs_s:.0f} docs/s)")
+
+                processed_in_collection = collection_stats[collection_name]['documentos_procesados']
+                errors_in_collection = collection_stats[collection_name]['errores']
+
                 total_processed += processed_in_collection
                 total_errors += errors_in_collection
             
@@ -181,15 +412,26 @@ async def generate_embeddings():
         for collection, stats in collection_stats.items():
             logger.info(f"\nColección: {collection}")
             logger.info(f"  Total documentos: {stats['total_documentos']}")
-            logger.info(f"  Documentos sin embedding: {stats['documentos_sin_embedding']}")
+            logger.info(f"  Documentos sin embedding o desactualizados: {stats['documentos_desactualizados']}")
             logger.info(f"  Documentos con embedding existente: {stats['documentos_con_embedding_existente']}")
             logger.info(f"  Documentos procesados: {stats['documentos_procesados']}")
+            logger.info(f"  Embeddings reutilizados (mismo modelo y texto): {stats['documentos_reutilizados']}")
             logger.info(f"  Errores: {stats['errores']}")
         
         # Log de resumen final
         logger.info("\nProceso de generación de embeddings completado")
         logger.info(f"Total de documentos procesados: {total_processed}")
         logger.info(f"Total de errores: {total_errors}")
+        if cache:
+            c = cache.estadisticas()
+            logger.info(f"Caché de embeddings: {c['aciertos']} aciertos, {c['fallos']} fallos "
+                        f"(tasa de aciertos {c['tasa_aciertos']:.1%})")
+
+        if exportar:
+            manifiesto = await exportar_instantanea(db, collection_names, exportar, dtype)
+            documentos = sum(info['documentos'] for info in manifiesto['colecciones'].values())
+            logger.info(f"Instantánea exportada en {exportar}: {documentos} embeddings {manifiesto['dtype']}, "
+                        f"versión del corpus {manifiesto['version_corpus']}")
     
     except Exception as main_error:
         # Log de errores generales
@@ -197,6 +439,10 @@ async def generate_embeddings():
         logger.error(traceback.format_exc())
     
     finally:
+        if pool:
+            pool.shutdown()
+        if cache:
+            cache.cerrar()
         # Asegurar el cierre de la conexión con MongoDB
         if client:
             client.close()
@@ -204,8 +450,20 @@ async def generate_embeddings():
 
 # Punto de entrada principal del script
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los embeddings de los documentos en MongoDB")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos de codificación (0 = todos los núcleos)")
+    parser.add_argument("--exportar", metavar="CARPETA", help="Exporta al terminar la instantánea .npy para APISEARCH")
+    parser.add_argument("--float16", action="store_true", help="Guarda la instantánea en float16 (mitad de tamaño)")
+    parser.add_argument("--cache", default="cache_embeddings.sqlite", help="Fichero SQLite de la caché de embeddings")
+    parser.add_argument("--sin-cache", action="store_true", help="Codifica todos los textos sin consultar la caché")
+    parser.add_argument("--precalentar", metavar="INSTANTANEA",
+                        help="Codifica antes en la caché los textos de la instantánea Parquet/Arrow del corpus")
+    args = parser.parse_args()
     try:
-        asyncio.run(generate_embeddings())  # Ejecutar la función principal
+        asyncio.run(generate_embeddings(
+            args.procesos, args.exportar, 'float16' if args.float16 else 'float32',
+            None if args.sin_cache else args.cache, args.precalentar
+        ))  # Ejecutar la función principal
     except KeyboardInterrupt:
         logger.info("Proceso interrumpido por el usuario")
     except Exception as e:
@@ -0,0 +1,152 @@
+import json
+from difflib import SequenceMatcher
+from nombres import claves_nombre, plegar, separar_menciones
+
+# Puntuación mínima para unir una mención en texto con un investigador
+UMBRAL_MENCION = 0.9
+# Puntuación mínima para unir dos perfiles de investigador. Los perfiles se puntúan
+# sin iniciales ni prefijos compatibles (puntuar(..., estricto=True)), así que solo
+# se unen los que tienen apellidos y nombre idénticos tras plegar tildes
+UMBRAL_INVESTIGADORES = 0.98
+
+# Nombres de relleno que deja el scraper cuando no encuentra el nombre
+NOMBRES_VACIOS = {"none none", "n a"}
+
+
+def clave_bloque(claves: tuple) -> str:
+    """
+    Clave de bloqueo: primer apellido plegado más la inicial del nombre. Solo se
+    comparan entre sí las entidades que comparten clave.
+
+    >>> clave_bloque((("abad", "vazquez"), ("cipriano", "carlos")))
+    'abad c'
+    """
+    apellidos, nombre = claves
+    return f"{apellidos[0]} {nombre[0][0] if nombre else ''}"
+
+
+def _similitud(a: tuple, b: tuple, estricto: bool = False) -> float:
+    # Similitud de dos secuencias de tokens; una secuencia que es prefijo de la otra
+    # ("abad" frente a "abad vazquez") o iniciales compatibles ("j a" frente a
+    # "jose antonio") cuentan como casi iguales. En modo estricto solo cuentan los
+    # tokens idénticos
+    if estricto:
+        return 1.0 if a == b else 0.0
+    if not a or not b:
+        return 0.5
+    corta, larga = sorted((a, b), key=len)
+    if all(x == y or (len(x) == 1 and y.startswith(x)) for x, y in zip(corta, larga)):
+        return 1.0 if len(corta) == len(larga) else 0.95
+    return SequenceMatcher(None, " ".join(a), " ".join(b)).ratio()
+
+
+def puntuar(a: tuple, b: tuple, estricto: bool = False) -> float:
+    """
+    Puntuación entre 0 y 1 de que dos nombres (apellidos, nombre) sean la misma persona.
+    Las iniciales y los nombres incompletos solo son compatibles en las menciones en
+    texto; entre perfiles (estricto) "J." o "Juan" no son "Juan Carlos".
+    """
+    return 0.6 * _similitud(a[0], b[0], estricto) + 0.4 * _similitud(a[1], b[1], estricto)
+
+
+def agrupar_perfiles(claves: dict, bloques: dict) -> tuple[dict, int]:
+    """
+    Perfiles de investigador duplicados: ({url: url_canonica}, pares comparados). Se
+    comparan los pares de cada bloque y dos grupos solo se unen si todos sus pares
+    superan el umbral (enlace completo), no por transitividad.
+
+    >>> claves = {f"u{i}": claves_nombre("García Pérez, " + nombre) for i, nombre in
+    ...           enumerate(["Juan Carlos", "Juan", "Juan Antonio", "J.", "José"], 1)}
+    >>> claves["u6"] = claves_nombre("Garcia Perez, Juan  Carlos")
+    >>> agrupar_perfiles(claves, {"garcia j": list(claves)})[0]
+    {'u6': 'u1'}
+    """
+    grupos = {url: [url] for url in claves}  # canónica -> perfiles del grupo
+    canonica = {url: url for url in claves}
+    comparaciones = 0
+    for urls in bloques.values():
+        for i, a in enumerate(urls):
+            for b in urls[i + 1:]:
+                comparaciones += 1
+                ga, gb = canonica[a], canonica[b]
+                if ga == gb or puntuar(claves[a], claves[b], estricto=True) < UMBRAL_INVESTIGADORES:
+                    continue
+                if all(puntuar(claves[x], claves[y], estricto=True) >= UMBRAL_INVESTIGADORES
+                       for x in grupos[ga] for y in grupos[gb]):
+                    # El grupo se identifica por la URL menor
+                    destino, origen = min(ga, gb), max(ga, gb)
+                    for url in grupos.pop(origen):
+                        canonica[url] = destino
+                        grupos[destino].append(url)
+    return {url: c for url, c in canonica.items() if c != url}, comparaciones
+
+
+def resolver_entidades(mapa) -> dict:
+    """
+    Resuelve las entidades de autor de un MapaTrabajos:
+      - perfiles de investigador duplicados (mismo nombre con distinta URL), que se
+        unen al perfil con la URL menor (agrupar_perfiles);
+      - nombres en texto de las tesis no atribuidas, que se sustituyen por los
+        investigadores reconocidos si todas sus menciones se resuelven sin ambigüedad.
+
+    Devuelve el mapeo {"investigadores": {url: url_canonica}, "textos": {texto: [urls]}}
+    y las estadísticas de comparaciones frente a comparar todos los pares.
+    """
+    bloques = {}
+    claves = {}
+    for url, doc in mapa.autores.items():
+        if plegar(doc.get("Nombre")) in NOMBRES_VACIOS:
+            continue
+        claves[url] = claves_nombre(doc.get("Nombre") or "")
+        if claves[url][0]:
+            bloques.setdefault(clave_bloque(claves[url]), []).append(url)
+
+    # Perfiles duplicados: pares dentro de cada bloque
+    investigadores, comparaciones = agrupar_perfiles(claves, bloques)
+
+    # Nombres en texto de las tesis
+    textos = {}
+    vistos = set()
+    menciones_totales = 0
+    canonico = lambda url: investigadores.get(url, url)
+    for entrada in mapa.trabajos["tesis"].values():
+        for campo in ("Autores", "Director/a"):
+            for tipo, texto in entrada[campo]:
+                if tipo != "texto" or not texto or texto in vistos:
+                    continue
+                vistos.add(texto)
+                urls = []
+                for mencion in separar_menciones(texto):
+                    menciones_totales += 1
+                    candidatos = bloques.get(clave_bloque(mencion), []) if mencion[0] else []
+                    comparaciones += len(candidatos)
+                    puntuados = sorted(((puntuar(mencion, claves[url]), url) for url in candidatos), reverse=True)
+                    # Empate entre dos personas distintas: no se resuelve
+                    ambiguo = (len(puntuados) > 1 and puntuados[1][0] == puntuados[0][0]
+                               and canonico(puntuados[1][1]) != canonico(puntuados[0][1]))
+                    if not puntuados or puntuados[0][0] < UMBRAL_MENCION or ambiguo:
+                        urls = None
+                        break
+                    urls.append(canonico(puntuados[0][1]))
+                if urls:
+                    textos[texto] = list(dict.fromkeys(urls))
+
+    n = len(claves)
+    return {
+        "investigadores": investigadores,
+        "textos": textos,
+        "estadisticas": {
+            "investigadores": n,
+            "menciones": menciones_totales,
+            "bloques": len(bloques),
+            "comparaciones": comparaciones,
+            "comparaciones_todos_los_pares": n * (n - 1) // 2 + menciones_totales * n,
+            "perfiles_unidos": len(investigadores),
+            "textos_resueltos": len(textos),
+        },
+    }
+
+
+def guardar_mapeo(mapeo: dict, ruta: str):
+    with open(ruta, "w", encoding="utf-8") as fichero:
+        json.dump(mapeo, fichero, ensure_ascii=False, indent=4)
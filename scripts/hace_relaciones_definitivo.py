@@ -1,266 +1,134 @@
 from pymongo import MongoClient
-import json
+from ingesta import construir_mapa_paralelo, escribir_mapa, escribir_mapa_delta
+from lector_bloques import rutas_bloques
+from entidades import resolver_entidades, guardar_mapeo
+from punto_control import PuntoControl, Progreso
+import argparse
 import time
 import os
-
-# Conexión a MongoDB con timeout aumentado
-client = os.getenv("MONGODB_URL")
-db = client["Proyecto"]
-autores_col = db["autores"]
-publicaciones_col = db["publicaciones"]
-proyectos_col = db["proyectos"]
-tesis_col = db["tesis"]
-patentes_col = db["patentes"]
-
-# Eliminar datos previos
-print("Limpiando colecciones...")
-publicaciones_col.delete_many({})
-proyectos_col.delete_many({})
-tesis_col.delete_many({})
-patentes_col.delete_many({})
-autores_col.delete_many({})
-
-def isAutorInText(text: str, nombre: str, apellido: str):
-    """
-    Verifica si un nombre de autor está presente en un texto dado.
-
-    Esta función comprueba si tanto el nombre como el apellido de un autor 
-    están presentes en un texto, independientemente de las mayúsculas o minúsculas.
-
-    Parámetros:
-    - text (str): El texto en el que se realizará la búsqueda
-    - nombre (str): El nombre del autor a buscar
-    - apellido (str): El apellido del autor a buscar
-
-    Retorna:
-    - bool: True si tanto el nombre como el apellido están en el texto, False en caso contrario
-
-    Ejemplo:
-    >>> isAutorInText("Juan Perez es un investigador", "Juan", "Perez")
-    True
-    >>> isAutorInText("Maria Lopez trabaja aquí", "Juan", "Perez")
-    False
-    """
-    if not text:
-        return False
-    text = text.lower()
-    nombre = nombre.lower()
-    apellido = apellido.lower()
-    return nombre in text and apellido in text
-
-def isAutorInList(list: list, nombre: str, apellido: str):
-    """
-    Verifica si un autor está presente en alguno de los elementos de una lista.
-
-    Esta función recorre cada elemento de una lista y utiliza isAutorInText() 
-    para comprobar si el nombre y apellido del autor están presentes en alguno 
-    de los elementos de la lista.
-
-    Parámetros:
-    - list (list): Lista de textos donde se realizará la búsqueda
-    - nombre (str): El nombre del autor a buscar
-    - apellido (str): El apellido del autor a buscar
-
-    Retorna:
-    - bool: True si el autor se encuentra en algún elemento de la lista, False en caso contrario
-
-    Ejemplo:
-    >>> isAutorInList(["Juan Perez", "Maria Lopez"], "Juan", "Perez")
-    True
-    >>> isAutorInList(["Maria Lopez", "Carlos Gomez"], "Juan", "Perez")
-    False
-    """
-    if not list:
-        return False
-    for t in list:
-        if isAutorInText(t, nombre, apellido):
-            return True
-    return False
-
-# Contadores globales
-total_autores = 0
-total_publicaciones = 0
-total_tesis = 0
-total_patentes = 0
-total_proyectos = 0
-
-# Procesar archivos
-todos_los_datos = []
-for i in range(1, 32):
-    # data/output_blocks
-    filename = f"data/output_blocks_modified/mod_investigadores_detalle_{i}.json"
-    try:
-        with open(filename, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            todos_los_datos.extend(data)
-            print(f"Archivo {filename} cargado. Contiene {len(data)} autores")
-    except Exception as e:
-        print(f"Error al cargar archivo {filename}: {str(e)}")
-
-print(f"Total de autores a procesar: {len(todos_los_datos)}")
-
-# Procesar todos los datos
-for autor in todos_los_datos:
-    try:
-        # Procesar autor
-        autor_doc = {
-            "Nombre": autor["Nombre"],
-            "Email": autor["Perfil"].get("Email") if autor.get("Perfil") else None,
-            "URL_del_perfil": autor["URL del perfil"],
-        }
-        
-        autor_result = autores_col.update_one(
-            {"URL_del_perfil": autor["URL del perfil"]}, 
-            {"$set": autor_doc}, 
-            upsert=True
-        )
-        
-        autor_id = autor_result.upserted_id if autor_result.upserted_id else \
-                  autores_col.find_one({"URL_del_perfil": autor["URL del perfil"]})["_id"]
-
-        autor_split = autor.get("Nombre").split(",")
-        autor_nombre = autor_split[0].strip()
-        autor_apellido = autor_split[1].strip()
-        
-        # Procesar publicaciones
-        for publicacion in autor.get("Publicaciones", []):  # Usar get con valor por defecto
-            try:
-                pCursor = publicaciones_col.find({"Título": publicacion["Título"]})
-                try:
-                    p = pCursor.next()
-                    publicaciones_col.update_one(
-                        {"_id": p["_id"]},
-                        {"$addToSet": {"Autores": autor_id}}
-                    )
-                except StopIteration:
-                    publicacionParseada = {
-                        "Título": publicacion.get("Título"),
-                        "Otros_títulos": publicacion.get("Otros_títulos"),
-                        "Autores": [autor_id],
-                        "Clasificación_UNESCO": publicacion.get("Clasificación UNESCO"),
-                        "Palabras_clave": publicacion.get("Palabras clave"),
-                        "Fecha_de_publicación": publicacion.get("Fecha de publicación"),
-                        "Publicación_seriada": publicacion.get("Publicación seriada"),
-                        "Resumen": publicacion.get("Resumen"),
-                        "URI": publicacion.get("URI"),
-                        "ISSN": publicacion.get("ISSN"),
-                        "DOI": publicacion.get("DOI"),
-                        "Fuente": publicacion.get("Fuente"),
-                        "Colección": publicacion.get("Colección"),
-                        "PDF": publicacion.get("PDF")
-                    }
-                    publicaciones_col.update_one(
-                        {"Título": publicacionParseada["Título"]}, 
-                        {"$set": publicacionParseada}, 
-                        upsert=True
-                    )
-                    total_publicaciones += 1
-            except Exception as e:
-                print(f"Error en publicación: {str(e)}")
-
-        # Procesar tesis
-        for tesis in autor["Tesis"]:
-        # Autores contiene tesis 
-            tCursor= tesis_col.find({"Título": tesis["Título"]})
-            
-            isAuthor = isAutorInText(tesis.get("Autores/as"), autor_nombre, autor_apellido)
-            isDirector = isAutorInText(tesis.get("Director/a "), autor_nombre, autor_apellido)
-            # Recorrer cada titulo y ver que no se repita 
-            try:
-                p = tCursor.next()
-
-        # Si existe, agregar el nuevo autor
-                if (isAuthor):
-                    tesis_col.update_one(
-                    {"_id": p.get("_id")},
-                    {"$addToSet": {"Autores": autor_id}}
-                )
-                if (isDirector):
-                    tesis_col.update_one(
-                    {"_id": p.get("_id")},
-                    {"$addToSet": {"Director/a": autor_id}}
-                )
-
-            except StopIteration:
-                tesisParseada = { 
-                    "Título": tesis.get("Título"),
-                    "Autores": [autor_id] if isAuthor else [tesis.get("Autores/as")],
-                    "Director/a": [autor_id] if isDirector else [tesis.get("Director/a ")],
-                    "Clasificación_UNESCO": tesis.get("Clasificación UNESCO"),
-                    "Palabras_clave": tesis.get("Palabras clave"),
-                    "Fecha_de_publicación": tesis.get("Fecha de publicación"),
-                    "Resumen": tesis.get("Resumen"),
-                    "Descripción": tesis.get("Descripción"),
-                    "Departamento": tesis.get("Departamento"),
-                    "URI": tesis.get("URI"),
-                    "Colección": tesis.get("Colección"),
-                    "PDF": tesis.get("PDF")
-                }
-                tesis_col.update_one({"Título": tesisParseada["Título"]}, {"$set": tesisParseada}, upsert=True)
-                total_tesis += 1
-
-        # Procesar patentes
-        for patente in autor.get("Patentes", []): # Usar get con valor por defecto
-            try:
-                patentes_col.update_one(
-                    {"Título": patente.get("Título")},
-                    {
-                        "$set": {
-                            "Título": patente.get("Título"),
-                            "Fecha_de_publicación": patente.get("Fecha de publicación"),
-                            "Resumen": patente.get("Resumen"),
-                            "URI": patente.get("URI"),
-                            "URL": patente.get("URL"),
-                            "Colección": patente.get("Colección"),
-                            "PDF": patente.get("PDF")
-                        },
-                        "$addToSet": {"Autores": autor_id}
-                    },
-                    upsert=True
-                )
-                total_patentes += 1
-            except Exception as e:
-                print(f"Error en patente: {str(e)}")
-
-        # Procesar proyectos
-        for proyecto in autor.get("Proyectos", []):
-            proCursor= proyectos_col.find({"Título": proyecto["Título"]})
-            
-
-            try:
-                pro= proCursor.next()  
-                proyectos_col.update_one(
-                {"_id": pro.get("_id")},
-                {"$addToSet": {"Investigadores": autor_id}}
-                )
-
-            except StopIteration:
-                proyectosParseados = {
-                    "Fecha de inicio": proyecto.get("Fecha de inicio"),
-                    "Fecha de finalización": proyecto.get("Fecha de finalización"),
-                    "Título": proyecto.get("Título"),
-                    "URL del Proyecto": proyecto.get("URL del Proyecto"),
-                    "Tipo": proyecto.get("Tipo"),
-                    "Organismo Financiador": proyecto.get("Organismo Financiador"),
-                    "Referencia": proyecto.get("Referencia"),
-                    "Investigadores": [autor_id]
-                }   
-                proyectos_col.update_one({"Título": proyectosParseados["Título"]}, {"$set": proyectosParseados}, upsert=True)
-                total_proyectos += 1
-        
-        total_autores += 1
-        if total_autores % 100 == 0:
-            print(f"Procesados {total_autores} autores")
-            print(f"Tesis procesadas: {total_tesis}")
-            print(f"Publicaciones procesadas: {total_publicaciones}")
-            time.sleep(1)  # Pequeña pausa para evitar sobrecarga
-
-    except Exception as e:
-        print(f"Error procesando autor {autor.get('Nombre', 'desconocido')}: {str(e)}")
-
-print("\nProceso completado:")
-print(f"Total de autores procesados: {total_autores}")
-print(f"Total de publicaciones: {total_publicaciones}")
-print(f"Total de tesis: {total_tesis}")
-print(f"Total de patentes: {total_patentes}")
-print(f"Total de proyectos: {total_proyectos}")
\ No newline at end of file
+import sys
+
+# Módulos compartidos con la API (estadísticas materializadas, etc.)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FastAPI"))
+from db.estadisticas import refrescar_estadisticas
+from db.perfiles import construir_perfiles
+from db.indices import aplicar_indices
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga los bloques de investigadores en MongoDB")
+    parser.add_argument("--datos", default="data/output_blocks_modified", help="Carpeta con los ficheros de bloques")
+    parser.add_argument("--instantanea", metavar="CARPETA",
+                        help="Lee los investigadores de la instantánea Parquet/Arrow (instantanea_corpus.py) en lugar de --datos")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para construir el mapa de trabajos (0 = todos los núcleos)")
+    parser.add_argument("--delta", action="store_true", help="Carga incremental: solo escribe lo nuevo, cambiado o eliminado")
+    parser.add_argument("--entidades", metavar="RUTA_MAPEO",
+                        help="Resuelve perfiles duplicados y nombres en texto y guarda el mapeo aplicado en RUTA_MAPEO")
+    parser.add_argument("--punto-control", default="ingesta_punto_control.json",
+                        help="Fichero donde se guarda el progreso de la carga tras cada lote")
+    parser.add_argument("--reanudar", action="store_true", help="Continúa una carga interrumpida desde su punto de control")
+    args = parser.parse_args()
+
+    punto_control = PuntoControl.cargar(args.punto_control) if args.reanudar else None
+    if args.reanudar and punto_control is None:
+        print(f"No hay punto de control en {args.punto_control}; se hace una carga completa")
+    if punto_control:
+        args.delta = punto_control.estado["delta"]
+        print(f"Reanudando carga {'incremental' if args.delta else 'completa'}: {punto_control.estado['escritos']}")
+
+    # Conexión a MongoDB con timeout aumentado
+    client = MongoClient(os.getenv("MONGODB_URL"), socketTimeoutMS=60000, connectTimeoutMS=60000)
+    db = client["Proyecto"]
+    autores_col = db["autores"]
+    publicaciones_col = db["publicaciones"]
+    proyectos_col = db["proyectos"]
+    tesis_col = db["tesis"]
+    patentes_col = db["patentes"]
+
+    # Eliminar datos previos (en modo delta se conservan y se comparan por hash; al
+    # reanudar se conserva lo ya escrito)
+    if not args.delta and not punto_control:
+        print("Limpiando colecciones...")
+        publicaciones_col.delete_many({})
+        proyectos_col.delete_many({})
+        tesis_col.delete_many({})
+        patentes_col.delete_many({})
+        autores_col.delete_many({})
+
+    # Índices para las búsquedas por Título y por URL_del_perfil durante la carga
+    aplicar_indices(db)
+
+    if punto_control:
+        # El mapa completo se guardó en el punto de control al terminar la fase 1
+        mapa = punto_control.cargar_mapa()
+    else:
+        # Fase 1: leer los investigadores de uno en uno desde los bloques, deduplicar en
+        # memoria los trabajos por título normalizado y acumular los conjuntos de autores,
+        # directores e investigadores de cada uno (en paralelo con --procesos N)
+        inicio = time.perf_counter()
+        if args.instantanea:
+            # pyarrow solo se necesita con --instantanea
+            from instantanea_corpus import construir_mapa_instantanea
+            mapa = construir_mapa_instantanea(args.instantanea)
+            print(f"Mapa de trabajos construido desde {args.instantanea} en {time.perf_counter() - inicio:.1f} s")
+        else:
+            mapa = construir_mapa_paralelo(rutas_bloques(args.datos), args.procesos)
+            print(f"Mapa de trabajos construido en {time.perf_counter() - inicio:.1f} s ({args.procesos or os.cpu_count()} procesos)")
+
+        # Resolución de entidades: aplicar el mapeo de ids canónicos antes de escribir
+        if args.entidades:
+            mapeo = resolver_entidades(mapa)
+            mapa.aplicar_canonicos(mapeo)
+            guardar_mapeo(mapeo, args.entidades)
+            e = mapeo["estadisticas"]
+            print(f"Entidades: {e['perfiles_unidos']} perfiles unidos, {e['textos_resueltos']} nombres en texto resueltos "
+                  f"({e['comparaciones']} comparaciones frente a {e['comparaciones_todos_los_pares']} de todos los pares)")
+
+        punto_control = PuntoControl(args.punto_control, {"delta": args.delta, "datos": args.instantanea or args.datos, "escritos": {}})
+        punto_control.guardar_mapa(mapa)
+        punto_control.guardar()
+
+    # Fase 2: escribir con bulk_write(ordered=False) por lotes
+    print("Escribiendo en MongoDB...")
+    escribir = escribir_mapa_delta if args.delta else escribir_mapa
+    # En la carga incremental solo se escribe lo que cambia: el tamaño del mapa no
+    # sirve como total y se omite el tiempo restante
+    progreso = Progreso(None if args.delta else sum(mapa.totales().values()))
+    metricas = escribir(db, mapa, punto_control=punto_control, progreso=progreso)
+    for coleccion, m in metricas.items():
+        print(f"  {coleccion}: {m['documentos']} documentos en {m['segundos']:.1f} s ({m['docs_s']:.0f} docs/s)")
+        if args.delta:
+            print(f"    insertados: {m['insertados']}, actualizados: {m['actualizados']}, "
+                  f"sin cambios: {m['sin_cambios']}, eliminados: {m['eliminados']}, "
+                  f"duplicados: {m['duplicados']}")
+
+    totales = mapa.totales()
+    total_documentos = sum(m["documentos"] for m in metricas.values())
+    total_segundos = sum(m["segundos"] for m in metricas.values())
+
+    print("\nProceso completado:")
+    print(f"Total de autores procesados: {totales['autores']}")
+    print(f"Total de publicaciones: {totales['publicaciones']}")
+    print(f"Total de tesis: {totales['tesis']}")
+    print(f"Total de patentes: {totales['patentes']}")
+    print(f"Total de proyectos: {totales['proyectos']}")
+    print(f"Autores con errores: {mapa.errores}")
+    # Un mapa de un punto de control anterior puede no tener errores_trabajos
+    print(f"Trabajos con errores: {getattr(mapa, 'errores_trabajos', 0)}")
+    if total_segundos > 0:
+        print(f"Rendimiento de escritura: {total_documentos / total_segundos:.0f} docs/s")
+
+    # Reconstruir la vista materializada de perfiles de autor
+    print("Construyendo perfiles de autor...")
+    print(f"Perfiles generados: {construir_perfiles(db)}")
+
+    # Recalcular el documento de estadísticas que sirve /stats
+    print("Actualizando estadísticas...")
+    refrescar_estadisticas(db)
+
+    # Carga terminada: ya no hace falta el punto de control
+    punto_control.borrar()
+
+
+# El pool de procesos necesita que el módulo pueda importarse sin ejecutar la carga
+if __name__ == "__main__":
+    main()
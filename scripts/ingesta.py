@@ -0,0 +1,518 @@
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import UpdateOne
+from lector_bloques import leer_investigadores
+from nombres import IndiceNombres
+from texto_embedding import get_campos_embedding, hash_texto, texto_embedding
+
+# Número de operaciones por llamada a bulk_write
+TAM_LOTE = 1000
+
+# Colecciones de trabajos en el orden en que se escriben
+COLECCIONES_TRABAJOS = ["publicaciones", "tesis", "patentes", "proyectos"]
+
+# Campo de cada colección que guarda las referencias a autores
+CAMPOS_AUTOR = {
+    "publicaciones": ["Autores"],
+    "tesis": ["Autores", "Director/a"],
+    "patentes": ["Autores"],
+    "proyectos": ["Investigadores"],
+}
+
+
+def normalizar_titulo(titulo) -> str:
+    """
+    Clave de deduplicación de un trabajo: título en forma NFKC, sin distinguir
+    mayúsculas y con los espacios colapsados.
+    """
+    if not titulo:
+        return ""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", titulo)).strip().casefold()
+
+
+# Referencias a autores dentro del mapa de trabajos. Los autores se identifican por
+# su URL de perfil hasta que se escriben y se conoce su _id; las tesis pueden guardar
+# además el nombre en texto cuando no se reconoce al investigador.
+def ref_autor(url: str) -> tuple:
+    return ("autor", url)
+
+def ref_texto(texto) -> tuple:
+    return ("texto", texto)
+
+
+def parsear_autor(autor: dict) -> dict:
+    return {
+        "Nombre": autor["Nombre"],
+        "Email": autor["Perfil"].get("Email") if autor.get("Perfil") else None,
+        "URL_del_perfil": autor["URL del perfil"],
+    }
+
+def parsear_publicacion(publicacion: dict) -> dict:
+    return {
+        "Título": publicacion.get("Título"),
+        "Otros_títulos": publicacion.get("Otros_títulos"),
+        "Clasificación_UNESCO": publicacion.get("Clasificación UNESCO"),
+        "Palabras_clave": publicacion.get("Palabras clave"),
+        "Fecha_de_publicación": publicacion.get("Fecha de publicación"),
+        "Publicación_seriada": publicacion.get("Publicación seriada"),
+        "Resumen": publicacion.get("Resumen"),
+        "URI": publicacion.get("URI"),
+        "ISSN": publicacion.get("ISSN"),
+        "DOI": publicacion.get("DOI"),
+        "Fuente": publicacion.get("Fuente"),
+        "Colección": publicacion.get("Colección"),
+        "PDF": publicacion.get("PDF")
+    }
+
+def parsear_tesis(tesis: dict) -> dict:
+    return {
+        "Título": tesis.get("Título"),
+        "Clasificación_UNESCO": tesis.get("Clasificación UNESCO"),
+        "Palabras_clave": tesis.get("Palabras clave"),
+        "Fecha_de_publicación": tesis.get("Fecha de publicación"),
+        "Resumen": tesis.get("Resumen"),
+        "Descripción": tesis.get("Descripción"),
+        "Departamento": tesis.get("Departamento"),
+        "URI": tesis.get("URI"),
+        "Colección": tesis.get("Colección"),
+        "PDF": tesis.get("PDF")
+    }
+
+def parsear_patente(patente: dict) -> dict:
+    return {
+        "Título": patente.get("Título"),
+        "Fecha_de_publicación": patente.get("Fecha de publicación"),
+        "Resumen": patente.get("Resumen"),
+        "URI": patente.get("URI"),
+        "URL": patente.get("URL"),
+        "Colección": patente.get("Colección"),
+        "PDF": patente.get("PDF")
+    }
+
+def parsear_proyecto(proyecto: dict) -> dict:
+    return {
+        "Fecha de inicio": proyecto.get("Fecha de inicio"),
+        "Fecha de finalización": proyecto.get("Fecha de finalización"),
+        "Título": proyecto.get("Título"),
+        "URL del Proyecto": proyecto.get("URL del Proyecto"),
+        "Tipo": proyecto.get("Tipo"),
+        "Organismo Financiador": proyecto.get("Organismo Financiador"),
+        "Referencia": proyecto.get("Referencia")
+    }
+
+
+class MapaTrabajos:
+    """
+    Acumula en memoria todos los autores y trabajos del corpus, deduplicando los
+    trabajos por título normalizado. Cada entrada guarda el documento del trabajo y
+    los conjuntos (ordenados por aparición) de referencias de cada campo de autor.
+    """
+
+    def __init__(self, indice: IndiceNombres = None):
+        self.indice = indice or IndiceNombres()
+        self.autores = {}  # URL del perfil -> documento del autor
+        self.trabajos = {coleccion: {} for coleccion in COLECCIONES_TRABAJOS}
+        self.errores = 0  # Investigadores descartados
+        self.errores_trabajos = 0  # Trabajos descartados
+
+    def _entrada(self, coleccion: str, doc: dict) -> dict:
+        # Devuelve la entrada del trabajo, creándola con el primer documento visto
+        clave = normalizar_titulo(doc.get("Título"))
+        entrada = self.trabajos[coleccion].get(clave)
+        if entrada is None:
+            entrada = {"doc": doc, **{campo: {} for campo in CAMPOS_AUTOR[coleccion]}}
+            self.trabajos[coleccion][clave] = entrada
+        return entrada
+
+    def agregar_autor(self, autor: dict, tesis_pendientes: list = None):
+        """
+        Añade un investigador del corpus y todos sus trabajos al mapa. Con
+        `tesis_pendientes` sus tesis no se atribuyen todavía: se añaden a esa lista
+        para agregar_tesis_pendientes, cuando ya estén indexados todos los nombres.
+        """
+        url = autor["URL del perfil"]
+        self.autores[url] = parsear_autor(autor)
+        ref = ref_autor(url)
+
+        if url not in self.indice.claves:
+            self.indice.agregar(url, autor["Nombre"])
+
+        # Un trabajo con datos erróneos se descarta solo a él, no al resto de trabajos
+        # del investigador
+        for publicacion in autor.get("Publicaciones", []):
+            try:
+                self._entrada("publicaciones", parsear_publicacion(publicacion))["Autores"][ref] = None
+            except Exception as e:
+                self._error_trabajo("publicación", e)
+
+        for tesis in autor.get("Tesis", []):
+            if tesis_pendientes is not None:
+                tesis_pendientes.append((tesis, url, ref))
+                continue
+            try:
+                self._agregar_tesis(tesis, url, ref)
+            except Exception as e:
+                self._error_trabajo("tesis", e)
+
+        for patente in autor.get("Patentes", []):
+            try:
+                # En las patentes prevalecen los datos de la última aparición
+                doc = parsear_patente(patente)
+                entrada = self._entrada("patentes", doc)
+                entrada["doc"] = doc
+                entrada["Autores"][ref] = None
+            except Exception as e:
+                self._error_trabajo("patente", e)
+
+        for proyecto in autor.get("Proyectos", []):
+            try:
+                self._entrada("proyectos", parsear_proyecto(proyecto))["Investigadores"][ref] = None
+            except Exception as e:
+                self._error_trabajo("proyecto", e)
+
+    def agregar_tesis_pendientes(self, tesis_pendientes: list):
+        # En el mismo orden en que aparecieron, así el mapa no cambia respecto a
+        # atribuirlas al agregar cada autor con el índice ya completo
+        for tesis, url, ref in tesis_pendientes:
+            try:
+                self._agregar_tesis(tesis, url, ref)
+            except Exception as e:
+                self._error_trabajo("tesis", e)
+
+    def _agregar_tesis(self, tesis: dict, url: str, ref: tuple):
+        clave = normalizar_titulo(tesis.get("Título"))
+        autores, directores = self.indice.atribuir_tesis(clave, tesis.get("Autores/as"), tesis.get("Director/a "))
+        isAuthor = url in autores
+        isDirector = url in directores
+        nueva = clave not in self.trabajos["tesis"]
+        entrada = self._entrada("tesis", parsear_tesis(tesis))
+        # La primera vez que aparece la tesis se guarda el nombre en texto si el
+        # investigador no figura como autor o director
+        if isAuthor:
+            entrada["Autores"][ref] = None
+        elif nueva:
+            entrada["Autores"][ref_texto(tesis.get("Autores/as"))] = None
+        if isDirector:
+            entrada["Director/a"][ref] = None
+        elif nueva:
+            entrada["Director/a"][ref_texto(tesis.get("Director/a "))] = None
+
+    def _error_trabajo(self, tipo: str, error: Exception):
+        self.errores_trabajos += 1
+        print(f"Error en {tipo}: {str(error)}")
+
+    def fusionar(self, otro: "MapaTrabajos"):
+        """
+        Añade a este mapa un mapa parcial construido con los ficheros siguientes del
+        corpus. Aplica las mismas reglas que agregar_autor, de modo que fusionar los
+        parciales en el orden de los ficheros da el mismo resultado que el proceso en serie.
+        """
+        self.autores.update(otro.autores)
+        self.errores += otro.errores
+        self.errores_trabajos += otro.errores_trabajos
+        for coleccion, trabajos in otro.trabajos.items():
+            propios = self.trabajos[coleccion]
+            for clave, entrada in trabajos.items():
+                existente = propios.get(clave)
+                if existente is None:
+                    propios[clave] = entrada
+                    continue
+                if coleccion == "patentes":
+                    existente["doc"] = entrada["doc"]
+                for campo in CAMPOS_AUTOR[coleccion]:
+                    for ref in entrada[campo]:
+                        # Los nombres en texto solo se guardan en la primera aparición del
+                        # trabajo, que ya está en este mapa
+                        if ref[0] == "autor":
+                            existente[campo][ref] = None
+
+    def aplicar_canonicos(self, mapeo: dict):
+        """
+        Aplica el mapeo de entidades de entidades.resolver_entidades: las referencias a
+        perfiles duplicados pasan al perfil canónico (y los duplicados no se escriben) y
+        los nombres en texto resueltos se sustituyen por sus investigadores.
+        """
+        investigadores = mapeo["investigadores"]
+        textos = mapeo["textos"]
+        for url in investigadores:
+            self.autores.pop(url, None)
+
+        for coleccion, trabajos in self.trabajos.items():
+            for entrada in trabajos.values():
+                for campo in CAMPOS_AUTOR[coleccion]:
+                    refs = {}
+                    for tipo, valor in entrada[campo]:
+                        if tipo == "autor":
+                            refs[ref_autor(investigadores.get(valor, valor))] = None
+                        elif valor in textos:
+                            for url in textos[valor]:
+                                refs[ref_autor(url)] = None
+                        else:
+                            refs[(tipo, valor)] = None
+                    entrada[campo] = refs
+
+    def totales(self) -> dict:
+        return {"autores": len(self.autores), **{c: len(t) for c, t in self.trabajos.items()}}
+
+
+def mapa_desde_investigadores(investigadores) -> MapaTrabajos:
+    """
+    Construye el mapa de trabajos de los investigadores de un iterable, sean de los
+    bloques JSON o de la instantánea columnar, en una sola pasada. Para atribuir las
+    tesis hacen falta los nombres de todos los investigadores, así que sus nombres se
+    indexan al leerlos y las tesis se atribuyen al final.
+    """
+    mapa = MapaTrabajos()
+    tesis_pendientes = []
+    for autor in investigadores:
+        try:
+            mapa.indice.agregar(autor["URL del perfil"], autor.get("Nombre") or "")
+            mapa.agregar_autor(autor, tesis_pendientes)
+        except Exception as e:
+            mapa.errores += 1
+            print(f"Error procesando autor {autor.get('Nombre', 'desconocido')}: {str(e)}")
+    mapa.agregar_tesis_pendientes(tesis_pendientes)
+    return mapa
+
+
+def construir_mapa(rutas: list) -> MapaTrabajos:
+    """
+    Construye el mapa de trabajos de una lista de ficheros de bloques. Antes se indexan
+    los nombres de todos sus investigadores para atribuir las tesis; como cada
+    investigador solo se atribuye a sí mismo, basta con indexar los de estos ficheros
+    y el resultado no depende de cómo se repartan los ficheros entre procesos.
+    """
+    return mapa_desde_investigadores(leer_investigadores(rutas))
+
+
+def construir_mapa_paralelo(rutas: list, procesos: int = None) -> MapaTrabajos:
+    """
+    Reparte los ficheros de bloques entre un pool de procesos (un fichero por tarea).
+    Cada proceso devuelve su mapa parcial y los parciales se fusionan en el orden de
+    los ficheros, por lo que el resultado es idéntico al de construir_mapa(rutas).
+    """
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        return construir_mapa(rutas)
+
+    mapa = MapaTrabajos()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for parcial in pool.map(construir_mapa, [[ruta] for ruta in rutas]):
+            mapa.fusionar(parcial)
+    return mapa
+
+
+def escribir_lotes(coleccion, operaciones: list, tam_lote: int = TAM_LOTE, inicio: int = 0,
+                   al_confirmar=None) -> dict:
+    """
+    Envía las operaciones en lotes de bulk_write(ordered=False) y devuelve el número
+    de documentos escritos, los segundos empleados y el rendimiento en docs/s.
+
+    Con `inicio` se omiten las operaciones ya confirmadas en una ejecución anterior;
+    `al_confirmar(escritos, total, segundos_lote)` se llama tras cada lote.
+    """
+    comienzo = time.perf_counter()
+    for i in range(inicio, len(operaciones), tam_lote):
+        inicio_lote = time.perf_counter()
+        coleccion.bulk_write(operaciones[i:i + tam_lote], ordered=False)
+        if al_confirmar:
+            al_confirmar(min(i + tam_lote, len(operaciones)), len(operaciones), time.perf_counter() - inicio_lote)
+    segundos = time.perf_counter() - comienzo
+    escritos = len(operaciones) - min(inicio, len(operaciones))
+    return {
+        "documentos": escritos,
+        "segundos": segundos,
+        "docs_s": escritos / segundos if segundos > 0 else 0.0,
+    }
+
+
+def _seguimiento(nombre: str, punto_control, progreso, reanudable: bool = True) -> dict:
+    """
+    Argumentos de escribir_lotes para una colección: posición desde la que reanudar y
+    función que guarda el punto de control y muestra el progreso tras cada lote.
+    En la carga incremental las operaciones se recalculan contra el estado actual de
+    la base de datos, así que no se reanuda por posición (reanudable=False).
+    """
+    inicio = punto_control.escritos(nombre) if punto_control and reanudable else 0
+    if progreso:
+        progreso.empezar(nombre, inicio)
+
+    def al_confirmar(escritos, total, segundos_lote):
+        if punto_control:
+            punto_control.confirmar(nombre, escritos)
+        if progreso:
+            progreso.lote(nombre, escritos, total, segundos_lote)
+
+    return {"inicio": inicio, "al_confirmar": al_confirmar}
+
+
+def resolver_ids_autores(coleccion, urls: list, tam_lote: int = TAM_LOTE) -> dict:
+    """
+    Recupera el _id de cada autor por su URL de perfil con consultas $in por lotes.
+    """
+    ids = {}
+    for i in range(0, len(urls), tam_lote):
+        cursor = coleccion.find({"URL_del_perfil": {"$in": urls[i:i + tam_lote]}}, {"URL_del_perfil": 1})
+        for doc in cursor:
+            ids[doc["URL_del_perfil"]] = doc["_id"]
+    return ids
+
+
+def hash_contenido(doc: dict, refs: dict = None) -> str:
+    """
+    Hash SHA-256 del contenido de un documento. Las referencias a autores se incluyen
+    sin resolver (URL de perfil o texto), así el hash no depende de los _id asignados.
+    """
+    contenido = {"doc": doc, "refs": {campo: list(valor) for campo, valor in (refs or {}).items()}}
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _resolver_refs(refs: dict, ids: dict) -> list:
+    return [ids[valor] if tipo == "autor" else valor for tipo, valor in refs]
+
+
+def documentos_autores(mapa: MapaTrabajos):
+    # (clave, documento con hash_contenido) de cada autor del mapa
+    for url, doc in mapa.autores.items():
+        yield url, {**doc, "hash_contenido": hash_contenido(doc)}
+
+
+def documentos_trabajos(mapa: MapaTrabajos, coleccion: str, ids: dict):
+    # (clave, documento con referencias resueltas y hash_contenido) de cada trabajo del mapa
+    for clave, entrada in mapa.trabajos[coleccion].items():
+        refs = {campo: entrada[campo] for campo in CAMPOS_AUTOR[coleccion]}
+        doc = dict(entrada["doc"])
+        for campo, valor in refs.items():
+            doc[campo] = _resolver_refs(valor, ids)
+        doc["hash_contenido"] = hash_contenido(entrada["doc"], refs)
+        yield clave, doc
+
+
+def operaciones_trabajos(mapa: MapaTrabajos, coleccion: str, ids: dict) -> list:
+    return [
+        UpdateOne({"Título": doc["Título"]}, {"$set": doc}, upsert=True)
+        for _, doc in documentos_trabajos(mapa, coleccion, ids)
+    ]
+
+
+def escribir_mapa(db, mapa: MapaTrabajos, tam_lote: int = TAM_LOTE, punto_control=None, progreso=None) -> dict:
+    """
+    Escribe el mapa en MongoDB: primero los autores (upsert por URL_del_perfil),
+    después se resuelven sus _id y por último cada colección de trabajos con sus
+    referencias ya convertidas. Devuelve las métricas de escritura por colección.
+
+    Las operaciones de cada colección son deterministas para un mismo mapa, por lo que
+    con un punto de control se reanuda desde la última operación confirmada.
+    """
+    metricas = {}
+    operaciones = [
+        UpdateOne({"URL_del_perfil": url}, {"$set": doc}, upsert=True)
+        for url, doc in documentos_autores(mapa)
+    ]
+    metricas["autores"] = escribir_lotes(db["autores"], operaciones, tam_lote,
+                                         **_seguimiento("autores", punto_control, progreso))
+
+    ids = resolver_ids_autores(db["autores"], list(mapa.autores), tam_lote)
+    for coleccion in COLECCIONES_TRABAJOS:
+        metricas[coleccion] = escribir_lotes(db[coleccion], operaciones_trabajos(mapa, coleccion, ids), tam_lote,
+                                             **_seguimiento(coleccion, punto_control, progreso))
+    return metricas
+
+
+def _operaciones_delta(existentes: dict, documentos, filtro_nuevo, campos_embedding: list) -> tuple[list, dict]:
+    """
+    Compara los documentos del mapa con los existentes (clave -> lista de {_id,
+    hash_contenido, eliminado, embedding_hash}) y genera solo las escrituras necesarias:
+      - nuevos: upsert;
+      - cambiados o reaparecidos: $set del documento; si además cambia el texto que se
+        codifica se marca con embedding_pendiente=True y embedding_create.py lo
+        volverá a generar (mientras tanto se conserva el embedding anterior);
+      - sin cambios: nada (se conservan sus embeddings);
+      - ausentes del mapa: se marcan con eliminado=True (tombstone).
+
+    Si varios documentos existentes comparten clave (títulos que solo difieren en
+    mayúsculas, tildes o espacios), se actualiza uno de ellos (_principal) y los demás
+    se marcan como eliminados y se cuentan en "duplicados".
+    """
+    operaciones = []
+    resumen = {"insertados": 0, "actualizados": 0, "sin_cambios": 0, "eliminados": 0, "duplicados": 0}
+    vistos = set()
+
+    for clave, doc in documentos:
+        vistos.add(clave)
+        candidatos = existentes.get(clave)
+        if not candidatos:
+            operaciones.append(UpdateOne(filtro_nuevo(doc), {"$set": doc, "$unset": {"eliminado": ""}}, upsert=True))
+            resumen["insertados"] += 1
+            continue
+        actual = _principal(candidatos, doc["hash_contenido"])
+        if actual.get("hash_contenido") != doc["hash_contenido"] or actual.get("eliminado"):
+            if hash_texto(texto_embedding(doc, campos_embedding)) != actual.get("embedding_hash"):
+                doc = {**doc, "embedding_pendiente": True}
+            operaciones.append(UpdateOne({"_id": actual["_id"]}, {"$set": doc, "$unset": {"eliminado": ""}}))
+            resumen["actualizados"] += 1
+        else:
+            resumen["sin_cambios"] += 1
+        for duplicado in candidatos:
+            if duplicado is not actual and not duplicado.get("eliminado"):
+                operaciones.append(UpdateOne({"_id": duplicado["_id"]}, {"$set": {"eliminado": True}}))
+                resumen["duplicados"] += 1
+
+    for clave, candidatos in existentes.items():
+        if clave not in vistos:
+            for actual in candidatos:
+                if not actual.get("eliminado"):
+                    operaciones.append(UpdateOne({"_id": actual["_id"]}, {"$set": {"eliminado": True}}))
+                    resumen["eliminados"] += 1
+
+    return operaciones, resumen
+
+
+def _principal(candidatos: list, hash_nuevo: str) -> dict:
+    # Entre los existentes con la misma clave: el que ya tiene el contenido nuevo (no
+    # hay que reescribirlo ni regenerar su embedding) o el primero no eliminado (por _id)
+    vivos = [doc for doc in candidatos if not doc.get("eliminado")] or candidatos
+    return next((doc for doc in vivos if doc.get("hash_contenido") == hash_nuevo), vivos[0])
+
+
+def _existentes(coleccion, campo_clave: str, normalizar) -> dict:
+    # clave normalizada -> documentos existentes con esa clave, ordenados por _id
+    proyeccion = {campo_clave: 1, "hash_contenido": 1, "eliminado": 1, "embedding_hash": 1}
+    existentes = {}
+    for doc in coleccion.find({}, proyeccion).sort("_id", 1):
+        existentes.setdefault(normalizar(doc.get(campo_clave)), []).append(doc)
+    return existentes
+
+
+def escribir_mapa_delta(db, mapa: MapaTrabajos, tam_lote: int = TAM_LOTE, punto_control=None, progreso=None) -> dict:
+    """
+    Variante incremental de escribir_mapa: no borra nada y solo escribe los autores y
+    trabajos nuevos, cambiados o eliminados según su hash_contenido. Devuelve por
+    colección el resumen de insertados, actualizados, sin cambios, eliminados y
+    duplicados, junto con las métricas de escritura.
+    """
+    resultado = {}
+
+    existentes = _existentes(db["autores"], "URL_del_perfil", lambda url: url)
+    operaciones, resumen = _operaciones_delta(
+        existentes, documentos_autores(mapa), lambda doc: {"URL_del_perfil": doc["URL_del_perfil"]},
+        get_campos_embedding("autores")
+    )
+    resultado["autores"] = {**resumen, **escribir_lotes(db["autores"], operaciones, tam_lote,
+                                                        **_seguimiento("autores", punto_control, progreso, False))}
+
+    ids = resolver_ids_autores(db["autores"], list(mapa.autores), tam_lote)
+    for coleccion in COLECCIONES_TRABAJOS:
+        existentes = _existentes(db[coleccion], "Título", normalizar_titulo)
+        operaciones, resumen = _operaciones_delta(
+            existentes, documentos_trabajos(mapa, coleccion, ids), lambda doc: {"Título": doc["Título"]},
+            get_campos_embedding(coleccion)
+        )
+        resultado[coleccion] = {**resumen, **escribir_lotes(db[coleccion], operaciones, tam_lote,
+                                                            **_seguimiento(coleccion, punto_control, progreso, False))}
+    return resultado
@@ -0,0 +1,319 @@
+"""
+Instantánea columnar del corpus de investigadores, exportada desde los bloques
+investigadores_detalle_*.json. Estructura de la carpeta:
+
+    manifiesto.json                        fecha, origen, filas y columnas de cada tabla
+    investigadores.parquet / .arrow        una fila por investigador (Nombre, URL del
+                                           perfil, Perfil...)
+    trabajos.parquet / .arrow              una fila por trabajo distinto, con una columna
+                                           por campo y _categoria (Publicaciones, Tesis,
+                                           Patentes o Proyectos) y _anio para análisis
+    autorias.parquet / .arrow              aristas investigador-trabajo con la posición
+                                           del trabajo en la lista del investigador
+
+Un trabajo que aparece igual en varios perfiles (coautores) se guarda una sola vez
+y se enlaza desde autorias. Las columnas de texto con pocos valores distintos
+(colección, clasificación UNESCO, departamento...) se guardan con diccionario.
+
+Los .parquet (comprimidos) sirven para análisis y para copiar la instantánea; los
+.arrow (formato IPC sin comprimir) se abren con memory_map y se leen sin copiar.
+leer_investigadores_instantanea() reconstruye los mismos investigadores que
+lector_bloques.leer_investigadores(), así la ingesta, la generación de embeddings y
+los benchmarks pueden usar la instantánea en lugar de los bloques JSON.
+"""
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from ingesta import (
+    MapaTrabajos, mapa_desde_investigadores, parsear_autor, parsear_patente, parsear_proyecto, parsear_publicacion,
+    parsear_tesis
+)
+from lector_bloques import leer_investigadores
+
+FICHERO_MANIFIESTO = "manifiesto.json"
+TABLAS = ("investigadores", "trabajos", "autorias")
+# Listas de trabajos de cada investigador, con la colección y el documento que escribe la ingesta
+CATEGORIAS = {
+    "Publicaciones": ("publicaciones", parsear_publicacion),
+    "Proyectos": ("proyectos", parsear_proyecto),
+    "Tesis": ("tesis", parsear_tesis),
+    "Patentes": ("patentes", parsear_patente),
+}
+# Campos de fecha de los que se extrae _anio
+CAMPOS_FECHA = ("Fecha de publicación", "Fecha de inicio")
+# Las columnas de texto con menos de esta proporción de valores distintos se guardan
+# con diccionario (en las demás, como Resumen, el diccionario solo ocuparía más)
+PROPORCION_DICCIONARIO = 0.5
+# Separador de los nombres de campo en _campos (orden original de las claves)
+SEPARADOR_CAMPOS = "\x1f"
+
+_anio = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+def _anio_trabajo(trabajo: dict):
+    for campo in CAMPOS_FECHA:
+        encontrado = _anio.search(str(trabajo.get(campo) or ""))
+        if encontrado:
+            return int(encontrado.group(1))
+    return None
+
+
+def _tabla(filas: list, tipos: dict = None):
+    """
+    Tabla con una columna por clave de las filas (en orden de aparición). Las columnas
+    con objetos o listas (Perfil, Investigador principal...) y las que no tienen un tipo
+    común de Arrow se guardan como texto JSON: un struct de Arrow tendría todas las
+    claves vistas en la columna y no distinguiría una clave ausente de una con None.
+    Devuelve la tabla y la lista de columnas JSON.
+    """
+    claves = {}
+    for fila in filas:
+        claves.update(dict.fromkeys(fila))
+    columnas, columnas_json = {}, []
+    for clave in claves:
+        valores = [fila.get(clave) for fila in filas]
+        if not any(isinstance(v, (dict, list)) for v in valores):
+            try:
+                columnas[clave] = pa.array(valores, type=(tipos or {}).get(clave))
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        columnas[clave] = pa.array([None if v is None else json.dumps(v, ensure_ascii=False) for v in valores])
+        columnas_json.append(clave)
+    return _con_diccionarios(pa.table(columnas)), columnas_json
+
+
+def _con_diccionarios(tabla: pa.Table) -> pa.Table:
+    for i, campo in enumerate(tabla.schema):
+        if not pa.types.is_string(campo.type) or tabla.num_rows == 0:
+            continue
+        columna = tabla.column(i)
+        if pc.count_distinct(columna).as_py() < PROPORCION_DICCIONARIO * tabla.num_rows:
+            tabla = tabla.set_column(i, campo.name, pc.dictionary_encode(columna).combine_chunks())
+    return tabla
+
+
+def _guardar(tabla: pa.Table, carpeta: str, nombre: str):
+    pq.write_table(tabla, os.path.join(carpeta, f"{nombre}.parquet"), compression="zstd")
+    with pa.OSFile(os.path.join(carpeta, f"{nombre}.arrow"), "wb") as fichero:
+        with pa.ipc.new_file(fichero, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+
+def exportar_corpus(rutas: list, carpeta: str) -> dict:
+    """
+    Exporta los investigadores de los ficheros de bloques `rutas` a la instantánea de
+    `carpeta`. Se escribe en una carpeta temporal que sustituye a la anterior al
+    terminar, como la instantánea de embeddings. Devuelve el manifiesto.
+    """
+    investigadores, trabajos, autorias = [], [], {"id_investigador": [], "id_trabajo": [], "posicion": []}
+    ids_trabajos = {}
+    for id_investigador, investigador in enumerate(leer_investigadores(rutas)):
+        # _listas: categorías cuyas listas de trabajos están en autorias; cualquier otro
+        # valor de una categoría (None, texto...) se guarda tal cual en su columna
+        listas = [campo for campo, valor in investigador.items() if campo in CATEGORIAS and isinstance(valor, list)]
+        fila = {
+            "_id_investigador": id_investigador,
+            "_campos": SEPARADOR_CAMPOS.join(investigador),
+            "_listas": SEPARADOR_CAMPOS.join(listas),
+        }
+        for campo, valor in investigador.items():
+            if campo not in listas:
+                fila[campo] = valor
+                continue
+            for posicion, trabajo in enumerate(valor):
+                clave = (campo, json.dumps(trabajo, ensure_ascii=False))
+                id_trabajo = ids_trabajos.get(clave)
+                if id_trabajo is None:
+                    id_trabajo = ids_trabajos[clave] = len(trabajos)
+                    trabajos.append({
+                        "_id_trabajo": id_trabajo, "_categoria": campo, "_anio": _anio_trabajo(trabajo),
+                        "_campos": SEPARADOR_CAMPOS.join(trabajo), **trabajo,
+                    })
+                autorias["id_investigador"].append(id_investigador)
+                autorias["id_trabajo"].append(id_trabajo)
+                autorias["posicion"].append(posicion)
+        investigadores.append(fila)
+
+    temporal = carpeta.rstrip("/") + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    tablas = {
+        "investigadores": _tabla(investigadores, {"_id_investigador": pa.int32()}),
+        "trabajos": _tabla(trabajos, {"_id_trabajo": pa.int32(), "_anio": pa.int16()}),
+        "autorias": (pa.table({
+            "id_investigador": pa.array(autorias["id_investigador"], pa.int32()),
+            "id_trabajo": pa.array(autorias["id_trabajo"], pa.int32()),
+            "posicion": pa.array(autorias["posicion"], pa.int32()),
+        }), []),
+    }
+    manifiesto = {
+        "creado": datetime.now(timezone.utc).isoformat(),
+        "origen": sorted({os.path.dirname(os.path.abspath(ruta)) for ruta in rutas}),
+        "ficheros_origen": len(rutas),
+        "tablas": {},
+    }
+    for nombre, (tabla, columnas_json) in tablas.items():
+        _guardar(tabla, temporal, nombre)
+        manifiesto["tablas"][nombre] = {
+            "filas": tabla.num_rows,
+            "columnas": tabla.column_names,
+            "columnas_json": columnas_json,
+        }
+    with open(os.path.join(temporal, FICHERO_MANIFIESTO), "w", encoding="utf-8") as fichero:
+        json.dump(manifiesto, fichero, ensure_ascii=False, indent=4)
+
+    anterior = carpeta.rstrip("/") + ".anterior"
+    shutil.rmtree(anterior, ignore_errors=True)
+    if os.path.exists(carpeta):
+        os.replace(carpeta, anterior)
+    os.replace(temporal, carpeta)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return manifiesto
+
+
+def es_instantanea(carpeta: str) -> bool:
+    return os.path.isfile(os.path.join(carpeta, FICHERO_MANIFIESTO)) and \
+        all(os.path.isfile(os.path.join(carpeta, f"{nombre}.parquet")) for nombre in TABLAS)
+
+
+def cargar_manifiesto(carpeta: str) -> dict:
+    with open(os.path.join(carpeta, FICHERO_MANIFIESTO), "r", encoding="utf-8") as fichero:
+        return json.load(fichero)
+
+
+def cargar_tabla(carpeta: str, nombre: str, columnas: list = None) -> pa.Table:
+    """
+    Tabla de la instantánea. El .arrow se abre con memory_map y sus columnas apuntan
+    directamente al fichero mapeado (sin copia ni descompresión); si no existe, se
+    lee el .parquet. Con `columnas` solo se leen esas columnas.
+    """
+    ruta_arrow = os.path.join(carpeta, f"{nombre}.arrow")
+    if os.path.exists(ruta_arrow):
+        tabla = pa.ipc.open_file(pa.memory_map(ruta_arrow, "r")).read_all()
+        return tabla.select(columnas) if columnas else tabla
+    return pq.read_table(os.path.join(carpeta, f"{nombre}.parquet"), columns=columnas)
+
+
+def _valores(columna) -> list:
+    """
+    Valores de una columna como lista de Python. Las columnas con diccionario se
+    decodifican con sus índices: cada valor distinto se convierte una sola vez, en
+    lugar de una vez por fila como hace to_pylist().
+    """
+    if not pa.types.is_dictionary(columna.type):
+        return columna.to_pylist()
+    valores = []
+    for trozo in columna.chunks:
+        diccionario = trozo.dictionary.to_pylist()
+        valores.extend(None if i is None else diccionario[i] for i in trozo.indices.to_pylist())
+    return valores
+
+
+def _filas(tabla: pa.Table, columnas_json: list):
+    # Diccionarios con las claves originales, en su orden, a partir de _campos; solo se
+    # leen las columnas de la fila, no las que quedaron vacías
+    columnas = {nombre: _valores(tabla.column(nombre)) for nombre in tabla.column_names}
+    json_ = set(columnas_json)
+    claves = {}
+    for i, campos in enumerate(columnas["_campos"]):
+        lista = claves.get(campos)
+        if lista is None:
+            lista = claves[campos] = campos.split(SEPARADOR_CAMPOS) if campos else []
+        fila = {}
+        for campo in lista:
+            valor = columnas[campo][i] if campo in columnas else None
+            if valor is not None and campo in json_:
+                valor = json.loads(valor)
+            fila[campo] = valor
+        yield fila
+
+
+def leer_trabajos_instantanea(carpeta: str, manifiesto: dict = None) -> list:
+    """
+    Trabajos distintos de la instantánea como (categoría, trabajo), en el orden de
+    sus identificadores.
+    """
+    manifiesto = manifiesto or cargar_manifiesto(carpeta)
+    tabla = cargar_tabla(carpeta, "trabajos")
+    categorias = _valores(tabla.column("_categoria"))
+    return list(zip(categorias, _filas(tabla, manifiesto["tablas"]["trabajos"]["columnas_json"])))
+
+
+def leer_investigadores_instantanea(carpeta: str):
+    """
+    Devuelve los investigadores de la instantánea de uno en uno, en el orden de los
+    bloques y con los mismos datos que leer_investigadores() sobre esos bloques.
+    """
+    manifiesto = cargar_manifiesto(carpeta)
+    trabajos = [trabajo for _, trabajo in leer_trabajos_instantanea(carpeta, manifiesto)]
+
+    # Trabajos de cada investigador por categoría, en el orden de sus listas
+    autorias = cargar_tabla(carpeta, "autorias")
+    listas = {}
+    for id_investigador, id_trabajo, posicion in zip(
+        autorias.column("id_investigador").to_pylist(),
+        autorias.column("id_trabajo").to_pylist(),
+        autorias.column("posicion").to_pylist(),
+    ):
+        listas.setdefault(id_investigador, []).append((posicion, id_trabajo))
+
+    categorias = _valores(cargar_tabla(carpeta, "trabajos", ["_categoria"]).column("_categoria"))
+    tabla = cargar_tabla(carpeta, "investigadores")
+    ids = tabla.column("_id_investigador").to_pylist()
+    con_listas = _valores(tabla.column("_listas"))
+    filas = _filas(tabla, manifiesto["tablas"]["investigadores"]["columnas_json"])
+    for id_investigador, campos_lista, investigador in zip(ids, con_listas, filas):
+        por_categoria = {}
+        for posicion, id_trabajo in sorted(listas.get(id_investigador, [])):
+            por_categoria.setdefault(categorias[id_trabajo], []).append(trabajos[id_trabajo])
+        for campo in campos_lista.split(SEPARADOR_CAMPOS) if campos_lista else []:
+            investigador[campo] = por_categoria.get(campo, [])
+        yield investigador
+
+
+def construir_mapa_instantanea(carpeta: str) -> MapaTrabajos:
+    """
+    Mapa de trabajos de la ingesta construido desde la instantánea; idéntico al de
+    ingesta.construir_mapa() sobre los bloques exportados.
+    """
+    return mapa_desde_investigadores(leer_investigadores_instantanea(carpeta))
+
+
+def documentos_corpus(carpeta: str):
+    """
+    (colección, documento) de cada investigador y trabajo distinto de la instantánea,
+    con los campos que escribe la ingesta (parsear_autor, parsear_publicacion...).
+    """
+    for investigador in leer_investigadores_instantanea(carpeta):
+        yield "autores", parsear_autor(investigador)
+    for categoria, trabajo in leer_trabajos_instantanea(carpeta):
+        coleccion, parsear = CATEGORIAS[categoria]
+        yield coleccion, parsear(trabajo)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from lector_bloques import rutas_bloques
+
+    parser = argparse.ArgumentParser(description="Exporta los bloques de investigadores a Parquet/Arrow")
+    parser.add_argument("--datos", default="data/output_blocks_modified", help="Carpeta con los ficheros de bloques")
+    parser.add_argument("--salida", default="data/instantanea_corpus", help="Carpeta de la instantánea")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    manifiesto = exportar_corpus(rutas_bloques(args.datos), args.salida)
+    tamano = sum(os.path.getsize(os.path.join(args.salida, f)) for f in os.listdir(args.salida) if f.endswith(".parquet"))
+    filas = ", ".join(f"{info['filas']} {nombre}" for nombre, info in manifiesto["tablas"].items())
+    print(f"Instantánea exportada en {args.salida} en {time.perf_counter() - inicio:.1f} s: {filas} "
+          f"({tamano / 2**20:.1f} MB en Parquet)")
@@ -0,0 +1,132 @@
+"""
+Instantánea de los embeddings para el servicio de búsqueda (APISEARCH), que la abre
+con np.load(mmap_mode='r') en lugar de descargar todos los vectores de MongoDB al
+arrancar. Estructura de la carpeta:
+
+    manifiesto.json               modelo, versión del texto, versión del corpus, dtype,
+                                  dimensión y ficheros de cada colección
+    <coleccion>/ids.npy           _id de cada fila en hexadecimal, ordenados
+    <coleccion>/hashes.npy        embedding_hash de cada fila (mismo orden que ids.npy)
+    <coleccion>/vectores_0.npy    filas 0 .. TAM_FRAGMENTO-1
+    <coleccion>/vectores_1.npy    ...
+
+Cada colección se guarda con su nombre completo ("autores", "Proyecto.autores"...).
+Solo se exportan los embeddings generados con el modelo actual, de documentos no
+eliminados. Los _id se guardan ordenados, así la búsqueda de un id es una búsqueda
+binaria sobre el fichero mapeado y no hace falta construir un diccionario por proceso.
+Con el embedding_hash de cada fila la API detecta los documentos cuyo embedding se
+regeneró en MongoDB después de exportar (la carga incremental conserva su _id).
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+from texto_embedding import NOMBRE_MODELO, VERSION_EMBEDDING, get_campos_embedding
+
+# Filas de cada fichero .npy de vectores
+TAM_FRAGMENTO = 50000
+FICHERO_MANIFIESTO = "manifiesto.json"
+FICHERO_IDS = "ids.npy"
+FICHERO_HASHES = "hashes.npy"
+
+
+def _guardar_fragmento(carpeta, fragmentos, filas):
+    nombre = f"vectores_{len(fragmentos)}.npy"
+    np.save(os.path.join(carpeta, nombre), filas)
+    fragmentos.append(nombre)
+
+
+async def exportar_coleccion(collection, carpeta, dtype, huella) -> dict:
+    """
+    Escribe los ficheros de una colección y acumula en `huella` sus (_id, embedding_hash)
+    para la versión del corpus. Devuelve la entrada de la colección en el manifiesto.
+
+    Los vectores se copian a un único array de TAM_FRAGMENTO filas del dtype de
+    salida, reservado una vez y reutilizado en cada fragmento, en lugar de acumular
+    listas de floats de Python.
+    """
+    os.makedirs(carpeta)
+    filtro = {"embedding_model": NOMBRE_MODELO, "eliminado": {"$ne": True}}
+    ids = []
+    hashes = []
+    fragmentos = []
+    filas = None
+    n = 0
+    dimension = None
+    async for doc in collection.find(filtro, {"embedding": 1, "embedding_hash": 1}).sort("_id", 1):
+        vector = doc.get("embedding")
+        if not vector:
+            continue
+        if dimension is None:
+            dimension = len(vector)
+            filas = np.empty((TAM_FRAGMENTO, dimension), dtype=dtype)
+        elif len(vector) != dimension:
+            raise ValueError(f"Embedding de dimensión {len(vector)} en {doc['_id']} (se esperaba {dimension})")
+        ids.append(str(doc["_id"]))
+        hashes.append(doc.get("embedding_hash") or "")
+        filas[n] = vector
+        n += 1
+        huella.update(f"{doc['_id']}:{doc.get('embedding_hash')}\n".encode("utf-8"))
+        if n == TAM_FRAGMENTO:
+            _guardar_fragmento(carpeta, fragmentos, filas)
+            n = 0
+    if n:
+        _guardar_fragmento(carpeta, fragmentos, filas[:n])
+
+    np.save(os.path.join(carpeta, FICHERO_IDS), np.array(ids, dtype="<U24"))
+    np.save(os.path.join(carpeta, FICHERO_HASHES), np.array(hashes, dtype="<U64"))
+    return {"documentos": len(ids), "dimension": dimension, "ids": FICHERO_IDS, "hashes": FICHERO_HASHES,
+            "fragmentos": fragmentos}
+
+
+async def exportar_instantanea(db, collection_names, carpeta, dtype="float32") -> dict:
+    """
+    Exporta la instantánea de todas las colecciones con embeddings a `carpeta`. Se
+    escribe en una carpeta temporal y se sustituye la anterior al terminar, así un
+    servicio que la esté leyendo nunca ve una instantánea a medias (los ficheros ya
+    mapeados siguen siendo válidos aunque se borren). Devuelve el manifiesto.
+    """
+    temporal = carpeta.rstrip("/") + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    huella = hashlib.sha256()
+    colecciones = {}
+    for collection_name in sorted(collection_names):
+        if not get_campos_embedding(collection_name):
+            continue
+        # Con el nombre completo: la ingesta escribe en "autores" y la API lee de
+        # "Proyecto.autores", y pueden existir las dos en la misma base de datos
+        colecciones[collection_name] = await exportar_coleccion(
+            db[collection_name], os.path.join(temporal, collection_name), dtype, huella
+        )
+
+    dimensiones = {info["dimension"] for info in colecciones.values() if info["dimension"]}
+    if len(dimensiones) > 1:
+        raise ValueError(f"Las colecciones tienen embeddings de dimensiones distintas: {dimensiones}")
+
+    manifiesto = {
+        "modelo": NOMBRE_MODELO,
+        "version_embedding": VERSION_EMBEDDING,
+        # Cambia si cambia cualquier documento exportado o su embedding
+        "version_corpus": huella.hexdigest()[:16],
+        "creado": datetime.now(timezone.utc).isoformat(),
+        "dtype": np.dtype(dtype).name,
+        "dimension": dimensiones.pop() if dimensiones else None,
+        "filas_por_fragmento": TAM_FRAGMENTO,
+        "colecciones": colecciones,
+    }
+    with open(os.path.join(temporal, FICHERO_MANIFIESTO), "w", encoding="utf-8") as fichero:
+        json.dump(manifiesto, fichero, ensure_ascii=False, indent=4)
+
+    anterior = carpeta.rstrip("/") + ".anterior"
+    shutil.rmtree(anterior, ignore_errors=True)
+    if os.path.exists(carpeta):
+        os.replace(carpeta, anterior)
+    os.replace(temporal, carpeta)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return manifiesto
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+
+# Tamaño de cada lectura del fichero (caracteres)
+TAM_LECTURA = 1 << 16
+
+_espacios = re.compile(r"\s*")
+_numero_bloque = re.compile(r"(\d+)\.json$")
+
+
+def iterar_array_json(fichero, tam_lectura: int = TAM_LECTURA):
+    """
+    Recorre un fichero cuyo contenido es un array JSON y devuelve sus elementos de
+    uno en uno, sin cargar el fichero entero en memoria.
+
+    El fichero se lee por bloques y cada elemento se decodifica con
+    JSONDecoder.raw_decode en cuanto está completo en el búfer; el búfer solo
+    conserva el texto del elemento en curso. Si un elemento no cabe en lo leído, la
+    siguiente lectura es el doble de la anterior, así un elemento grande se
+    decodifica un número logarítmico de veces y no una vez por bloque.
+
+    Como json.load, rechaza una coma antes del cierre del array ("[1,]") y cualquier
+    dato después del cierre ("[1]x").
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def rellenar(tam: int = tam_lectura):
+        nonlocal buf, pos, eof
+        bloque = fichero.read(tam)
+        if not bloque:
+            eof = True
+        buf = buf[pos:] + bloque
+        pos = 0
+
+    def saltar_espacios() -> bool:
+        # Avanza hasta el siguiente carácter significativo; False si se acaba el fichero
+        nonlocal pos
+        while True:
+            pos = _espacios.match(buf, pos).end()
+            if pos < len(buf):
+                return True
+            if eof:
+                return False
+            rellenar()
+
+    def cerrar():
+        # Tras el "]" solo puede haber espacios, como en json.load
+        nonlocal pos
+        pos += 1
+        if saltar_espacios():
+            raise ValueError(f"Datos después del cierre del array en la posición {pos} del búfer")
+
+    if not saltar_espacios() or buf[pos] != "[":
+        raise ValueError("El fichero no contiene un array JSON")
+    pos += 1
+    tras_coma = False
+    tam = tam_lectura
+
+    while True:
+        if not saltar_espacios():
+            raise ValueError("Array JSON sin cerrar")
+        if buf[pos] == "]":
+            if tras_coma:
+                raise ValueError(f"Coma antes del cierre del array en la posición {pos} del búfer")
+            cerrar()
+            return
+        try:
+            elemento, fin = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            tam *= 2
+            rellenar(tam)
+            continue
+
+        # Un valor al final del búfer puede estar incompleto (p. ej. un número),
+        # así que solo se acepta si ya se ve el separador que lo sigue
+        siguiente = _espacios.match(buf, fin).end()
+        if siguiente == len(buf) and not eof:
+            tam *= 2
+            rellenar(tam)
+            continue
+
+        yield elemento
+        tam = tam_lectura
+        pos = siguiente
+        tras_coma = pos < len(buf) and buf[pos] == ","
+        if tras_coma:
+            pos += 1
+        elif pos < len(buf) and buf[pos] == "]":
+            cerrar()
+            return
+        else:
+            raise ValueError(f"Separador inesperado en la posición {pos} del búfer")
+
+
+def rutas_bloques(carpeta: str) -> list[str]:
+    """
+    Ficheros .json de una carpeta de bloques ordenados por su número
+    (investigadores_detalle_1.json, ..._2.json, ..., ..._10.json).
+    """
+    nombres = [nombre for nombre in os.listdir(carpeta) if nombre.endswith(".json")]
+
+    def clave(nombre):
+        numero = _numero_bloque.search(nombre)
+        return (int(numero.group(1)) if numero else float("inf"), nombre)
+
+    return [os.path.join(carpeta, nombre) for nombre in sorted(nombres, key=clave)]
+
+
+def leer_investigadores(rutas):
+    """
+    Devuelve los investigadores de todos los ficheros de bloques, de uno en uno y en
+    orden. Un fichero ilegible o mal formado se informa y se continúa con el siguiente.
+    """
+    for ruta in rutas:
+        leidos = 0
+        try:
+            with open(ruta, "r", encoding="utf-8") as fichero:
+                for investigador in iterar_array_json(fichero):
+                    leidos += 1
+                    yield investigador
+            print(f"Archivo {ruta} leído. Contiene {leidos} autores")
+        except (OSError, ValueError) as e:
+            print(f"Error al leer archivo {ruta} (tras {leidos} autores): {str(e)}")
+
+
+def escribir_array_json(fichero, elementos, indent: int = 4) -> int:
+    """
+    Escribe un array JSON elemento a elemento con el mismo formato que
+    json.dump(lista, ensure_ascii=False, indent=indent). Con indent=None se escribe
+    compacto, como json.dump(lista, ensure_ascii=False, separators=(",", ":")).
+    Devuelve los elementos escritos.
+    """
+    total = 0
+    if indent is None:
+        for elemento in elementos:
+            fichero.write(("[" if total == 0 else ",") + json.dumps(elemento, ensure_ascii=False, separators=(",", ":")))
+            total += 1
+        fichero.write("]" if total else "[]")
+        return total
+
+    sangria = " " * indent
+    for elemento in elementos:
+        texto = json.dumps(elemento, ensure_ascii=False, indent=indent)
+        fichero.write(("[\n" if total == 0 else ",\n") + sangria + texto.replace("\n", "\n" + sangria))
+        total += 1
+    fichero.write("\n]" if total else "[]")
+    return total
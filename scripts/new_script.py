@@ -1,22 +1,76 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from cliente_http import (
+    CacheHTTP, ClienteHTTP, MAX_CONEXIONES, MAX_POR_HOST, PETICIONES_POR_SEGUNDO
+)
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
 import json
+import multiprocessing
 import time
-import random
 import os
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
 
-# URL base de la página
+# URL base de la página (se puede cambiar con --base-url, p. ej. para usar servidor_grabaciones.py)
 base_url = "https://accedacris.ulpgc.es"
 
-def get_detalle(publicacion_url):
-    try:
-        response = requests.get(publicacion_url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error al acceder a la publicación {publicacion_url}: {e}")
-        return {}
+# Analizador de HTML (--analizador). html.parser es el de siempre y el que fija el
+# formato de los bloques: lxml es bastante más rápido, pero corrige el HTML mal formado
+# de otra manera (p. ej. con una celda <td> sin cerrar, parsear_detalle da la clave
+# "AutoresX" con html.parser y "Autores" con lxml). Antes de usarlo hay que comprobar
+# con benchmarks/bench_parseo.py, sobre páginas reales grabadas con --grabar, que
+# extrae los mismos datos.
+analizador_html = "html.parser"
+# Con filtrar_html (--filtrar) solo se construyen los elementos que leen las funciones
+# parsear_* (SoupStrainer), no la cabecera, menús y pie de cada página
+filtrar_html = False
+FILTROS = {
+    # La tabla del trabajo y los enlaces, entre los que está el del PDF
+    "detalle": SoupStrainer(["table", "a"]),
+    "seccion": SoupStrainer("div", id="item_fields"),
+    "proyectos": SoupStrainer("div", class_="item-container"),
+    "investigadores": SoupStrainer("div", class_="item-fields"),
+    "perfil": SoupStrainer("div", id="emailDiv"),
+    "paginacion": SoupStrainer(class_="pagination"),
+}
+# Pool de procesos para analizar el HTML (--procesos); None analiza en el propio bucle
+ejecutor = None
+
+# Las funciones parsear_* trabajan sobre el HTML ya descargado; las get_* descargan
+# las páginas con el ClienteHTTP compartido y se ejecutan de forma concurrente.
+
+def _sopa(contenido, filtro):
+    return BeautifulSoup(contenido, analizador_html, parse_only=FILTROS[filtro] if filtrar_html else None)
+
+def _iniciar_trabajador(url, analizador, filtrar):
+    # Los procesos del pool no heredan la configuración del principal
+    global base_url, analizador_html, filtrar_html
+    base_url, analizador_html, filtrar_html = url, analizador, filtrar
+
+def crear_pool(procesos):
+    """
+    Pool de procesos para analizar el HTML cuando el rastreo concurrente deja a la CPU
+    como cuello de botella; con 1 proceso devuelve None y se analiza sin pool.
+    """
+    if procesos <= 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_trabajador,
+        initargs=(base_url, analizador_html, filtrar_html),
+    )
+
+async def analizar(funcion, *args):
+    """
+    Ejecuta una función parsear_* en el pool de procesos si lo hay.
+    """
+    if ejecutor is None:
+        return funcion(*args)
+    return await asyncio.get_running_loop().run_in_executor(ejecutor, funcion, *args)
 
-    soup = BeautifulSoup(response.content, "html.parser")
+def parsear_detalle(contenido):
+    soup = _sopa(contenido, "detalle")
     detalles = {}
 
     table = soup.find('table', class_='table itemDisplayTable')
@@ -41,55 +95,180 @@ def get_detalle(publicacion_url):
             
     return detalles
 
-def get_section_items(perfil_url, section_path, title_id):
-    items_list = []
-    current_url = f"{perfil_url}/{section_path}.html"
-    try:
-        response = requests.get(current_url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error al acceder a la sección {section_path}: {e}")
-        return items_list
-
-    soup = BeautifulSoup(response.content, "html.parser")
+async def get_detalle(cliente, publicacion_url):
+    contenido = await cliente.obtener(publicacion_url, reutilizar=True)
+    if contenido is None:
+        print(f"Error al acceder a la publicación {publicacion_url}")
+        return {}
+    return await analizar(parsear_detalle, contenido)
+
+class MemoDetalles:
+    """
+    Memo de todo el rastreo: URL de un trabajo -> detalles ya extraídos. Un trabajo
+    con varios coautores aparece en varios perfiles; con el memo su página se
+    descarga y se analiza una sola vez (también si varios perfiles la piden a la vez)
+    y todos los investigadores comparten el mismo diccionario de detalles.
+
+    Con `ruta` los detalles se van añadiendo a un fichero JSONL, así un rastreo
+    interrumpido no vuelve a descargarlos al relanzarse; el fichero se borra al
+    terminar el rastreo.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.detalles = {}
+        self.en_curso = {}
+        self.descargados = 0
+        self.ahorrados = 0
+        if ruta and os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as fichero:
+                for linea in fichero:
+                    entrada = json.loads(linea)
+                    self.detalles[entrada["url"]] = entrada["detalles"]
+            print(f"Memo de detalles: {len(self.detalles)} trabajos recuperados de {ruta}")
+
+    async def obtener(self, cliente, url):
+        if url in self.detalles:
+            self.ahorrados += 1
+            return self.detalles[url]
+        if url in self.en_curso:
+            self.ahorrados += 1
+            return await self.en_curso[url]
+
+        tarea = asyncio.ensure_future(get_detalle(cliente, url))
+        self.en_curso[url] = tarea
+        try:
+            detalles = await tarea
+        finally:
+            del self.en_curso[url]
+        self.descargados += 1
+        # Los errores ({}) no se guardan para que otro perfil pueda reintentarlo
+        if detalles:
+            self.detalles[url] = detalles
+            if self.ruta:
+                with open(self.ruta, "a", encoding="utf-8") as fichero:
+                    fichero.write(json.dumps({"url": url, "detalles": detalles}, ensure_ascii=False) + "\n")
+        return detalles
+
+    def borrar(self):
+        if self.ruta and os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+def parsear_items_seccion(contenido, title_id):
+    """
+    URLs de los trabajos listados en la página de una sección del perfil.
+    """
+    soup = _sopa(contenido, "seccion")
     items = soup.find_all('div', id='item_fields')
 
+    urls = []
     for item in items:
         titulo_element = item.find('div', id=title_id)
         if titulo_element and titulo_element.find('a'):
-            titulo = titulo_element.find('a').text.strip()
-            item_url = base_url + titulo_element.find('a')['href']
-            detalles = get_detalle(item_url)
-            items_list.append(detalles)
+            urls.append(base_url + titulo_element.find('a')['href'])
+    return urls
 
-    return items_list
+def parsear_paginacion(contenido, url):
+    """
+    URLs de las demás páginas de una sección a partir del paginador de la primera.
+    El paginador solo enlaza unas cuantas páginas alrededor de la actual y la última,
+    así que se busca el parámetro numérico que cambia entre sus enlaces (número de
+    página o desplazamiento) y se generan todos sus valores hasta el mayor.
+    """
+    soup = _sopa(contenido, "paginacion")
+    activo = soup.select_one('.pagination .active a[href]')
+    actual = urldefrag(urljoin(url, activo['href'])).url if activo else url
+    enlaces = [urldefrag(urljoin(url, a['href'])).url for a in soup.select('.pagination a[href]')]
+    # Sin repetidos ("siguiente" y "última" apuntan a páginas ya enlazadas)
+    enlaces = list(dict.fromkeys(e for e in enlaces if e not in (url, actual)))
+    if len(enlaces) < 2:
+        return enlaces
+
+    parametros = [dict(parse_qsl(urlsplit(e).query)) for e in enlaces]
+    variables = [
+        clave for clave in parametros[0]
+        if all(p.get(clave, "").isdigit() for p in parametros) and len({p[clave] for p in parametros}) > 1
+    ]
+    if not variables:
+        return enlaces
+
+    clave = variables[0]
+    valor_actual = dict(parse_qsl(urlsplit(actual).query)).get(clave, "")
+    valores = sorted({int(p[clave]) for p in parametros} | ({int(valor_actual)} if valor_actual.isdigit() else set()))
+    if len(valores) == 1:
+        return enlaces
+    paso = min(b - a for a, b in zip(valores, valores[1:]))
+
+    plantilla = urlsplit(enlaces[0])
+    resultado = []
+    for valor in range(valores[0], valores[-1] + 1, paso):
+        if str(valor) == valor_actual:
+            continue
+        consulta = dict(parse_qsl(plantilla.query))
+        consulta[clave] = str(valor)
+        resultado.append(urlunsplit(plantilla._replace(query=urlencode(consulta))))
+    return resultado
+
+async def get_paginas(cliente, url, nombre, procesar):
+    """
+    Descarga una sección paginada: la primera página, su paginador y después todas
+    las demás páginas a la vez (el ClienteHTTP limita conexiones y tasa). Cada página
+    se procesa con `procesar(contenido)` en cuanto llega, sin esperar a las demás, y
+    el resultado conserva el orden de las páginas.
+    """
+    contenido = await cliente.obtener(url)
+    if contenido is None:
+        print(f"Error al acceder a la sección {nombre}")
+        return []
+
+    async def pagina(url_pagina):
+        contenido_pagina = await cliente.obtener(url_pagina)
+        if contenido_pagina is None:
+            print(f"Error al acceder a la página {url_pagina} de la sección {nombre}")
+            return []
+        return await procesar(contenido_pagina)
+
+    otras = await analizar(parsear_paginacion, contenido, url)
+    paginas = await asyncio.gather(procesar(contenido), *(pagina(u) for u in otras))
+    return [item for items in paginas for item in items]
+
+async def get_section_items(cliente, perfil_url, section_path, title_id, memo=None):
+    async def detalles(contenido):
+        # Los detalles se descargan a la vez; gather conserva el orden de la sección
+        urls = await analizar(parsear_items_seccion, contenido, title_id)
+        if memo:
+            return await asyncio.gather(*(memo.obtener(cliente, url) for url in urls))
+        return await asyncio.gather(*(get_detalle(cliente, url) for url in urls))
+
+    return await get_paginas(cliente, f"{perfil_url}/{section_path}.html", section_path, detalles)
 
 # Funciones auxiliares para distintas secciones
-get_publicaciones = lambda perfil_url: get_section_items(perfil_url, 'publicaciones', 'dc.title')
-# get_proyectos = lambda perfil_url: get_section_items(perfil_url, 'projects', 'crisproject.title')
-get_tesis = lambda perfil_url: get_section_items(perfil_url, 'tesis', 'dc.title')
-get_patentes = lambda perfil_url: get_section_items(perfil_url, 'patentes', 'dc.title')
-def get_proyectos(perfil_url):
+get_publicaciones = lambda cliente, perfil_url, memo=None: get_section_items(cliente, perfil_url, 'publicaciones', 'dc.title', memo)
+# get_proyectos = lambda cliente, perfil_url, memo=None: get_section_items(cliente, perfil_url, 'projects', 'crisproject.title', memo)
+get_tesis = lambda cliente, perfil_url, memo=None: get_section_items(cliente, perfil_url, 'tesis', 'dc.title', memo)
+get_patentes = lambda cliente, perfil_url, memo=None: get_section_items(cliente, perfil_url, 'patentes', 'dc.title', memo)
+
+async def get_proyectos(cliente, perfil_url):
+    """
+    Descarga las páginas de proyectos de un perfil de investigador y extrae sus proyectos.
+    """
+    async def proyectos(contenido):
+        return await analizar(parsear_proyectos, contenido)
+
+    return await get_paginas(cliente, f"{perfil_url}/projects.html", "projects", proyectos)
+
+def parsear_proyectos(contenido):
     """
     Extrae los proyectos de la página de un perfil de investigador.
     
     Args:
-        perfil_url (str): URL del perfil del investigador.
+        contenido (bytes): HTML de la página de proyectos del perfil.
     
     Returns:
         list: Lista de diccionarios con los detalles de cada proyecto.
     """
     proyectos_list = []
-    current_url = f"{perfil_url}/projects.html"
-    
-    try:
-        response = requests.get(current_url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error al acceder a la sección de proyectos: {e}")
-        return proyectos_list
-
-    soup = BeautifulSoup(response.content, "html.parser")
+    soup = _sopa(contenido, "proyectos")
     proyectos = soup.find_all('div', class_='item-container')
 
     for proyecto in proyectos:
@@ -173,12 +352,61 @@ def get_personal_investigador(proyecto):
 
     return personal
 
+def parsear_investigadores(contenido):
+    """
+    (nombre, URL del perfil) de cada investigador de una página del listado.
+    """
+    soup = _sopa(contenido, "investigadores")
+    resultado = []
+    for investigador in soup.find_all('div', class_='item-fields'):
+        nombre_elemento = investigador.find('div', id='crisrp.fullname')
+        nombre = nombre_elemento.text.strip() if nombre_elemento else "N/A"
+        perfil_url = base_url + nombre_elemento.find('a')['href'].strip() if nombre_elemento and nombre_elemento.find('a') else "N/A"
+        resultado.append((nombre, perfil_url))
+    return resultado
+
+def parsear_email(contenido):
+    perfil_soup = _sopa(contenido, "perfil")
+    email_element = perfil_soup.find('div', id='emailDiv')
+    return email_element.text.strip() if email_element else "N/A"
+
+async def get_investigador(cliente, nombre, perfil_url, memo=None):
+    """
+    Descarga el perfil y sus secciones (a la vez) y devuelve el investigador con la
+    misma estructura que los ficheros de output_blocks, o None si falla el perfil.
+    """
+    perfil_contenido = await cliente.obtener(perfil_url, reutilizar=True) if perfil_url != "N/A" else None
+    if perfil_contenido is None:
+        print(f"Error al acceder al perfil de {nombre}")
+        return None
+
+    email = await analizar(parsear_email, perfil_contenido)
+
+    publicaciones, proyectos, tesis, patentes = await asyncio.gather(
+        get_publicaciones(cliente, perfil_url, memo),
+        get_proyectos(cliente, perfil_url),
+        get_tesis(cliente, perfil_url, memo),
+        get_patentes(cliente, perfil_url, memo),
+    )
+
+    return {
+        "Nombre": nombre,
+        "URL del perfil": perfil_url,
+        "Perfil": {"Email": email},
+        "Publicaciones": publicaciones,
+        "Proyectos": proyectos,
+        "Tesis": tesis,
+        "Patentes": patentes
+    }
+
 # Proceso principal
-def main():
+async def rastrear(cliente, output_folder="output_blocks", limit_per_page=50, block_size=2, memo=None):
+    """
+    Recorre el listado de investigadores página a página. Los investigadores de cada
+    página se descargan a la vez (el ClienteHTTP limita conexiones y tasa) y se
+    guardan en el orden del listado, en bloques de `block_size` páginas.
+    """
     page_number = 0
-    limit_per_page = 50
-    block_size = 2  # Número de páginas por bloque
-    output_folder = "output_blocks"  # Carpeta donde se guardarán los bloques
 
     # Crear carpeta si no existe
     os.makedirs(output_folder, exist_ok=True)
@@ -187,53 +415,21 @@ def main():
         investigadores_lista = []
         for _ in range(block_size):
             current_url = f"{base_url}/simple-search?query=&location=researcherprofiles&start={page_number * limit_per_page}"
-            try:
-                response = requests.get(current_url, timeout=10)
-                response.raise_for_status()
-            except requests.RequestException as e:
-                print(f"Error al acceder a la página {page_number}: {e}")
+            contenido = await cliente.obtener(current_url)
+            if contenido is None:
+                print(f"Error al acceder a la página {page_number}")
                 break
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            investigadores = soup.find_all('div', class_='item-fields')
+            investigadores = await analizar(parsear_investigadores, contenido)
 
             if not investigadores:
                 print("No se encontraron más investigadores. Finalizando.")
                 return
 
-            for investigador in investigadores:
-                nombre_elemento = investigador.find('div', id='crisrp.fullname')
-                nombre = nombre_elemento.text.strip() if nombre_elemento else "N/A"
-                perfil_url = base_url + nombre_elemento.find('a')['href'].strip() if nombre_elemento and nombre_elemento.find('a') else "N/A"
-
-                try:
-                    perfil_response = requests.get(perfil_url, timeout=10)
-                    perfil_response.raise_for_status()
-                except requests.RequestException as e:
-                    print(f"Error al acceder al perfil de {nombre}: {e}")
-                    continue
-
-                perfil_soup = BeautifulSoup(perfil_response.content, 'html.parser')
-                email_element = perfil_soup.find('div', id='emailDiv')
-                email = email_element.text.strip() if email_element else "N/A"
-
-                # Reemplaza estas funciones con tus implementaciones
-                publicaciones = get_publicaciones(perfil_url)
-                proyectos = get_proyectos(perfil_url)
-                tesis = get_tesis(perfil_url)
-                patentes = get_patentes(perfil_url)
-
-                investigadores_lista.append({
-                    "Nombre": nombre,
-                    "URL del perfil": perfil_url,
-                    "Perfil": {"Email": email},
-                    "Publicaciones": publicaciones,
-                    "Proyectos": proyectos,
-                    "Tesis": tesis,
-                    "Patentes": patentes
-                })
-
-                time.sleep(random.uniform(0.5, 2))
+            resultados = await asyncio.gather(
+                *(get_investigador(cliente, nombre, perfil_url, memo) for nombre, perfil_url in investigadores)
+            )
+            investigadores_lista.extend(r for r in resultados if r is not None)
 
             page_number += 1
 
@@ -243,5 +439,51 @@ def main():
             json.dump(investigadores_lista, file, ensure_ascii=False, indent=4)
         print(f"Bloque guardado: {block_file}")
 
+async def main(args):
+    global base_url, ejecutor, analizador_html, filtrar_html
+    base_url = args.base_url.rstrip("/")
+    analizador_html, filtrar_html = args.analizador, args.filtrar
+    ejecutor = crear_pool(args.procesos)
+    inicio = time.perf_counter()
+    memo = MemoDetalles(args.memo)
+    cache = CacheHTTP(args.cache) if args.cache else None
+    async with ClienteHTTP(args.conexiones, args.por_host, args.tasa, grabar=args.grabar,
+                           cache=cache, max_edad=args.max_edad) as cliente:
+        await rastrear(cliente, args.salida, memo=memo)
+    memo.borrar()
+    if cache:
+        cache.cerrar()
+    if ejecutor:
+        ejecutor.shutdown()
+    segundos = time.perf_counter() - inicio
+    e = cliente.estadisticas
+    print(f"Peticiones: {e['peticiones']} ({e['peticiones'] / segundos:.1f}/s), reintentos: {e['reintentos']}, "
+          f"errores: {e['errores']}, {e['bytes'] / 2**20:.1f} MB en {segundos:.0f} s")
+    if cache:
+        print(f"Caché HTTP: {e['no_modificadas']} páginas sin cambios (304), {e['sin_red']} servidas sin acceder a la red")
+    pedidos = memo.descargados + memo.ahorrados
+    print(f"Detalles de trabajos: {memo.descargados} descargados, {memo.ahorrados} descargas ahorradas "
+          f"por trabajos compartidos ({memo.ahorrados / pedidos if pedidos else 0:.0%})")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Descarga los perfiles de investigadores de accedacris")
+    parser.add_argument("--base-url", default=base_url, help="URL base del sitio (o de servidor_grabaciones.py)")
+    parser.add_argument("--salida", default="output_blocks", help="Carpeta donde se guardarán los bloques")
+    parser.add_argument("--conexiones", type=int, default=MAX_CONEXIONES, help="Conexiones simultáneas en total")
+    parser.add_argument("--por-host", type=int, default=MAX_POR_HOST, help="Conexiones simultáneas por servidor")
+    parser.add_argument("--tasa", type=float, default=PETICIONES_POR_SEGUNDO, help="Peticiones por segundo por servidor")
+    parser.add_argument("--grabar", metavar="CARPETA", help="Guarda las páginas descargadas para servidor_grabaciones.py")
+    parser.add_argument("--memo", default="memo_detalles.jsonl",
+                        help="Fichero donde se guardan los detalles ya descargados para reanudar un rastreo interrumpido")
+    parser.add_argument("--cache", default="cache_http.sqlite",
+                        help="Caché HTTP para rastreos incrementales con peticiones condicionales ('' para desactivarla)")
+    parser.add_argument("--max-edad", type=float, metavar="SEGUNDOS",
+                        help="Reutiliza sin acceder a la red los perfiles y detalles guardados hace menos de SEGUNDOS "
+                             "(los listados y secciones se piden siempre)")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos para analizar el HTML en paralelo (1 = en el propio proceso)")
+    parser.add_argument("--analizador", choices=("html.parser", "lxml"), default=analizador_html,
+                        help="Analizador de HTML (lxml es más rápido; comprobar antes la paridad con bench_parseo.py)")
+    parser.add_argument("--filtrar", action="store_true",
+                        help="Construye solo los elementos que se leen de cada página (SoupStrainer)")
+    asyncio.run(main(parser.parse_args()))
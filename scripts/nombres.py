@@ -0,0 +1,111 @@
+import re
+import unicodedata
+
+_enlaces = re.compile(r"\(Link:[^)]*\)")
+_no_alfanumerico = re.compile(r"[^0-9a-z]+")
+
+
+def plegar(texto) -> str:
+    """
+    Forma de comparación de un nombre: sin tildes ni diéresis, en minúsculas y con
+    cualquier signo de puntuación convertido en espacio.
+
+    >>> plegar("Vázquez-Núñez, José Mª")
+    'vazquez nunez jose ma'
+    """
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+    return _no_alfanumerico.sub(" ", texto).strip()
+
+
+def tokens_texto(texto) -> list[str]:
+    # Tokens de un campo de tesis, sin los "(Link: ...)" que añade el scraper
+    return plegar(_enlaces.sub(" ", texto or "")).split()
+
+
+def claves_nombre(nombre_completo: str) -> tuple[tuple, tuple]:
+    """
+    Tokens plegados de un nombre en formato "Apellidos,Nombre": (apellidos, nombre).
+    """
+    apellidos, _, nombre = nombre_completo.partition(",")
+    return tuple(plegar(apellidos).split()), tuple(plegar(nombre).split())
+
+
+def separar_menciones(texto) -> list[tuple]:
+    """
+    Nombres (apellidos, nombre) mencionados en un campo de tesis. El scraper deja un
+    "(Link: ...)" tras cada nombre enlazado; los fragmentos que no tienen exactamente
+    una coma no se pueden separar y se devuelven vacíos.
+    """
+    piezas = [pieza.strip() for pieza in _enlaces.split(texto or "") if pieza.strip()]
+    return [claves_nombre(pieza) if pieza.count(",") == 1 else ((), ()) for pieza in piezas]
+
+
+def _contiene_secuencia(posiciones: dict, secuencia: tuple) -> bool:
+    # True si los tokens de la secuencia aparecen seguidos en el texto
+    if not secuencia:
+        return True
+    return any(
+        all(inicio + i in posiciones.get(token, ()) for i, token in enumerate(secuencia[1:], 1))
+        for inicio in posiciones.get(secuencia[0], ())
+    )
+
+
+class IndiceNombres:
+    """
+    Índice de los nombres de los investigadores para atribuir autoría y dirección de
+    tesis. Cada investigador se indexa por el primer token de sus apellidos; para un
+    texto se consultan solo los candidatos cuyos tokens aparecen en él y se comprueba
+    que apellidos y nombre estén completos y seguidos. El coste es lineal en la
+    longitud del texto y el resultado se memoriza por tesis, así los coautores que
+    listan la misma tesis no vuelven a analizarla.
+    """
+
+    def __init__(self):
+        self.claves = {}  # URL del perfil -> (apellidos, nombre)
+        self.por_token = {}  # primer token de los apellidos -> URLs
+        self._memo = {}
+
+    def agregar(self, url: str, nombre_completo: str):
+        apellidos, nombre = claves_nombre(nombre_completo)
+        if not apellidos:
+            return
+        self.claves[url] = (apellidos, nombre)
+        self.por_token.setdefault(apellidos[0], set()).add(url)
+        self._memo.clear()
+
+    @classmethod
+    def desde_investigadores(cls, investigadores) -> "IndiceNombres":
+        indice = cls()
+        for investigador in investigadores:
+            indice.agregar(investigador["URL del perfil"], investigador.get("Nombre") or "")
+        return indice
+
+    def buscar(self, texto) -> frozenset:
+        """
+        URLs de todos los investigadores cuyo nombre completo aparece en el texto.
+        """
+        tokens = tokens_texto(texto)
+        posiciones = {}
+        for i, token in enumerate(tokens):
+            posiciones.setdefault(token, set()).add(i)
+
+        encontrados = set()
+        for token in posiciones:
+            for url in self.por_token.get(token, ()):
+                apellidos, nombre = self.claves[url]
+                if _contiene_secuencia(posiciones, apellidos) and _contiene_secuencia(posiciones, nombre):
+                    encontrados.add(url)
+        return frozenset(encontrados)
+
+    def atribuir_tesis(self, clave: str, autores, directores) -> tuple[frozenset, frozenset]:
+        """
+        (autores, directores) reconocidos en los campos "Autores/as" y "Director/a "
+        de una tesis, memorizado por tesis.
+        """
+        memo = (clave, autores, directores)
+        if memo not in self._memo:
+            self._memo[memo] = (self.buscar(autores), self.buscar(directores))
+        return self._memo[memo]
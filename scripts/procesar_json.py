@@ -1,14 +1,36 @@
+import argparse
 import os
 import json
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lector_bloques import escribir_array_json, iterar_array_json
+
+# Categorías de cada investigador cuyos trabajos tienen "Resumen"
+CATEGORIAS = ['Publicaciones', 'Tesis']
+
+# Inicios típicos de frase en inglés y en español, en el orden en que se prueban
+INICIOS_INGLES = ("This", "Introduction", "Methods", "Results", "Conclusion", "We", "These", "The", "A", "An")
+INICIOS_ESPANOL = ("Esto", "El", "Esta", "Los", "Las", "Una", "Un", "En", "Además", "Sin embargo", "Por lo tanto")
+# Letras que pueden preceder al punto en un cambio de español a inglés
+_MINUSCULAS = frozenset("abcdefghijklmnopqrstuvwxyzáéíóúñü")
+
+# Un único patrón, compilado una vez, para los dos sentidos: un punto tras una letra o
+# cifra, los espacios que le siguen y, por delante, el inicio de frase en inglés
+# (grupo 1) y/o en español (grupo 2)
+_cambio_idioma = re.compile(
+    r"(?<=\w)\.\s*(?=" + "|".join(INICIOS_INGLES + INICIOS_ESPANOL) + ")"
+    r"(?=(" + "|".join(INICIOS_INGLES) + ")?)"
+    r"(?=(" + "|".join(INICIOS_ESPANOL) + ")?)"
+)
 
 # Función para añadir saltos de línea en "Resumen" al detectar cambio de idioma
 def ajustar_resumen(resumen):
     """
     Ajusta el texto del campo "Resumen" detectando cambios de idioma y añadiendo saltos de línea (\n).
 
-    Este método busca patrones específicos que indican transiciones entre español e inglés, 
-    como frases que terminan en español y continúan con palabras comunes en inglés (o viceversa). 
+    Este método busca patrones específicos que indican transiciones entre español e inglés,
+    como frases que terminan en español y continúan con palabras comunes en inglés (o viceversa).
     Esto facilita la separación visual y lógica de los idiomas dentro del mismo texto.
 
     Args:
@@ -16,27 +38,94 @@ def ajustar_resumen(resumen):
 
     Returns:
         str: El texto ajustado con los saltos de línea insertados donde se detectaron cambios de idioma.
-    
+
     Patrones utilizados:
-        - De español a inglés: Detecta oraciones en español seguidas de palabras como 
+        - De español a inglés: Detecta oraciones en español seguidas de palabras como
           "This", "Introduction", "Methods", etc.
-        - De inglés a español: Detecta oraciones en inglés seguidas de palabras como 
+        - De inglés a español: Detecta oraciones en inglés seguidas de palabras como
           "Esto", "Además", "Por lo tanto", etc.
+
+    Los dos patrones se aplican en una sola pasada sobre el texto con el mismo resultado
+    que aplicarlos con re.sub uno detrás de otro (español a inglés tras una minúscula,
+    inglés a español tras cualquier letra o cifra): `fin_ingles` y `fin_espanol`
+    guardan dónde terminó la última coincidencia de cada uno, porque re.sub no busca
+    una coincidencia nueva dentro del texto que ya ha sustituido.
     """
-    patrones = [
-         # Español a inglés: busca frases en español seguidas de inicio típico en inglés
-        r'([a-záéíóúñü]+\.)\s*(This|Introduction|Methods|Results|Conclusion|We|These|The|A|An)',  
-        # Inglés a español: busca frases en inglés seguidas de inicio típico en español
-        r'(\w+\.)\s*(Esto|El|Esta|Los|Las|Una|Un|En|Además|Sin embargo|Por lo tanto)',
-    ]
-    for patron in patrones:
-        resumen = re.sub(patron, r'\1\n\2', resumen)
-    return resumen
+    partes = []
+    ultimo = fin_ingles = fin_espanol = 0
+    for m in _cambio_idioma.finditer(resumen):
+        punto, siguiente = m.start(), m.end()
+        ingles, espanol = m.groups()
+        if ingles and (punto <= fin_ingles or resumen[punto - 1] not in _MINUSCULAS):
+            ingles = None
+        if espanol and punto <= fin_espanol:
+            espanol = None
+        if ingles:
+            fin_ingles = siguiente + len(ingles)
+        if espanol:
+            fin_espanol = siguiente + len(espanol)
+        if ingles or espanol:
+            # Los espacios entre el punto y la frase siguiente se sustituyen por \n
+            partes.append(resumen[ultimo:punto + 1])
+            partes.append("\n")
+            ultimo = siguiente
+    if not partes:
+        return resumen
+    partes.append(resumen[ultimo:])
+    return "".join(partes)
+
+def ajustar_investigador(investigador):
+    """
+    Aplica `ajustar_resumen` a los trabajos de las categorías con resumen. Modifica y
+    devuelve el mismo diccionario.
+    """
+    for categoria in CATEGORIAS:
+        if categoria in investigador:
+            for item in investigador[categoria]:
+                if 'Resumen' in item:
+                    item['Resumen'] = ajustar_resumen(item['Resumen'])
+    return investigador
+
+def procesar_archivo(input_file_path, output_file_path, compacto=False, streaming=False):
+    """
+    Procesa un archivo de bloques y guarda el resultado. Sin `compacto` la salida es
+    idéntica byte a byte a json.dump(data, ensure_ascii=False, indent=4).
+
+    Con `streaming` los investigadores se leen, ajustan y escriben de uno en uno
+    (lector_bloques), sin cargar el archivo entero en memoria.
+
+    Returns:
+        dict: bytes de entrada y de salida y número de investigadores del archivo.
+    """
+    indent = None if compacto else 4
+    if streaming:
+        with open(input_file_path, 'r', encoding='utf-8') as infile, \
+                open(output_file_path, 'w', encoding='utf-8') as outfile:
+            registros = escribir_array_json(outfile, map(ajustar_investigador, iterar_array_json(infile)), indent)
+    else:
+        with open(input_file_path, 'r', encoding='utf-8') as infile:
+            data = json.load(infile)
+        for investigador in data:
+            ajustar_investigador(investigador)
+        registros = len(data)
+        separadores = (",", ":") if compacto else None
+        # dumps y una sola escritura: json.dump escribe el texto en miles de trozos
+        with open(output_file_path, 'w', encoding='utf-8') as outfile:
+            outfile.write(json.dumps(data, ensure_ascii=False, indent=indent, separators=separadores))
 
-def procesar_archivos(input_folder, output_folder):
+    return {
+        "bytes_entrada": os.path.getsize(input_file_path),
+        "bytes_salida": os.path.getsize(output_file_path),
+        "registros": registros,
+    }
+
+def _procesar_tarea(tarea):
+    return procesar_archivo(*tarea)
+
+def procesar_archivos(input_folder, output_folder, procesos=1, compacto=False, streaming=False):
     """
-    Procesa archivos JSON en una carpeta para ajustar el campo "Resumen" 
-    mediante la función `ajustar_resumen`. Los archivos procesados se guardan en 
+    Procesa archivos JSON en una carpeta para ajustar el campo "Resumen"
+    mediante la función `ajustar_resumen`. Los archivos procesados se guardan en
     otra carpeta con el mismo nombre pero con un prefijo "mod_".
 
     Este método recorre cada archivo JSON en la carpeta de entrada, carga su contenido,
@@ -46,48 +135,63 @@ def procesar_archivos(input_folder, output_folder):
     Args:
         input_folder (str): Ruta a la carpeta que contiene los archivos JSON originales.
         output_folder (str): Ruta a la carpeta donde se guardarán los archivos modificados.
+        procesos (int): Procesos entre los que se reparten los archivos (1 = sin pool).
+        compacto (bool): Guarda el JSON sin sangría ni espacios.
+        streaming (bool): Procesa cada archivo investigador a investigador.
 
     Funcionalidad:
         1. Verifica si los archivos terminan en `.json`.
-        2. Carga el contenido del archivo JSON.
+        2. Carga el contenido del archivo JSON (o lo recorre registro a registro).
         3. Recorre los registros buscando las claves `Publicaciones` y `Tesis`.
         4. Procesa el campo `Resumen` de cada registro utilizando la función `ajustar_resumen`.
         5. Guarda el archivo modificado en la carpeta de salida con el prefijo "mod_".
-    
+
     Excepciones:
         - Si la carpeta de salida no existe, la crea automáticamente.
         - Maneja archivos mal formateados o inexistentes generando errores claros.
 
     Returns:
-        None
+        dict: archivos, investigadores, MB leídos y escritos, segundos y MB/s.
     """
     os.makedirs(output_folder, exist_ok=True)
+    inicio = time.perf_counter()
 
     # Procesar los archivos JSON en la carpeta de entrada
-    for file_name in os.listdir(input_folder):
-        if file_name.endswith('.json'):
-            input_file_path = os.path.join(input_folder, file_name)
-            output_file_path = os.path.join(output_folder, f"mod_{file_name}")
-            
-            with open(input_file_path, 'r', encoding='utf-8') as infile:
-                data = json.load(infile)
-            
-            # Recorrer registros y procesar el campo "Resumen"
-            for investigador in data:
-                for categoria in ['Publicaciones', 'Tesis']:
-                    if categoria in investigador:
-                        for item in investigador[categoria]:
-                            if 'Resumen' in item:
-                                item['Resumen'] = ajustar_resumen(item['Resumen'])
-            
-            # Guardar el archivo modificado
-            with open(output_file_path, 'w', encoding='utf-8') as outfile:
-                json.dump(data, outfile, ensure_ascii=False, indent=4)
-    
+    tareas = [
+        (os.path.join(input_folder, file_name), os.path.join(output_folder, f"mod_{file_name}"), compacto, streaming)
+        for file_name in os.listdir(input_folder)
+        if file_name.endswith('.json')
+    ]
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(_procesar_tarea, tareas))
+    else:
+        resultados = [_procesar_tarea(tarea) for tarea in tareas]
+
+    segundos = time.perf_counter() - inicio
+    mb_entrada = sum(r["bytes_entrada"] for r in resultados) / 2**20
+    metricas = {
+        "archivos": len(resultados),
+        "registros": sum(r["registros"] for r in resultados),
+        "mb_entrada": mb_entrada,
+        "mb_salida": sum(r["bytes_salida"] for r in resultados) / 2**20,
+        "segundos": segundos,
+        "mb_s": mb_entrada / segundos if segundos > 0 else 0.0,
+    }
     print(f"Archivos procesados y guardados en: {output_folder}")
+    print(f"{metricas['archivos']} archivos, {metricas['registros']} investigadores, "
+          f"{metricas['mb_entrada']:.1f} MB -> {metricas['mb_salida']:.1f} MB en {segundos:.1f} s "
+          f"({metricas['mb_s']:.1f} MB/s)")
+    return metricas
 
-# Configura las carpetas de entrada y salida antes de ejecutar
+# El pool de procesos necesita que el módulo pueda importarse sin procesar nada
 if __name__ == "__main__":
-    input_folder = "data/output_blocks"  # Cambia esta ruta
-    output_folder = "data/output_blocks_modified"  # Cambia esta ruta
-    procesar_archivos(input_folder, output_folder)
+    parser = argparse.ArgumentParser(description="Separa con saltos de línea los cambios de idioma de los resúmenes")
+    parser.add_argument("--entrada", default="data/output_blocks", help="Carpeta con los bloques JSON")
+    parser.add_argument("--salida", default="data/output_blocks_modified", help="Carpeta para los bloques modificados")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para repartir los archivos (0 = todos los núcleos)")
+    parser.add_argument("--compacto", action="store_true", help="Guarda el JSON sin sangría (más pequeño y rápido)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Procesa los archivos investigador a investigador sin cargarlos enteros en memoria")
+    args = parser.parse_args()
+    procesar_archivos(args.entrada, args.salida, args.procesos or os.cpu_count() or 1, args.compacto, args.streaming)
@@ -0,0 +1,104 @@
+import json
+import os
+import pickle
+import time
+
+
+class PuntoControl:
+    """
+    Estado de una ingesta guardado en disco para poder reanudarla si se interrumpe.
+
+    Se guardan dos ficheros:
+      - <ruta>: JSON con el modo de carga, los ficheros de entrada y, por colección,
+        cuántas operaciones están ya confirmadas en MongoDB. Se reescribe de forma
+        atómica tras cada lote confirmado.
+      - <ruta>.mapa: el MapaTrabajos completo (todas las escrituras pendientes),
+        guardado una vez al terminar la fase de lectura.
+    """
+
+    def __init__(self, ruta: str, estado: dict = None):
+        self.ruta = ruta
+        self.estado = estado or {"escritos": {}}
+
+    @property
+    def ruta_mapa(self) -> str:
+        return self.ruta + ".mapa"
+
+    @classmethod
+    def cargar(cls, ruta: str):
+        # Devuelve el punto de control guardado o None si no hay ninguno completo
+        if not (os.path.exists(ruta) and os.path.exists(ruta + ".mapa")):
+            return None
+        with open(ruta, "r", encoding="utf-8") as fichero:
+            return cls(ruta, json.load(fichero))
+
+    def guardar(self):
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as fichero:
+            json.dump(self.estado, fichero, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+    def guardar_mapa(self, mapa):
+        temporal = self.ruta_mapa + ".tmp"
+        with open(temporal, "wb") as fichero:
+            pickle.dump(mapa, fichero, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self.ruta_mapa)
+
+    def cargar_mapa(self):
+        with open(self.ruta_mapa, "rb") as fichero:
+            return pickle.load(fichero)
+
+    def escritos(self, coleccion: str) -> int:
+        return self.estado["escritos"].get(coleccion, 0)
+
+    def confirmar(self, coleccion: str, escritos: int):
+        self.estado["escritos"][coleccion] = escritos
+        self.guardar()
+
+    def borrar(self):
+        for ruta in (self.ruta, self.ruta_mapa):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+
+class Progreso:
+    """
+    Líneas de progreso estructuradas (clave=valor) durante la escritura: documentos
+    por segundo, latencia del último lote, tiempo restante estimado y contadores por
+    colección. Se emite una línea como mucho cada `intervalo` segundos y otra al
+    terminar cada colección.
+
+    Con `total_esperado=None` (carga incremental, donde el número de escrituras de
+    cada colección solo se conoce al compararla con la base de datos) o mientras no
+    hay ritmo medido no se estima el tiempo restante.
+    """
+
+    def __init__(self, total_esperado: int = None, intervalo: float = 5.0):
+        self.total_esperado = total_esperado
+        self.intervalo = intervalo
+        self.contadores = {}
+        self.previos = 0  # documentos ya escritos antes de reanudar
+        self.inicio = time.perf_counter()
+        self.ultima_linea = 0.0
+
+    def empezar(self, coleccion: str, escritos: int = 0):
+        self.contadores[coleccion] = escritos
+        self.previos += escritos
+
+    def lote(self, coleccion: str, escritos: int, total: int, segundos_lote: float):
+        self.contadores[coleccion] = escritos
+        ahora = time.perf_counter()
+        if escritos < total and ahora - self.ultima_linea < self.intervalo:
+            return
+        self.ultima_linea = ahora
+
+        hechos = sum(self.contadores.values())
+        transcurrido = ahora - self.inicio
+        docs_s = (hechos - self.previos) / transcurrido if transcurrido > 0 else 0.0
+        eta = ""
+        # Sin ritmo medido todavía (primer lote o recién reanudado) no hay estimación
+        if self.total_esperado is not None and docs_s > 0:
+            eta = f" eta_s={max((self.total_esperado - hechos) / docs_s, 0):.0f}"
+        contadores = ",".join(f"{c}:{n}" for c, n in self.contadores.items())
+        print(f"progreso coleccion={coleccion} escritos={escritos}/{total} docs_s={docs_s:.0f} "
+              f"lote_ms={segundos_lote * 1000:.0f}{eta} contadores={contadores}", flush=True)
@@ -0,0 +1,60 @@
+"""
+Servidor HTTP local que sirve páginas grabadas, para probar y medir los rastreadores
+sin acceder a la web real. Cada petición se responde con el fichero de la carpeta
+cuyo nombre es ruta_grabacion(url) (el que escribe ClienteHTTP con grabar=CARPETA);
+si no existe se responde 404. Las respuestas llevan ETag y Last-Modified y las
+peticiones condicionales se responden con 304 si el fichero no ha cambiado.
+
+Uso: python scripts/servidor_grabaciones.py CARPETA [--puerto 8080] [--latencia 0.05]
+y después, p. ej.: python scripts/new_script.py --base-url http://localhost:8080
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+from email.utils import formatdate
+
+from aiohttp import web
+
+from cliente_http import ruta_grabacion
+
+
+def crear_app(carpeta: str, latencia: float = 0.0) -> web.Application:
+    """
+    Aplicación aiohttp que sirve las grabaciones de `carpeta`, esperando `latencia`
+    segundos antes de cada respuesta para simular la red. app["peticiones"] y
+    app["no_modificadas"] cuentan las peticiones recibidas y las respondidas con 304.
+    """
+    app = web.Application()
+    app["peticiones"] = 0
+    app["no_modificadas"] = 0
+
+    async def servir(request: web.Request) -> web.Response:
+        app["peticiones"] += 1
+        if latencia:
+            await asyncio.sleep(latencia)
+        ruta = os.path.join(carpeta, ruta_grabacion(request.path_qs))
+        if not os.path.isfile(ruta):
+            raise web.HTTPNotFound()
+        with open(ruta, "rb") as fichero:
+            cuerpo = fichero.read()
+        cabeceras = {
+            "ETag": '"' + hashlib.sha1(cuerpo).hexdigest() + '"',
+            "Last-Modified": formatdate(os.path.getmtime(ruta), usegmt=True),
+        }
+        if request.headers.get("If-None-Match") == cabeceras["ETag"]:
+            app["no_modificadas"] += 1
+            return web.Response(status=304, headers=cabeceras)
+        return web.Response(body=cuerpo, content_type="text/html", charset="utf-8", headers=cabeceras)
+
+    app.router.add_get("/{ruta:.*}", servir)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve páginas grabadas por los rastreadores")
+    parser.add_argument("carpeta", help="Carpeta con las páginas grabadas")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por respuesta")
+    args = parser.parse_args()
+    web.run_app(crear_app(args.carpeta, args.latencia), port=args.puerto)
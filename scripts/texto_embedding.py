@@ -0,0 +1,77 @@
+import hashlib
+
+# Texto que se codifica y metadatos que describen el embedding guardado en cada
+# documento. Lo comparten embedding_create.py, que genera los embeddings, y la
+# ingesta, que marca como pendientes los documentos cuyo texto cambia.
+
+# Modelo de SentenceTransformer con el que se generan los embeddings
+NOMBRE_MODELO = 'paraphrase-multilingual-MiniLM-L12-v2'
+# Versión del texto codificado: se incrementa al cambiar get_campos_embedding o
+# texto_embedding para que se regeneren los embeddings de todas las colecciones
+VERSION_EMBEDDING = 1
+
+
+def safe_str(value):
+    """
+    Convierte de forma segura cualquier valor a string.
+    - Si el valor es None, retorna una cadena vacía.
+    - Si el valor es una lista, combina los elementos en una sola cadena.
+    - Si el valor no es una lista ni None, lo convierte directamente a string.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value if v is not None)
+    return str(value)
+
+def get_campos_embedding(collection_name):
+    """
+    Obtiene los campos que se deben usar para generar el embedding en función de la colección.
+    - Parámetro:
+      - collection_name (str): Nombre de la colección.
+    - Retorna:
+      - Lista de campos específicos para la colección dada.
+    """
+    campos_mapping = {
+        'autores': ['Nombre', 'Email', 'URL_del_perfil'],
+        'publicaciones': ['Título', 'Resumen', 'Palabras_clave'],
+        'tesis': ['Título', 'Resumen', 'Palabras_clave', 'Descripción'],
+        'proyectos': ['Título', 'Tipo', 'Organismo Financiador'],
+        'patentes': ['Título', 'Resumen', 'URL']
+    }
+    # Extrae el nombre base de la colección (sin prefijo)
+    collection_key = collection_name.lower().split('.')[-1]
+    return campos_mapping.get(collection_key, [])
+
+def texto_embedding(doc, campos):
+    """
+    Combina los campos relevantes de un documento en el texto que se codifica.
+    """
+    texto_para_embedding = ""
+    for campo in campos:
+        valor = doc.get(campo, '')
+        if valor:
+            texto_para_embedding += " " + safe_str(valor)
+    return texto_para_embedding.strip()
+
+def hash_texto(texto):
+    """
+    Hash SHA-256 del texto codificado; se guarda en embedding_hash.
+    """
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def filtro_desactualizados(modelo=NOMBRE_MODELO, version=VERSION_EMBEDDING):
+    """
+    Documentos cuyo embedding falta o está desactualizado: generado con otro modelo
+    u otra versión del texto, o marcado como pendiente por la ingesta porque su texto
+    ha cambiado. Cada rama del $or usa un índice (embedding_modelo_version o
+    embedding_pendiente), así que no recorre la colección entera.
+    """
+    return {
+        "$or": [
+            {"embedding_pendiente": True},
+            {"embedding_model": {"$ne": modelo}},
+            {"embedding_model": modelo, "embedding_version": {"$ne": version}},
+        ],
+        "eliminado": {"$ne": True},
+    }
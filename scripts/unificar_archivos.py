@@ -1,16 +1,10 @@
-import os
-import json
+from lector_bloques import leer_investigadores, rutas_bloques, escribir_array_json
 
 output_folder = "output_blocks"
 final_file = "investigadores_detalle_final.json"
 
-data = []
-for filename in sorted(os.listdir(output_folder)):
-    if filename.endswith(".json"):
-        with open(os.path.join(output_folder, filename), "r", encoding="utf-8") as file:
-            data.extend(json.load(file))
-
+# Se escribe investigador a investigador, sin reunir todos los bloques en memoria
 with open(final_file, "w", encoding="utf-8") as file:
-    json.dump(data, file, ensure_ascii=False, indent=4)
+    total = escribir_array_json(file, leer_investigadores(rutas_bloques(output_folder)))
 
-print(f"Datos combinados guardados en {final_file}")
+print(f"Datos combinados guardados en {final_file} ({total} investigadores)")